@@ -1,3 +1,8 @@
+from .registry import ClientRegistry
+from .registry import get_client
+
+__all__ = ["DEFAULT_TIMEOUT", "ClientRegistry", "get_client"]
+
 DEFAULT_TIMEOUT = 10
 
 __version__ = "0.10.0"
@@ -0,0 +1,38 @@
+"""Helpers shared by the HTTP-based clients."""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+LOGGER = logging.getLogger(__name__)
+
+
+def warm_up(session, url, connections, timeout, prime=None):
+    """Open ``connections`` keep-alive connections to ``url`` in parallel.
+
+    Each connection is opened with a ``HEAD`` request, whose response is
+    discarded; the connection then stays in the session's pool for later
+    requests. ``prime`` is an optional callable run alongside them, e.g. to
+    fill a client-side cache. Warming up is best effort: failures are logged
+    and otherwise ignored.
+    """
+    import requests
+
+    if connections > requests.adapters.DEFAULT_POOLSIZE:
+        # The default adapter would discard connections beyond its pool size.
+        session.mount(url, requests.adapters.HTTPAdapter(pool_maxsize=connections))
+
+    def open_connection():
+        session.head(url, timeout=timeout)
+
+    tasks = [open_connection] * connections
+    if prime is not None:
+        tasks.append(prime)
+    if not tasks:
+        return
+
+    with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+        futures = [executor.submit(task) for task in tasks]
+    for future in futures:
+        exc = future.exception()
+        if exc is not None:
+            LOGGER.warning("Error warming up connection to %s: %s", url, exc)
@@ -1,13 +1,15 @@
 import json
 import logging
+import operator
 import os
 import re
 import sys
 from urllib.parse import urlparse
 
-import requests
-
 from .. import DEFAULT_TIMEOUT
+from .._session import warm_up
+from ..instrumentation import Instrumented
+from ..instrumentation import operation
 
 __all__ = [
     "ArchivesSpaceError",
@@ -18,6 +20,26 @@ __all__ = [
 
 LOGGER = logging.getLogger(__name__)
 
+# Sort key of formatted records when sorting by title.
+by_title = operator.itemgetter("title")
+
+# Numeric path segments, replaced by a placeholder in instrumented routes.
+ID_SEGMENT_RE = re.compile(r"/\d+(?=/|$)")
+
+RECORD_TYPE_RE = re.compile(r"repositories/\d+/(resources|archival_objects)/\d+")
+
+# Characters escaped by _escape_solr_query, besides the "&&" and "||" operators.
+SOLR_SPECIAL_CHARACTERS = "'\" +-!(){}[]^~?:\\/"
+SOLR_ESCAPES = {
+    # Title queries need their escapes escaped again.
+    "title": "\\\\",
+    "identifier": "\\",
+}
+SOLR_ESCAPE_TABLES = {
+    field: str.maketrans({c: escape + c for c in SOLR_SPECIAL_CHARACTERS})
+    for field, escape in SOLR_ESCAPES.items()
+}
+
 
 class ArchivesSpaceError(Exception):
     pass
@@ -38,7 +60,7 @@ class CommunicationError(ArchivesSpaceError):
         super().__init__(message)
 
 
-class ArchivesSpaceClient:
+class ArchivesSpaceClient(Instrumented):
     """
     Client to communicate with a remote ArchivesSpace installation using its backend API.
 
@@ -53,7 +75,16 @@ class ArchivesSpaceClient:
     RESOURCE_COMPONENT = "resource_component"
 
     def __init__(
-        self, host, user, passwd, port=8089, repository=2, timeout=DEFAULT_TIMEOUT
+        self,
+        host,
+        user,
+        passwd,
+        port=8089,
+        repository=2,
+        timeout=DEFAULT_TIMEOUT,
+        lazy=False,
+        warm_connections=0,
+        profile_dir=None,
     ):
         """Create a new client.
 
@@ -73,13 +104,65 @@ class ArchivesSpaceClient:
           - ``host="localhost:12345"`` (``port`` will be ignored)
           - ``host="http://localhost"`` (``port`` will be ignored)
 
+        When ``lazy`` is true the client doesn't log in until it makes its
+        first request, so constructing a client that ends up unused costs
+        nothing.
+
+        ``warm_connections`` is passed to ``warm_up`` to open that many
+        connections up front; it implies logging in even if ``lazy`` is set.
+
+        ``profile_dir`` enables profiling of each operation, writing the
+        results to that directory; see ``agentarchives.profiling``.
         """
         self.base_url = self._build_base_url(host, port)
         self.timeout = timeout
         self.user = user
         self.passwd = passwd
         self.repository = f"/repositories/{repository}"
-        self._login()
+        self._token = None
+        self._session = None
+        self._session_pid = None
+        self._login_pending = lazy
+        self._init_instrumentation("archivesspace", profile_dir)
+        if not lazy:
+            self._login()
+        if warm_connections:
+            self.warm_up(warm_connections)
+
+    def __getstate__(self):
+        """Pickle the client as its configuration and session token.
+
+        The live ``requests.Session`` is left out; the unpickled client
+        builds a new one from the cached token on first use, so it does not
+        need to log in again.
+        """
+        state = self.__dict__.copy()
+        state["_session"] = None
+        state["_session_pid"] = None
+        return self._instrumentation_state(state)
+
+    @property
+    def session(self):
+        """The ``requests.Session`` carrying the ArchivesSpace session token.
+
+        Pooled connections can't be shared with the process we were forked
+        from, so a new session is created whenever the client is used from a
+        different process than the one that created the current session.
+        Logs in first if the client was created with ``lazy=True``.
+        Returns ``None`` once the client has logged out.
+        """
+        if self._token is None:
+            if not self._login_pending:
+                return None
+            self._login()
+        pid = os.getpid()
+        if self._session is None or self._session_pid != pid:
+            import requests
+
+            self._session = requests.Session()
+            self._session.headers.update({"X-ArchivesSpace-Session": self._token})
+            self._session_pid = pid
+        return self._session
 
     def _build_base_url(self, host, port):
         """Return the API base URL string based on ``host`` and ``port``.
@@ -112,6 +195,9 @@ class ArchivesSpaceClient:
         Sets 'expiring' parameter to false meaning the session timeouts after
         604800 seconds (a week) of inactivity.
         """
+        # requests is imported on first use to keep importing this package cheap.
+        import requests
+
         try:
             response = requests.post(
                 self.base_url + "/users/" + self.user + "/login",
@@ -137,11 +223,26 @@ class ArchivesSpaceClient:
                 )
             )
         else:
-            token = output["session"]
+            self._token = output["session"]
 
-        self.session = requests.Session()
-        self.session.headers.update({"X-ArchivesSpace-Session": token})
+        self._login_pending = False
+        self._session = None
 
+    def warm_up(self, connections=4):
+        """
+        Open ``connections`` keep-alive connections to the server in parallel
+        and fetch the levels of description, so that a following burst of
+        concurrent requests doesn't wait on connection setup one at a time.
+        """
+        warm_up(
+            self.session,
+            self.base_url + "/",
+            connections,
+            self.timeout,
+            prime=self.get_levels_of_description,
+        )
+
+    @operation
     def logout(self):
         """
         Explicitly log out of ArchivesSpace.
@@ -149,10 +250,13 @@ class ArchivesSpaceClient:
         By default we log into ArchiveSpace with the 'expiring' param set to false,
         meaning the session timeouts in 604800 seconds (a week) of inactivity.
         """
+        import requests
+
         try:
             self._post("logout")
             self.session.close()
-            self.session = None
+            self._token = None
+            self._session = None
         except requests.ConnectionError as e:
             raise ConnectionError(
                 "Unable to logout from ArchivesSpace server: " + str(e)
@@ -162,10 +266,19 @@ class ArchivesSpaceClient:
         if not url.startswith("/"):
             url = "/" + url
 
-        response = method(self.base_url + url, params=params, data=data)
+        response = self._send_request(
+            method,
+            self.base_url + url,
+            ID_SEGMENT_RE.sub("/{id}", url),
+            params=params,
+            data=data,
+        )
+        # Error responses are logged, with a bounded preview of the body, by
+        # self.request_log.
         if response.status_code != expected_response:
-            LOGGER.error("Response code: %s", response.status_code)
-            LOGGER.error("Response body: %s", response.text)
+            self.request_log.unexpected_status(
+                method, self.base_url + url, response, expected_response
+            )
             raise CommunicationError(response.status_code, response)
 
         try:
@@ -184,14 +297,14 @@ class ArchivesSpaceClient:
         if params is None:
             params = {}
         return self._request(
-            self.session.get, url, params=params, expected_response=expected_response
+            "get", url, params=params, expected_response=expected_response
         )
 
     def _put(self, url, params=None, data=None, expected_response=200):
         if params is None:
             params = {}
         return self._request(
-            self.session.put,
+            "put",
             url,
             params=params,
             data=data,
@@ -202,7 +315,7 @@ class ArchivesSpaceClient:
         if params is None:
             params = {}
         return self._request(
-            self.session.post,
+            "post",
             url,
             params=params,
             data=data,
@@ -213,7 +326,7 @@ class ArchivesSpaceClient:
         if params is None:
             params = {}
         return self._request(
-            self.session.delete, url, params=params, expected_response=expected_response
+            "delete", url, params=params, expected_response=expected_response
         )
 
     def _format_notes(self, record):
@@ -222,18 +335,17 @@ class ArchivesSpaceClient:
         """
         notes = []
         for note in record["notes"]:
-            if note.get("type"):
-                n = {}
-                n["type"] = note["type"]
-                try:
-                    if note["jsonmodel_type"] == "note_singlepart":
-                        n["content"] = note["content"][0]
-                    else:
-                        n["content"] = note["subnotes"][0]["content"]
-                except (IndexError, KeyError):
-                    n["content"] = ""
-
-                notes.append(n)
+            note_type = note.get("type")
+            if not note_type:
+                continue
+            try:
+                if note["jsonmodel_type"] == "note_singlepart":
+                    content = note["content"][0]
+                else:
+                    content = note["subnotes"][0]["content"]
+            except (IndexError, KeyError):
+                content = ""
+            notes.append({"type": note_type, "content": content})
 
         return notes
 
@@ -287,12 +399,11 @@ class ArchivesSpaceClient:
         The list of special characters is located at http://lucene.apache.org/core/4_0_0/queryparser/org/apache/lucene/queryparser/classic/package-summary.html#Escaping_Special_Characters
         """
         # Different rules for "title" and "identifier" fields :/
-        if field == "title":
-            replacement = r"\\\\\1"
-        else:
-            replacement = r"\\\1"
-
-        return re.sub(r'([\'" +\-!\(\)\{\}\[\]^"~?:\\/]|&&|\|\|)', replacement, query)
+        if field != "title":
+            field = "identifier"
+        escape = SOLR_ESCAPES[field]
+        query = query.translate(SOLR_ESCAPE_TABLES[field])
+        return query.replace("&&", escape + "&&").replace("||", escape + "||")
 
     def resource_type(self, resource_id):
         """
@@ -301,9 +412,7 @@ class ArchivesSpaceClient:
         :param resource_id string: The URI of the resource whose type to determine.
         :raises ArchivesSpaceError: if the resource_id does not appear to be either type.
         """
-        match = re.search(
-            r"repositories/\d+/(resources|archival_objects)/\d+", resource_id
-        )
+        match = RECORD_TYPE_RE.search(resource_id)
         if match and match.groups():
             type_ = match.groups()[0]
             return "resource" if type_ == "resources" else "resource_component"
@@ -312,9 +421,11 @@ class ArchivesSpaceClient:
                 f"Unable to determine type of provided ID: {resource_id}"
             )
 
+    @operation
     def get_record(self, record_id):
         return self._get(record_id).json()
 
+    @operation
     def edit_record(self, new_record):
         """
         Update a record in ArchivesSpace using the provided new_record.
@@ -382,6 +493,7 @@ class ArchivesSpaceClient:
 
         self._post(record_id, data=json.dumps(record))
 
+    @operation
     def get_levels_of_description(self):
         """Returns an array of all levels of description defined in this
         ArchivesSpace instance."""
@@ -394,6 +506,7 @@ class ArchivesSpaceClient:
 
         return self.levels_of_description
 
+    @operation
     def collection_list(self, resource_id, resource_type="collection"):
         """
         Fetches a list of all resource IDs within the specified resource ID.
@@ -420,6 +533,7 @@ class ArchivesSpaceClient:
         tree = response.json()
         return fetch_children(tree["children"])
 
+    @operation
     def get_resource_component_children(self, resource_component_id):
         """
         Given a resource component, fetches detailed metadata for it and all of its children.
@@ -440,123 +554,127 @@ class ArchivesSpaceClient:
             return start
 
     def _fetch_dates_from_record(self, record):
-        dates = self._fetch_date_expression_from_record(record)
+        dates = record.get("dates")
         if not dates:
-            try:
-                start_date = record["dates"][0]["begin"]
-            except (IndexError, ValueError, KeyError):
-                return ""
-            end_date = record["dates"][0].get("end")
-            return self._format_dates(start_date, end_date)
-        return dates
+            return ""
+        # use the first date, though there can be multiple sets
+        date = dates[0]
+        expression = date.get("expression")
+        if expression:
+            return expression
+        try:
+            start_date = date["begin"]
+        except KeyError:
+            return ""
+        return self._format_dates(start_date, date.get("end"))
 
     def _fetch_date_expression_from_record(self, record):
-        if not record.get("dates"):
+        dates = record.get("dates")
+        if not dates:
             return ""
         # use the first date, though there can be multiple sets
-        elif "expression" in record["dates"][0]:
-            return record["dates"][0]["expression"]
-        else:
-            return ""
+        return dates[0].get("expression", "")
 
     def _get_resources(
         self, resource_id, level=1, recurse_max_level=False, sort_by=None
     ):
-        def format_record(record, level):
-            descend = recurse_max_level != level
-            level += 1
+        response = self._get(resource_id + "/tree")
+        tree = response.json()
+        return self._format_tree_record(tree, 1, recurse_max_level, sort_by)
 
-            full_record = self._get(record["record_uri"]).json()
-            dates = self._fetch_dates_from_record(full_record)
-            date_expression = self._fetch_date_expression_from_record(full_record)
+    def _format_tree_record(self, record, level, recurse_max_level, sort_by):
+        """Format a node of a resource tree and its descendants; see
+        ``_get_resources``.
+        """
+        descend = recurse_max_level != level
+        level += 1
 
-            identifier = (
-                full_record["id_0"]
-                if "id_0" in full_record
-                else full_record.get("component_id", "")
-            )
+        full_record = self._get(record["record_uri"]).json()
+        dates = self._fetch_dates_from_record(full_record)
+        date_expression = self._fetch_date_expression_from_record(full_record)
 
-            result = {
-                "id": record["record_uri"],
-                "type": "resource",
-                "sortPosition": level,
-                "identifier": identifier,
-                "title": full_record.get("title", ""),
-                "dates": dates,
-                "date_expression": date_expression,
-                "levelOfDescription": record["level"],
-                "notes": self._format_notes(full_record),
-            }
-            if full_record.get("display_string") is not None:
-                result["display_title"] = full_record["display_string"]
-            if record["children"] and descend:
-                result["children"] = [
-                    format_record(child, level) for child in record["children"]
-                ]
-                result["has_children"] = True
-                if sort_by is not None:
-                    kwargs = {"reverse": True} if sort_by == "desc" else {}
-                    result["children"] = sorted(
-                        result["children"], key=lambda c: c["title"], **kwargs
-                    )
-            elif record["children"]:
-                result["children"] = []
-                result["has_children"] = True
-            else:
-                result["children"] = False
-                result["has_children"] = False
+        identifier = (
+            full_record["id_0"]
+            if "id_0" in full_record
+            else full_record.get("component_id", "")
+        )
 
-            return result
+        result = {
+            "id": record["record_uri"],
+            "type": "resource",
+            "sortPosition": level,
+            "identifier": identifier,
+            "title": full_record.get("title", ""),
+            "dates": dates,
+            "date_expression": date_expression,
+            "levelOfDescription": record["level"],
+            "notes": self._format_notes(full_record),
+        }
+        if full_record.get("display_string") is not None:
+            result["display_title"] = full_record["display_string"]
+        if record["children"] and descend:
+            result["children"] = [
+                self._format_tree_record(child, level, recurse_max_level, sort_by)
+                for child in record["children"]
+            ]
+            result["has_children"] = True
+            if sort_by is not None:
+                result["children"].sort(key=by_title, reverse=sort_by == "desc")
+        elif record["children"]:
+            result["children"] = []
+            result["has_children"] = True
+        else:
+            result["children"] = False
+            result["has_children"] = False
 
-        response = self._get(resource_id + "/tree")
-        tree = response.json()
-        return format_record(tree, 1)
+        return result
 
     def _get_components(
         self, resource_id, level=1, recurse_max_level=False, sort_by=None
     ):
-        def fetch_children(resource_id):
-            return self._get(resource_id + "/children").json()
-
-        def format_record(record, level):
-            dates = self._fetch_dates_from_record(record)
-            date_expression = self._fetch_date_expression_from_record(record)
-
-            result = {
-                "id": record["uri"],
-                "type": "resource_component",
-                "sortPosition": level,
-                "identifier": record.get("component_id", ""),
-                "title": record.get("title", ""),
-                "display_title": record.get("display_string", ""),
-                "dates": dates,
-                "date_expression": date_expression,
-                "levelOfDescription": record["level"],
-                "notes": self._format_notes(record),
-            }
+        return self._format_component(
+            self._get(resource_id).json(), level, recurse_max_level, sort_by
+        )
 
-            children = fetch_children(record["uri"])
-            if children and not recurse_max_level == level:
-                result["children"] = [
-                    format_record(child, level + 1) for child in children
-                ]
-                if sort_by is not None:
-                    kwargs = {"reverse": True} if sort_by == "desc" else {}
-                    result["children"] = sorted(
-                        children, key=lambda c: c["title"], **kwargs
-                    )
-                result["has_children"] = True
-            elif children:
-                result["children"] = []
-                result["has_children"] = True
-            else:
-                result["children"] = False
-                result["has_children"] = False
+    def _format_component(self, record, level, recurse_max_level, sort_by):
+        """Format a component and its descendants; see ``_get_components``."""
+        dates = self._fetch_dates_from_record(record)
+        date_expression = self._fetch_date_expression_from_record(record)
+
+        result = {
+            "id": record["uri"],
+            "type": "resource_component",
+            "sortPosition": level,
+            "identifier": record.get("component_id", ""),
+            "title": record.get("title", ""),
+            "display_title": record.get("display_string", ""),
+            "dates": dates,
+            "date_expression": date_expression,
+            "levelOfDescription": record["level"],
+            "notes": self._format_notes(record),
+        }
 
-            return result
+        children = self._get(record["uri"] + "/children").json()
+        if children and not recurse_max_level == level:
+            result["children"] = [
+                self._format_component(child, level + 1, recurse_max_level, sort_by)
+                for child in children
+            ]
+            if sort_by is not None:
+                result["children"] = sorted(
+                    children, key=by_title, reverse=sort_by == "desc"
+                )
+            result["has_children"] = True
+        elif children:
+            result["children"] = []
+            result["has_children"] = True
+        else:
+            result["children"] = False
+            result["has_children"] = False
 
-        return format_record(self._get(resource_id).json(), level)
+        return result
 
+    @operation
     def get_resource_component_and_children(
         self,
         resource_id,
@@ -594,6 +712,7 @@ class ArchivesSpaceClient:
                 resource_id, recurse_max_level=recurse_max_level, sort_by=sort_by
             )
 
+    @operation
     def find_resource_id_for_component(self, component_id):
         """
         Given the URL to a component, returns the parent resource's URL.
@@ -605,6 +724,7 @@ class ArchivesSpaceClient:
         response = self._get(component_id)
         return response.json()["resource"]["ref"]
 
+    @operation
     def find_parent_id_for_component(self, component_id):
         """
         Given the URL to a component, returns the parent component's URL.
@@ -627,6 +747,7 @@ class ArchivesSpaceClient:
         else:
             return (ArchivesSpaceClient.RESOURCE, component_id)
 
+    @operation
     def find_collection_ids(self, search_pattern="", identifier="", fetched=0, page=1):
         """
         Fetches a list of resource URLs for every resource in the database.
@@ -664,6 +785,7 @@ class ArchivesSpaceClient:
 
         return results
 
+    @operation
     def count_collections(self, search_pattern="", identifier=""):
         params = {"page": 1, "q": "primary_type:resource"}
 
@@ -677,6 +799,7 @@ class ArchivesSpaceClient:
             "total_hits"
         ]
 
+    @operation
     def find_collections(
         self,
         search_pattern="",
@@ -748,6 +871,7 @@ class ArchivesSpaceClient:
         hits = response.json()
         return [format_record(json.loads(r["json"])) for r in hits["results"]]
 
+    @operation
     def find_by_id(self, object_type, field, value):
         """
         Find resource by a specific ID.
@@ -796,6 +920,7 @@ class ArchivesSpaceClient:
         hits = response.json()
         return [format_record(r) for r in hits[object_type]]
 
+    @operation
     def augment_resource_ids(self, resource_ids):
         """
         Given a list of resource IDs, returns a list of dicts containing detailed information about the specified resources and their children.
@@ -815,6 +940,7 @@ class ArchivesSpaceClient:
 
         return resources_augmented
 
+    @operation
     def add_digital_object(
         self,
         parent_archival_object,
@@ -997,6 +1123,7 @@ class ArchivesSpaceClient:
         new_object["id"] = new_object_uri
         return new_object
 
+    @operation
     def add_digital_object_component(
         self,
         parent_digital_object,
@@ -1025,6 +1152,7 @@ class ArchivesSpaceClient:
 
         return new_object
 
+    @operation
     def add_child(
         self,
         parent,
@@ -1105,6 +1233,7 @@ class ArchivesSpaceClient:
             repository + "/archival_objects", data=json.dumps(new_object)
         ).json()["uri"]
 
+    @operation
     def delete_record(self, record_id):
         """
         Delete a record with record_id.
@@ -1,14 +1,48 @@
+import collections
+import contextlib
+import inspect
 import logging
 import os
+import re
+import threading
+import time
 from time import localtime
 from time import strftime
 
-import MySQLdb
+from ..instrumentation import Instrumented
+from ..instrumentation import RequestEvent
+from ..instrumentation import operation
+from ..tracing import span
+from .pool import ConnectionPool
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 logger.addHandler(logging.NullHandler())
 
+# The table a statement reads from or writes to, used as its instrumented route.
+TABLE_RE = re.compile(r"\b(?:FROM|INTO|UPDATE)\s+`?(\w+)", re.IGNORECASE)
+
+# Version numbers in the server info of MySQL (e.g. "8.0.33") and MariaDB
+# (e.g. "10.6.12-MariaDB", or "5.5.5-10.6.12-MariaDB" over replication).
+MYSQL_VERSION_RE = re.compile(r"^(\d+)\.(\d+)\.(\d+)")
+MARIADB_VERSION_RE = re.compile(r"(\d+)\.(\d+)\.(\d+)-MariaDB")
+
+# Maximum number of IDs in an "IN (...)" list.
+IN_CLAUSE_SIZE = 1000
+
+# Number of resource IDs each client remembers; see ``resource_types``.
+RESOURCE_TYPE_CACHE_SIZE = 10000
+
+# Number of components whose parent and resource each client remembers, and
+# for how many seconds; see ``find_resource_id_for_component``.
+COMPONENT_CACHE_SIZE = 10000
+COMPONENT_CACHE_TTL = 60
+
+# Order of the children of a record in exported trees.
+CHILDREN_ORDER = "FIND_IN_SET(resourceLevel, 'subseries,file'), title ASC"
+
+# Columns of the components in exported trees, after their ID and parent ID.
+COMPONENT_COLUMNS = ("title", "dateExpression", "persistentID", "resourceLevel")
+
 
 __all__ = ["ArchivistsToolkitError", "ArchivistsToolkitClient"]
 
@@ -17,34 +51,435 @@ class ArchivistsToolkitError(Exception):
     pass
 
 
-class ArchivistsToolkitClient:
+class InstrumentedCursor:
+    """Wraps a MySQLdb cursor to report each statement to the client's observers.
+
+    Events use the statement type (e.g. "SELECT") as their method and the
+    table name as their route.
+    """
+
+    def __init__(self, cursor, client):
+        self._cursor = cursor
+        self._client = client
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def execute(self, query, args=None):
+        return self._run(self._cursor.execute, query, args)
+
+    def executemany(self, query, args):
+        """Run ``query`` for each of ``args``, reported as a single statement."""
+        return self._run(self._cursor.executemany, query, args)
+
+    def _run(self, method, query, args):
+        statement = query.split(None, 1)[0].upper()
+        table = TABLE_RE.search(query)
+        table = table.group(1) if table else ""
+        with span(f"{statement} {table}", {"db.statement": query}):
+            error = None
+            start = time.perf_counter()
+            try:
+                return method(query, args)
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                self._client._notify(
+                    RequestEvent(
+                        backend="archivists_toolkit",
+                        method=statement,
+                        route=table,
+                        url=query,
+                        status_code=None,
+                        elapsed=time.perf_counter() - start,
+                        bytes_sent=0,
+                        bytes_received=0,
+                        retries=0,
+                        error=error,
+                    )
+                )
+
+
+def supports_recursive_queries(server_info):
+    """Whether a server understands ``WITH RECURSIVE``, from its server info.
+
+    Recursive common table expressions arrived in MySQL 8.0 and MariaDB
+    10.2.2.
+    """
+    match = MARIADB_VERSION_RE.search(server_info)
+    if match:
+        return tuple(map(int, match.groups())) >= (10, 2, 2)
+    match = MYSQL_VERSION_RE.match(server_info)
+    return bool(match) and int(match.group(1)) >= 8
+
+
+class ArchivistsToolkitClient(Instrumented):
     RESOURCE = "resource"
     RESOURCE_COMPONENT = "resource_component"
 
-    def __init__(self, host, user, passwd, db):
+    def __init__(
+        self,
+        host,
+        user,
+        passwd,
+        db,
+        lazy=False,
+        profile_dir=None,
+        pool_size=None,
+        pool_timeout=None,
+    ):
+        """Create a new client.
+
+        When ``lazy`` is true the database connection is opened on the first
+        query instead of here.
+
+        Without a ``pool_size`` the client has a single connection and must
+        not be shared between threads. With one, it is thread-safe: each
+        operation checks out its own connection from a ``ConnectionPool`` of
+        at most ``pool_size`` connections, waiting up to ``pool_timeout``
+        seconds (forever if None) for one to become available. Idle
+        connections are pinged before reuse and replaced if the server has
+        dropped them, and each operation's writes are committed when it
+        returns.
+
+        ``profile_dir`` enables profiling of each operation, writing the
+        results to that directory; see ``agentarchives.profiling``.
+        """
+        self.user = user
+        self._connect_kwargs = {"host": host, "user": user, "passwd": passwd, "db": db}
+        self._db = None
+        self._db_pid = None
+        # Connections inherited from a parent process; see ``db``.
+        self._inherited_dbs = []
+        # Whether the server supports recursive queries; checked on first use.
+        self._recursive_queries = None
+        # Parent and resource IDs of components, and when they were loaded,
+        # most recently used last; see ``find_resource_id_for_component``.
+        self._components = collections.OrderedDict()
+        # Resources with too many components to cache, and when they were
+        # found to be, by ID as a string.
+        self._large_resources = {}
+        self._components_lock = threading.Lock()
+        # Types of records, most recently used last; see ``resource_types``.
+        self._resource_types = collections.OrderedDict()
+        self._resource_types_lock = threading.Lock()
+        self._pool_size = pool_size
+        self._pool_timeout = pool_timeout
+        self._pool = self._new_pool()
+        # The connection checked out by each thread's current operation.
+        self._local = threading.local()
+        self._init_instrumentation("archivists_toolkit", profile_dir)
+        if not lazy:
+            if self._pool is None:
+                self._connect()
+            else:
+                self._pool.release(self._pool.acquire())
+
+    def __getstate__(self):
+        """Pickle the client as its connection parameters; it reconnects on use."""
+        state = self.__dict__.copy()
+        state["_db"] = None
+        state["_db_pid"] = None
+        state["_inherited_dbs"] = []
+        state["_pool"] = None
+        state["_local"] = None
+        state["_resource_types_lock"] = None
+        # Their load times are only meaningful in this process.
+        state["_components"] = collections.OrderedDict()
+        state["_large_resources"] = {}
+        state["_components_lock"] = None
+        return self._instrumentation_state(state)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._resource_types_lock = threading.Lock()
+        self._components_lock = threading.Lock()
+        self._pool = self._new_pool()
+        self._local = threading.local()
+
+    def _new_pool(self):
+        if self._pool_size is None:
+            return None
+        return ConnectionPool(
+            lambda: self._open_connection(),
+            max_size=self._pool_size,
+            timeout=self._pool_timeout,
+        )
+
+    def _open_connection(self):
+        # MySQLdb is only needed by this client, so it's imported on first use
+        # rather than whenever the package is imported.
+        import MySQLdb
+
         try:
-            self.user = user
-            self.db = MySQLdb.connect(host=host, user=user, passwd=passwd, db=db)
-            logger.debug("Connected to ATK database: %s", db)
+            connection = MySQLdb.connect(**self._connect_kwargs)
+            logger.debug("Connected to ATK database: %s", self._connect_kwargs["db"])
+            return connection
         except Exception:
             logger.exception("Error connecting to ATK database")
             raise
 
-    def resource_type(self, resource_id):
-        cursor = self.db.cursor()
-        cursor.execute(
-            "SELECT resourceId FROM Resources WHERE resourceId=%s", (resource_id,)
+    def _connect(self):
+        self._db = self._open_connection()
+        self._db_pid = os.getpid()
+
+    def _operation_scope(self):
+        """Check out a pooled connection for the calling thread until its
+        outermost operation returns; see ``Instrumented._operation_scope``.
+        """
+        if self._pool is None or getattr(self._local, "db", None) is not None:
+            return contextlib.nullcontext()
+        return self._checkout()
+
+    @contextlib.contextmanager
+    def _checkout(self):
+        with self._pool.connection() as db:
+            self._local.db = db
+            try:
+                yield
+            finally:
+                self._local.db = None
+
+    @property
+    def db(self):
+        """The MySQLdb connection, opened on first use and reopened when used
+        from a forked process.
+
+        A connection inherited across a fork shares its socket with the
+        parent. It is kept referenced rather than closed, because closing it
+        would send a quit message over the parent's connection.
+
+        With a pool, this is the connection checked out by the calling
+        thread's current operation.
+        """
+        if self._pool is not None:
+            db = getattr(self._local, "db", None)
+            if db is None:
+                raise ArchivistsToolkitError(
+                    "A pooled client's connection is only available during an operation"
+                )
+            return db
+        if self._db is not None and self._db_pid != os.getpid():
+            self._inherited_dbs.append(self._db)
+            self._db = None
+        if self._db is None:
+            self._connect()
+        return self._db
+
+    def _cursor(self):
+        return InstrumentedCursor(self.db.cursor(), self)
+
+    def _streaming_cursorclass(self):
+        import MySQLdb.cursors
+
+        return MySQLdb.cursors.SSCursor
+
+    def _stream(self, sql, params=()):
+        """Yield the rows of a query from a server-side ``SSCursor``.
+
+        The cursor fetches rows as they're read instead of all at once, and
+        its connection can't be used for anything else until every row has
+        been read or the cursor is closed. With a pool, the rows are read
+        over a connection of their own, which is held until then: other
+        operations get one of the remaining connections, so the pool needs
+        at least two.
+
+        :raises ArchivistsToolkitError: if the client's pool has a single
+            connection, as other operations would wait for it forever, or
+            until ``pool_timeout``.
+        """
+        if self._pool is None:
+            connection = contextlib.nullcontext(self.db)
+        elif self._pool.max_size < 2:
+            raise ArchivistsToolkitError(
+                "Streaming from a pooled client needs a pool_size of at least 2"
+            )
+        else:
+            connection = self._pool.connection()
+        with connection as db:
+            cursor = InstrumentedCursor(db.cursor(self._streaming_cursorclass()), self)
+            try:
+                cursor.execute(sql, params)
+                yield from cursor
+            finally:
+                cursor.close()
+
+    def _supports_recursive_queries(self):
+        if self._recursive_queries is None:
+            self._recursive_queries = supports_recursive_queries(
+                self.db.get_server_info()
+            )
+        return self._recursive_queries
+
+    def _load_subtree(
+        self,
+        cursor,
+        resource_id,
+        is_resource=True,
+        columns=(),
+        search_pattern="",
+        order_by="",
+        limit=None,
+    ):
+        """Fetch the components below a resource or component.
+
+        Returns ``(resourceComponentId, parentResourceComponentId, *columns)``
+        rows for every descendant. Top-level components of a resource have a
+        ``None`` parent.
+
+        ``resource_id`` may also be a list of IDs, to fetch the components
+        below all of them at once.
+
+        :param string search_pattern: If given, only the subtrees of the
+            top-level components whose title or persistentID contains it are
+            loaded.
+        :param string order_by: An ORDER BY clause for the rows; children of
+            the same parent come out in this order relative to each other.
+        :param int limit: If given, None is returned as soon as more than
+            this many components are found.
+
+        Only top-level components refer to their resource, so descendants
+        are found by following parent IDs: in a single recursive query where
+        the server supports it, otherwise with one query per level of the
+        tree.
+        """
+        select = ", ".join(
+            ("resourceComponentId", "parentResourceComponentId") + tuple(columns)
         )
-        if cursor.fetchone() is not None:
-            return ArchivistsToolkitClient.RESOURCE
+        if isinstance(resource_id, list):
+            params = tuple(resource_id)
+            target = " IN ({})".format(", ".join(["%s"] * len(params)))
+        else:
+            params = (resource_id,)
+            target = "=%s"
+        if is_resource:
+            anchor = f"parentResourceComponentId IS NULL AND resourceId{target}"
+        else:
+            anchor = f"parentResourceComponentId{target}"
+        if search_pattern:
+            anchor += " AND (title LIKE %s OR persistentID LIKE %s)"
+            params += ("%" + search_pattern + "%",) * 2
+        if order_by:
+            order_by = " ORDER BY " + order_by
+
+        if self._supports_recursive_queries():
+            joined = ", ".join(
+                f"c.{column}"
+                for column in ("resourceComponentId", "parentResourceComponentId")
+                + tuple(columns)
+            )
+            cursor.execute(
+                f"WITH RECURSIVE subtree AS ("
+                f"SELECT {select} FROM ResourcesComponents WHERE {anchor} "
+                f"UNION ALL SELECT {joined} FROM ResourcesComponents c "
+                f"JOIN subtree s ON c.parentResourceComponentId = s.resourceComponentId"
+                f") SELECT {select} FROM subtree{order_by}"
+                + ("" if limit is None else f" LIMIT {limit + 1}"),
+                params,
+            )
+            rows = list(cursor.fetchall())
+            return None if limit is not None and len(rows) > limit else rows
 
         cursor.execute(
-            "SELECT resourceComponentId FROM ResourcesComponents WHERE resourceComponentId=%s",
-            (resource_id,),
+            f"SELECT {select} FROM ResourcesComponents WHERE {anchor}{order_by}", params
         )
-        if cursor.fetchone() is not None:
-            return ArchivistsToolkitClient.RESOURCE_COMPONENT
+        rows = list(cursor.fetchall())
+        level = [row[0] for row in rows]
+        while level:
+            next_level = []
+            for start in range(0, len(level), IN_CLAUSE_SIZE):
+                ids = level[start : start + IN_CLAUSE_SIZE]
+                placeholders = ", ".join(["%s"] * len(ids))
+                cursor.execute(
+                    f"SELECT {select} FROM ResourcesComponents "
+                    f"WHERE parentResourceComponentId IN ({placeholders}){order_by}",
+                    tuple(ids),
+                )
+                children = cursor.fetchall()
+                rows.extend(children)
+                next_level.extend(row[0] for row in children)
+                if limit is not None and len(rows) > limit:
+                    return None
+            level = next_level
+        return None if limit is not None and len(rows) > limit else rows
+
+    @operation
+    def resource_type(self, resource_id):
+        """
+        Returns the type of a record: RESOURCE, RESOURCE_COMPONENT, or None if there's no record with this ID.
 
+        An ID of both a resource and a component refers to the resource.
+        Resources are remembered; see ``resource_types``.
+        """
+        return self.resource_types([resource_id])[resource_id]
+
+    @operation
+    def resource_types(self, resource_ids):
+        """
+        Returns the types of many records at once, like ``resource_type``.
+
+        The types not yet known to the client are looked up in a single
+        query. The last ``RESOURCE_TYPE_CACHE_SIZE`` resources found are
+        remembered. Other IDs are looked up again each time: a resource
+        created later with the ID of a component takes precedence over it.
+
+        :param list resource_ids: The IDs of the records.
+        :return: A dict of each ID to its type.
+        :rtype: dict
+        """
+        types = {}
+        missing = []
+        with self._resource_types_lock:
+            for resource_id in resource_ids:
+                key = str(resource_id)
+                if key in self._resource_types:
+                    self._resource_types.move_to_end(key)
+                    types[resource_id] = self._resource_types[key]
+                else:
+                    missing.append(resource_id)
+
+        found = {}
+        if missing:
+            cursor = self._cursor()
+            missing = list(dict.fromkeys(missing))
+            for start in range(0, len(missing), IN_CLAUSE_SIZE):
+                ids = tuple(missing[start : start + IN_CLAUSE_SIZE])
+                placeholders = ", ".join(["%s"] * len(ids))
+                cursor.execute(
+                    f"SELECT resourceId, %s FROM Resources WHERE resourceId IN ({placeholders}) UNION ALL SELECT resourceComponentId, %s FROM ResourcesComponents WHERE resourceComponentId IN ({placeholders})",
+                    (ArchivistsToolkitClient.RESOURCE,)
+                    + ids
+                    + (ArchivistsToolkitClient.RESOURCE_COMPONENT,)
+                    + ids,
+                )
+                for record_id, record_type in cursor.fetchall():
+                    key = str(record_id)
+                    if found.get(key) != ArchivistsToolkitClient.RESOURCE:
+                        found[key] = record_type
+            self._remember_types(found)
+
+        for resource_id in missing:
+            types[resource_id] = found.get(str(resource_id))
+        return types
+
+    def _remember_types(self, types):
+        """Add the resources of ``types``, keyed by IDs as strings, to the memo
+        of record types.
+        """
+        with self._resource_types_lock:
+            for key, record_type in types.items():
+                if record_type != ArchivistsToolkitClient.RESOURCE:
+                    continue
+                self._resource_types[key] = record_type
+                self._resource_types.move_to_end(key)
+            while len(self._resource_types) > RESOURCE_TYPE_CACHE_SIZE:
+                self._resource_types.popitem(last=False)
+
+    @operation
     def edit_record(self, new_record):
         """
         Update a record in Archivist's Toolkit using the provided new_record.
@@ -90,15 +525,16 @@ class ArchivistsToolkitClient:
             db_type = "ResourcesComponents"
             db_id_field = "resourceComponentId"
         sql = f"UPDATE {db_type} SET {clause} WHERE {db_id_field}=%s"
-        cursor = self.db.cursor()
+        cursor = self._cursor()
         cursor.execute(sql, tuple(values))
 
+    @operation
     def get_levels_of_description(self):
         """
         Returns an array of all levels of description defined in this Archivist's Toolkit instance.
         """
         if not hasattr(self, "levels_of_description"):
-            cursor = self.db.cursor()
+            cursor = self._cursor()
             levels = set()
             cursor.execute("SELECT distinct(resourceLevel) FROM Resources")
             for row in cursor:
@@ -110,6 +546,7 @@ class ArchivistsToolkitClient:
 
         return self.levels_of_description
 
+    @operation
     def collection_list(self, resource_id, resource_type="collection"):
         """
         Fetches a list of all resource and component IDs within the specified resource.
@@ -121,28 +558,30 @@ class ArchivistsToolkitClient:
         :return: A list of longs representing the database resource IDs for all children of the requested record.
         :rtype list:
         """
-        ret = []
-
-        cursor = self.db.cursor()
-        if resource_type == "collection":
-            cursor.execute(
-                "SELECT resourceComponentId FROM ResourcesComponents WHERE parentResourceComponentId IS NULL AND resourceId=%s",
-                (resource_id),
-            )
-        else:
-            ret.append(resource_id)
-            cursor.execute(
-                "SELECT resourceComponentId FROM ResourcesComponents WHERE parentResourceComponentId=%s",
-                (resource_id),
-            )
+        is_resource = resource_type == "collection"
+        rows = self._load_subtree(self._cursor(), resource_id, is_resource)
+
+        # Siblings are listed by ID, the order in which MySQL returns them
+        # from the parent ID index.
+        ids = {row[0] for row in rows}
+        top_level = []
+        children = {}
+        for component_id, parent_id in sorted(rows):
+            if parent_id in ids:
+                children.setdefault(parent_id, []).append(component_id)
+            else:
+                top_level.append(component_id)
 
-        rows = cursor.fetchall()
-        if len(rows):
-            for row in rows:
-                ret.extend(self.collection_list(row[0], "description"))
+        ret = [] if is_resource else [resource_id]
+        stack = top_level[::-1]
+        while stack:
+            component_id = stack.pop()
+            ret.append(component_id)
+            stack.extend(reversed(children.get(component_id, [])))
 
         return ret
 
+    @operation
     def get_resource_component_children(self, resource_component_id):
         """
         Given a resource component, fetches detailed metadata for it and all of its children.
@@ -155,6 +594,7 @@ class ArchivistsToolkitClient:
             resource_component_id, "resource"
         )
 
+    @operation
     def get_resource_component_and_children(
         self, resource_id, resource_type="collection", level=1, sort_data=None, **kwargs
     ):
@@ -247,7 +687,7 @@ class ArchivistsToolkitClient:
 
         resource_data = {}
 
-        cursor = self.db.cursor()
+        cursor = self._cursor()
 
         if resource_type == "collection":
             cursor.execute(
@@ -281,44 +721,23 @@ class ArchivistsToolkitClient:
                 resource_data["identifier"] = row[2]
                 resource_data["levelOfDescription"] = row[3]
 
-        # fetch children if we haven't reached the maximum recursion level
-        if resource_type == "collection":
-            if query == "":
-                cursor.execute(
-                    "SELECT resourceComponentId FROM ResourcesComponents WHERE parentResourceComponentId IS NULL AND resourceId=%s ORDER BY FIND_IN_SET(resourceLevel, 'subseries,file'), title ASC",
-                    (resource_id),
-                )
-            else:
-                cursor.execute(
-                    "SELECT resourceComponentId FROM ResourcesComponents WHERE parentResourceComponentId IS NULL AND resourceId=%s AND (title LIKE %s OR persistentID LIKE %s) ORDER BY FIND_IN_SET(resourceLevel, 'subseries,file'), title ASC",
-                    (resource_id, "%" + query + "%", "%" + query + "%"),
-                )
-        else:
-            if query == "":
-                cursor.execute(
-                    "SELECT resourceComponentId FROM ResourcesComponents WHERE parentResourceComponentId=%s ORDER BY FIND_IN_SET(resourceLevel, 'subseries,file'), title ASC",
-                    (resource_id),
-                )
-            else:
-                cursor.execute(
-                    "SELECT resourceComponentId FROM ResourcesComponents WHERE parentResourceComponentId=%s AND (title LIKE %s OR persistentID LIKE %s) ORDER BY FIND_IN_SET(resourceLevel, 'subseries,file'), title ASC",
-                    (resource_id, "%" + query + "%", "%" + query + "%"),
-                )
-
-        rows = cursor.fetchall()
-
+        # Only the record's own children are limited by recurse_max_level and
+        # search_pattern; everything below them is always fetched in full.
+        is_resource = resource_type == "collection"
         if (not recurse_max_level) or level < recurse_max_level:
-            if len(rows):
-                resource_data["children"] = []
-                resource_data["has_children"] = True
-
-                for row in rows:
-                    resource_data["children"].append(
-                        self.get_resource_component_and_children(
-                            row[0], "description", level + 1, sort_data
-                        )
-                    )
+            rows = self._load_subtree(
+                cursor,
+                resource_id,
+                is_resource,
+                columns=COMPONENT_COLUMNS,
+                search_pattern=query,
+                order_by=CHILDREN_ORDER,
+            )
+            top_level, children = self._group_components(rows)
+            component_ids = [row[0] for row in rows]
         else:
+            top_level = component_ids = None
+            rows = self._load_children_ids(cursor, resource_id, is_resource, query)
             if len(rows):
                 resource_data["children"] = []
                 resource_data["has_children"] = True
@@ -326,54 +745,299 @@ class ArchivistsToolkitClient:
                 resource_data["children"] = False
                 resource_data["has_children"] = False
 
-        # TODO: implement fetching notes
-        resource_data["notes"] = []
+        # The notes of the record and all of its components at once.
+        if is_resource:
+            resource_notes, component_notes = self._load_notes(
+                cursor, [resource_id], component_ids or []
+            )
+            notes = resource_notes.get(str(resource_id), [])
+        else:
+            _, component_notes = self._load_notes(
+                cursor, [], [resource_id] + (component_ids or [])
+            )
+            notes = component_notes.get(str(resource_id), [])
+
+        if top_level:
+            resource_data["children"] = self._format_components(
+                top_level, children, sort_data, component_notes
+            )
+            resource_data["has_children"] = True
+
+        resource_data["notes"] = notes
 
         return resource_data
 
+    def _load_notes(self, cursor, resource_ids, component_ids):
+        """Fetch the notes of resources and components.
+
+        Notes are fetched for up to ``IN_CLAUSE_SIZE`` records per query, so
+        usually in a single query for a whole tree.
+
+        :return: Two dicts, of resource and of component IDs as strings to
+            lists of ``{"type": ..., "content": ...}`` notes, in order.
+        """
+        records = [(True, id) for id in resource_ids] + [
+            (False, id) for id in component_ids
+        ]
+        resource_notes = {}
+        component_notes = {}
+        for start in range(0, len(records), IN_CLAUSE_SIZE):
+            chunk = records[start : start + IN_CLAUSE_SIZE]
+            conditions = []
+            params = ()
+            for is_resource, column in (
+                (True, "r.resourceId"),
+                (False, "r.resourceComponentId"),
+            ):
+                ids = tuple(id for resource, id in chunk if resource == is_resource)
+                if not ids:
+                    continue
+                condition = "{} IN ({})".format(column, ", ".join(["%s"] * len(ids)))
+                if is_resource:
+                    condition = "(r.resourceComponentId IS NULL AND " + condition + ")"
+                conditions.append(condition)
+                params += ids
+            cursor.execute(
+                "SELECT r.resourceId, r.resourceComponentId, t.notesEtcLabel, r.noteContent FROM ArchDescriptionRepeatingData r "
+                "LEFT JOIN NotesEtcTypes t ON t.notesEtcTypeId = r.notesEtcTypeId "
+                f"WHERE r.descriminator = 'note' AND ({' OR '.join(conditions)}) "
+                "ORDER BY r.sequenceNumber, r.archDescriptionRepeatingDataId",
+                params,
+            )
+            for resource_id, component_id, note_type, content in cursor.fetchall():
+                if component_id is None:
+                    notes = resource_notes.setdefault(str(resource_id), [])
+                else:
+                    notes = component_notes.setdefault(str(component_id), [])
+                notes.append({"type": note_type, "content": content})
+        return resource_notes, component_notes
+
+    @staticmethod
+    def _group_components(rows):
+        """Split rows from ``_load_subtree`` into the top-level rows and a map
+        of parent ID to child rows, both in the order the rows came in.
+        """
+        ids = {row[0] for row in rows}
+        top_level = []
+        children = {}
+        for row in rows:
+            if row[1] in ids:
+                children.setdefault(row[1], []).append(row)
+            else:
+                top_level.append(row)
+        return top_level, children
+
+    def _format_components(self, rows, children, sort_data, notes):
+        """Format component rows, with ``COMPONENT_COLUMNS``, and their
+        descendants as in ``get_resource_component_and_children``.
+
+        Components are numbered in preorder from ``sort_data["position"]``,
+        and get their notes from ``notes``, as returned by ``_load_notes``.
+        """
+        formatted = []
+        for row in rows:
+            sort_data["position"] = sort_data["position"] + 1
+            component = {
+                "id": row[0],
+                "type": "resource_component",
+                "sortPosition": sort_data["position"],
+                "title": row[2],
+                "dates": row[3],
+                "date_expression": row[3],
+                "identifier": row[4],
+                "levelOfDescription": row[5],
+            }
+            if row[0] in children:
+                component["children"] = self._format_components(
+                    children[row[0]], children, sort_data, notes
+                )
+                component["has_children"] = True
+            component["notes"] = notes.get(str(row[0]), [])
+            formatted.append(component)
+        return formatted
+
+    def _load_children_ids(self, cursor, resource_id, is_resource, search_pattern=""):
+        if is_resource:
+            sql = "SELECT resourceComponentId FROM ResourcesComponents WHERE parentResourceComponentId IS NULL AND resourceId=%s"
+        else:
+            sql = "SELECT resourceComponentId FROM ResourcesComponents WHERE parentResourceComponentId=%s"
+        params = (resource_id,)
+        if search_pattern:
+            sql += " AND (title LIKE %s OR persistentID LIKE %s)"
+            params += ("%" + search_pattern + "%",) * 2
+        cursor.execute(sql + " ORDER BY " + CHILDREN_ORDER, params)
+        return cursor.fetchall()
+
+    def _cached_component(self, component_id):
+        """The parent and resource IDs of a component, from the cache, or None
+        if it, or one of its ancestors, isn't cached or has expired.
+        """
+        now = time.monotonic()
+        with self._components_lock:
+            path = []
+            key = str(component_id)
+            while True:
+                entry = self._components.get(key)
+                if entry is None or now - entry[2] > COMPONENT_CACHE_TTL:
+                    return None
+                self._components.move_to_end(key)
+                path.append(key)
+                parent_id, resource_id, _ = entry
+                if resource_id is not None:
+                    break
+                if parent_id is None:
+                    return None
+                key = str(parent_id)
+            for key in path[:-1]:
+                parent_id, _, loaded = self._components[key]
+                self._components[key] = (parent_id, resource_id, loaded)
+            return self._components[path[0]][0], resource_id
+
+    def _cache_components(self, rows):
+        now = time.monotonic()
+        with self._components_lock:
+            for component_id, parent_id, resource_id in rows:
+                key = str(component_id)
+                self._components[key] = (parent_id, resource_id, now)
+                self._components.move_to_end(key)
+            while len(self._components) > COMPONENT_CACHE_SIZE:
+                self._components.popitem(last=False)
+
+    def _load_ancestors(self, cursor, component_id):
+        """Find the parent and resource IDs of a component, and cache them.
+
+        The component's ancestors are fetched in a single recursive query
+        where the server supports it. Otherwise they're fetched one query per
+        level, and the parents of all components of the resource are then
+        loaded too, so later lookups within that resource need no queries;
+        unless it has more components than the cache holds, in which case
+        only the ancestors are cached.
+
+        :return: The component's parent and resource IDs, or None if it
+            isn't in the database.
+        """
+        # The rows of the component and its ancestors go in ``rows``, keyed
+        # by ID as a string.
+        columns = "resourceComponentId, parentResourceComponentId, resourceId"
+        recursive = self._supports_recursive_queries()
+        if recursive:
+            cursor.execute(
+                f"WITH RECURSIVE ancestors AS ("
+                f"SELECT {columns} FROM ResourcesComponents WHERE resourceComponentId=%s "
+                f"UNION ALL SELECT c.resourceComponentId, c.parentResourceComponentId, "
+                f"c.resourceId FROM ResourcesComponents c "
+                f"JOIN ancestors a ON c.resourceComponentId = a.parentResourceComponentId"
+                f") SELECT {columns} FROM ancestors",
+                (component_id,),
+            )
+            rows = {str(row[0]): row for row in cursor.fetchall()}
+        else:
+            rows = {}
+            ancestor_id = component_id
+            while ancestor_id is not None:
+                cached = self._cached_component(ancestor_id)
+                if cached is not None:
+                    rows[str(ancestor_id)] = (ancestor_id,) + cached
+                    break
+                cursor.execute(
+                    f"SELECT {columns} FROM ResourcesComponents WHERE resourceComponentId=%s",
+                    (ancestor_id,),
+                )
+                row = cursor.fetchone()
+                if row is None:
+                    break
+                rows[str(row[0])] = row
+                ancestor_id = row[1]
+        self._cache_components(rows.values())
+
+        row = rows.get(str(component_id))
+        if row is None:
+            return None
+        parent_id = row[1]
+        while row[2] is None:
+            row = rows.get(str(row[1]))
+            if row is None:
+                return None
+        resource_id = row[2]
+        if not recursive:
+            self._preload_resource(cursor, resource_id)
+        return parent_id, resource_id
+
+    def _preload_resource(self, cursor, resource_id):
+        """Cache the parents of every component of a resource, unless it has
+        more than ``COMPONENT_CACHE_SIZE`` of them.
+
+        Resources found to be larger aren't tried again for
+        ``COMPONENT_CACHE_TTL`` seconds.
+        """
+        key = str(resource_id)
+        now = time.monotonic()
+        with self._components_lock:
+            found = self._large_resources.get(key)
+            if found is not None and now - found <= COMPONENT_CACHE_TTL:
+                return
+            self._large_resources.pop(key, None)
+        rows = self._load_subtree(
+            cursor, resource_id, columns=("resourceId",), limit=COMPONENT_CACHE_SIZE
+        )
+        if rows is None:
+            with self._components_lock:
+                self._large_resources[key] = now
+        else:
+            self._cache_components(rows)
+
+    def _resolve_component(self, component_id):
+        found = self._cached_component(component_id)
+        if found is None:
+            found = self._load_ancestors(self._cursor(), component_id)
+        if found is None:
+            raise ArchivistsToolkitError(
+                f"Could not find the resource of component {component_id}; not in database?"
+            )
+        return found
+
+    @operation
     def find_resource_id_for_component(self, component_id):
         """
         Given the ID of a component, returns the parent resource ID.
 
         If the immediate parent of the component is itself a component, this method will progress up the tree until a resource is found.
 
+        The component and its ancestors are cached. Without recursive
+        queries, so are the parents of every component of the resource, so
+        later lookups within the same resource don't query the database.
+        The client remembers the parents of up to
+        ``COMPONENT_CACHE_SIZE`` components, for ``COMPONENT_CACHE_TTL``
+        seconds, so components moved by other clients may be reported at
+        their old place until then.
+
         :param long component_id: The ID of the ResourceComponent.
         :return: The ID of the component's parent resource.
         :rtype: long
+        :raises ArchivistsToolkitError: if the component isn't in the database.
         """
-        cursor = self.db.cursor()
-
-        sql = "SELECT resourceId, parentResourceComponentId FROM ResourcesComponents WHERE resourceComponentId=%s"
-        cursor.execute(sql, (component_id,))
-        resource_id, parent_id = cursor.fetchone()
-
-        if resource_id is None:
-            return self.find_resource_id_for_component(parent_id)
-        else:
-            return resource_id
+        return self._resolve_component(component_id)[1]
 
+    @operation
     def find_parent_id_for_component(self, component_id):
         """
         Given the ID of a component, returns the parent component's ID.
 
+        Parents are cached as in ``find_resource_id_for_component``.
+
         :param string component_id: The ID of the component.
         :return: A tuple containing:
             * The type of the parent record; valid values are ArchivesSpaceClient.RESOURCE and ArchivesSpaceClient.RESOURCE_COMPONENT.
             * The ID of the parent record.
         :rtype tuple:
+        :raises ArchivistsToolkitError: if the component isn't in the database.
         """
-        cursor = self.db.cursor()
-
-        sql = "SELECT parentResourceComponentId FROM ResourcesComponents WHERE resourceComponentId=%s"
-        count = cursor.execute(sql, (component_id,))
-        if count > 0:
-            return (ArchivistsToolkitClient.RESOURCE_COMPONENT, cursor.fetchone())
-
-        return (
-            ArchivistsToolkitClient.RESOURCE,
-            self.find_resource_id_for_component(component_id),
-        )
+        parent_id, resource_id = self._resolve_component(component_id)
+        if parent_id is None:
+            return (ArchivistsToolkitClient.RESOURCE, resource_id)
+        return (ArchivistsToolkitClient.RESOURCE_COMPONENT, parent_id)
 
+    @operation
     def find_collection_ids(
         self, search_pattern="", identifier="", page=None, page_size=30
     ):
@@ -392,39 +1056,98 @@ class ArchivistsToolkitClient:
         :return: A list containing every matched resource's ID.
         :rtype: list
         """
-        cursor = self.db.cursor()
-
-        if search_pattern == "" and identifier == "":
-            sql = "SELECT resourceId FROM Resources ORDER BY title"
-            params = ()
-        else:
-            clause = "resourceid LIKE %s"
-            params = ["%" + search_pattern + "%"]
-
-            if search_pattern != "":
-                clause = "title LIKE %s OR" + clause
-                params.insert(0, "%" + search_pattern + "%")
-
-            if identifier != "":
-                clause = "resourceIdentifier1 LIKE %s OR " + clause
-                params.insert(0, "%" + identifier + "%")
-
-            params = tuple(params)
-
-            sql = f"SELECT resourceId FROM Resources WHERE ({clause}) AND resourceLevel in ('recordgrp', 'collection') ORDER BY title"
+        sql, params = self._collection_ids_query(search_pattern, identifier)
 
         if page is not None:
             start = (page - 1) * page_size
             sql = sql + f" LIMIT {start},{page_size}"
 
+        cursor = self._cursor()
         cursor.execute(sql, params)
 
         return [r[0] for r in cursor]
 
+    # The iter_ methods aren't operations: their spans would end as soon as
+    # the generator is created. Their statements are still instrumented.
+    def iter_collection_ids(self, search_pattern="", identifier=""):
+        """
+        Yields the ID of every resource matching the search, like ``find_collection_ids``.
+
+        IDs are streamed from the database as they're read rather than
+        loaded at once, so memory use doesn't grow with the number of
+        resources. Unless the client has a pool, it can't run other queries
+        until the iterator is exhausted or closed; with one, the iterator
+        holds a connection of its own, so the pool needs at least two.
+        """
+        sql, params = self._collection_ids_query(search_pattern, identifier)
+        for row in self._stream(sql, params):
+            yield row[0]
+
+    def _collection_ids_query(self, search_pattern, identifier):
+        where, params = self._collection_filter(search_pattern, identifier)
+        return f"SELECT resourceId FROM Resources{where} ORDER BY title", params
+
+    def _collection_filter(self, search_pattern, identifier):
+        """The WHERE clause and parameters selecting the resources matching a search.
+
+        Shared by ``find_collection_ids`` and ``count_collections``.
+        """
+        if search_pattern == "" and identifier == "":
+            return "", ()
+
+        clause = "resourceid LIKE %s"
+        params = ["%" + search_pattern + "%"]
+
+        if search_pattern != "":
+            clause = "title LIKE %s OR " + clause
+            params.insert(0, "%" + search_pattern + "%")
+
+        if identifier != "":
+            clause = "resourceIdentifier1 LIKE %s OR " + clause
+            params.insert(0, "%" + identifier + "%")
+
+        return (
+            f" WHERE ({clause}) AND resourceLevel in ('recordgrp', 'collection')",
+            tuple(params),
+        )
+
+    def iter_components(self):
+        """
+        Yields every resource component in the database, ordered by ID.
+
+        Components are streamed from the database as they're read, so a full
+        export runs in constant memory. Unless the client has a pool, it
+        can't run other queries until the iterator is exhausted or closed;
+        with one, the iterator holds a connection of its own, so the pool
+        needs at least two.
+
+        :return: Dicts with the component's ``id``, ``parent_id`` (None for
+            top-level components), ``resource_id`` (only set for top-level
+            components; see ``find_resource_id_for_component``), ``title``,
+            ``dates``, ``date_expression``, ``identifier`` and
+            ``levelOfDescription``.
+        """
+        rows = self._stream(
+            "SELECT resourceComponentId, parentResourceComponentId, resourceId, title, dateExpression, persistentID, resourceLevel FROM ResourcesComponents ORDER BY resourceComponentId"
+        )
+        for row in rows:
+            yield {
+                "id": row[0],
+                "parent_id": row[1],
+                "resource_id": row[2],
+                "title": row[3],
+                "dates": row[4],
+                "date_expression": row[4],
+                "identifier": row[5],
+                "levelOfDescription": row[6],
+            }
+
+    @operation
     def find_by_id(self, object_type, field, value):
         """Find resource by a specific ID."""
         raise NotImplementedError("Archivist's Toolkit does not implement find_by_id")
 
+    @operation
     def augment_resource_ids(self, resource_ids):
         """
         Given a list of resource IDs, returns a list of dicts containing detailed information about the specified resources and their children.
@@ -435,40 +1158,70 @@ class ArchivistsToolkitClient:
         :return: A list containing metadata dicts.
         :rtype: list
         """
+        resource_ids = list(resource_ids)
         resources_augmented = []
-        for id in resource_ids:
-            resources_augmented.append(
-                self.get_resource_component_and_children(id, recurse_max_level=2)
+        for start in range(0, len(resource_ids), IN_CLAUSE_SIZE):
+            resources_augmented.extend(
+                self._augment_resource_ids(resource_ids[start : start + IN_CLAUSE_SIZE])
             )
-
         return resources_augmented
 
-    def _query_table(self, cursor, sql, resource_id, is_resource=True):
-        if is_resource:
-            table = "Resources"
-            id_column = "resourceId"
-        else:
-            table = "ResourcesComponents"
-            id_column = "resourceComponentId"
-        cursor.execute(sql.format(table, id_column), (resource_id,))
-        return cursor.fetchone()
-
-    def _fetch_dates(self, cursor, resource_id, is_resource=True):
-        return self._query_table(
-            cursor,
-            "SELECT dateBegin, dateEnd, dateExpression FROM {} WHERE {}=%s",
-            resource_id,
-            is_resource=is_resource,
+    def _augment_resource_ids(self, resource_ids):
+        # Equivalent to get_resource_component_and_children(id,
+        # recurse_max_level=2) for each ID, with the resources and all of
+        # their components fetched at once.
+        cursor = self._cursor()
+        placeholders = ", ".join(["%s"] * len(resource_ids))
+        cursor.execute(
+            f"SELECT resourceId, title, dateExpression, resourceIdentifier1, resourceLevel FROM Resources WHERE resourceId IN ({placeholders})",
+            tuple(resource_ids),
         )
+        # IDs are matched as strings, as callers may pass them as either.
+        resources = {str(row[0]): row for row in cursor.fetchall()}
 
-    def _fetch_title(self, cursor, resource_id, is_resource=True):
-        return self._query_table(
+        rows = self._load_subtree(
             cursor,
-            "SELECT title FROM {} WHERE {}=%s",
-            resource_id,
-            is_resource=is_resource,
+            list(resource_ids),
+            columns=COMPONENT_COLUMNS + ("resourceId",),
+            order_by=CHILDREN_ORDER,
+        )
+        top_level, children = self._group_components(rows)
+        top_level_by_resource = {}
+        for row in top_level:
+            top_level_by_resource.setdefault(str(row[6]), []).append(row)
+        resource_notes, component_notes = self._load_notes(
+            cursor, resource_ids, [row[0] for row in rows]
         )
 
+        resources_augmented = []
+        for resource_id in resource_ids:
+            resource_data = {}
+            if str(resource_id) in resources:
+                row = resources[str(resource_id)]
+                resource_data.update(
+                    id=resource_id,
+                    type="resource",
+                    sortPosition=1,
+                    title=row[1],
+                    dates=row[2],
+                    date_expression=row[2],
+                    identifier=row[3],
+                    levelOfDescription=row[4],
+                )
+            if str(resource_id) in top_level_by_resource:
+                resource_data["children"] = self._format_components(
+                    top_level_by_resource[str(resource_id)],
+                    children,
+                    {"position": 1},
+                    component_notes,
+                )
+                resource_data["has_children"] = True
+            resource_data["notes"] = resource_notes.get(str(resource_id), [])
+            resources_augmented.append(resource_data)
+
+        return resources_augmented
+
+    @operation
     def add_digital_object(
         self,
         parent_archival_object,
@@ -488,151 +1241,239 @@ class ArchivistsToolkitClient:
         format_version=None,
         inherit_dates=False,
     ):
-        cursor = self.db.cursor()
-        time_now = strftime("%Y-%m-%d %H:%M:%S", localtime())
+        """
+        Creates a new digital object attached to a resource or component.
 
-        is_resource = self.resource_type(parent_archival_object) == "resource"
+        See ``add_digital_objects`` to add many at once.
+        """
+        digital_object = dict(locals())
+        del digital_object["self"]
+        self.add_digital_objects([digital_object])
 
-        cursor.execute(
-            "SELECT MAX(archDescriptionInstancesId) FROM ArchDescriptionInstances"
-        )
-        archdesc_id = cursor.fetchone()[0] + 1
-        cursor.execute("SELECT repositoryId FROM Repositories")
-        repo_id = cursor.fetchone()[0]
-        cursor.execute("SELECT MAX(fileVersionId) FROM FileVersions")
-        file_version_id = cursor.fetchone()[0] + 1
-        cursor.execute(
-            "SELECT MAX(archdescriptionrepeatingdataId) FROM ArchDescriptionRepeatingData"
-        )
-        new_desc_repeat_id = cursor.fetchone()[0] + 1
+    @operation
+    def add_digital_objects(self, digital_objects):
+        """
+        Creates many digital objects in a single transaction.
 
-        if is_resource:
-            sql = "INSERT INTO ArchDescriptionInstances (archDescriptionInstancesId, instanceDescriminator, instanceType, resourceId) VALUES (%s, 'digital', 'Digital object', %s)"
-        else:
-            sql = "INSERT INTO ArchDescriptionInstances (archDescriptionInstancesId, instanceDescriminator, instanceType, resourceComponentId) VALUES (%s, 'digital', 'Digital object', %s)"
-        cursor.execute(sql, (archdesc_id, parent_archival_object))
+        The IDs of the new rows are reserved once for the whole batch, with
+        the tables' last IDs locked until the transaction ends so that
+        concurrent ingests can't allocate the same IDs, and the rows of each
+        table are inserted with a single ``executemany``. Nothing is written
+        if any insert fails.
 
-        if inherit_dates:
-            start_date, end_date, date_expression = self._fetch_dates(
-                cursor, parent_archival_object, is_resource=is_resource
-            )
-        else:
-            start_date = end_date = date_expression = None
+        :param list digital_objects: Dicts of the keyword arguments of
+            ``add_digital_object``, one per digital object.
+        :return: The IDs of the new DigitalObjects, in the same order.
+        :rtype: list
+        :raises ArchivistsToolkitError: if a parent isn't in the database, in
+            which case nothing is written.
+        """
+        signature = inspect.signature(self.add_digital_object)
+        objects = []
+        for kwargs in digital_objects:
+            bound = signature.bind(**kwargs)
+            bound.apply_defaults()
+            objects.append(bound.arguments)
+        if not objects:
+            return []
 
-        if not title:
-            filename = os.path.basename(uri) if uri is not None else "Untitled"
-            (title,) = self._fetch_title(
-                cursor, parent_archival_object, is_resource=is_resource
+        time_now = strftime("%Y-%m-%d %H:%M:%S", localtime())
+        db = self.db
+        cursor = self._cursor()
+        db.begin()
+        try:
+            parents = self._load_parents(
+                cursor, [o["parent_archival_object"] for o in objects]
+            )
+            for o in objects:
+                if str(o["parent_archival_object"]) not in parents:
+                    raise ArchivistsToolkitError(
+                        f"Could not find record {o['parent_archival_object']}; not in database?"
+                    )
+            cursor.execute("SELECT repositoryId FROM Repositories")
+            repo_id = cursor.fetchone()[0]
+            archdesc_id = self._reserve_ids(
+                cursor, "ArchDescriptionInstances", "archDescriptionInstancesId"
+            )
+            do_id = self._reserve_ids(cursor, "DigitalObjects", "digitalObjectId")
+            file_version_id = self._reserve_ids(cursor, "FileVersions", "fileVersionId")
+            new_desc_repeat_id = self._reserve_ids(
+                cursor,
+                "ArchDescriptionRepeatingData",
+                "archDescriptionRepeatingDataId",
             )
-            title = title or filename
-
-        sql = """INSERT INTO DigitalObjects
-           (`version`,`lastUpdated`,`created`,`lastUpdatedBy`,`createdBy`,`title`,
-            `dateExpression`,`dateBegin`,`dateEnd`,`languageCode`,`restrictionsApply`,
-            `eadDaoActuate`,`eadDaoShow`,`metsIdentifier`,`objectType`,`label`,
-            `objectOrder`,`archDescriptionInstancesId`,`repositoryId`)
-            VALUES (1, %s, %s, %s, %s, %s, %s, %s, %s, 'English', %s, %s, %s, %s, %s,' ',  0, %s, %s)"""
-        cursor.execute(
-            sql,
-            (
-                time_now,
-                time_now,
-                self.user,
-                self.user,
-                title,
-                date_expression,
-                start_date,
-                end_date,
-                int(restricted),
-                xlink_actuate,
-                xlink_show,
-                identifier,
-                object_type,
-                archdesc_id,
-                repo_id,
-            ),
-        )
-        do_id = cursor.lastrowid
 
-        sql = """INSERT INTO FileVersions (fileVersionId, version, lastUpdated, created, lastUpdatedBy, createdBy, uri, useStatement, sequenceNumber, eadDaoActuate,eadDaoShow, digitalObjectId)
-            VALUES (%s, 1, %s, %s, %s, %s, %s, %s, 0, %s, %s, %s)"""
-        cursor.execute(
-            sql,
-            (
-                file_version_id,
-                time_now,
-                time_now,
-                self.user,
-                self.user,
-                uri,
-                use_statement,
-                0,
-                xlink_actuate,
-                xlink_show,
-                do_id,
-            ),
-        )
+            resource_instances = []
+            component_instances = []
+            digital_object_rows = []
+            file_version_rows = []
+            note_rows = []
+            do_ids = []
+            for o in objects:
+                is_resource, parent_title, start_date, end_date, date_expression = (
+                    parents[str(o["parent_archival_object"])]
+                )
+                instances = resource_instances if is_resource else component_instances
+                instances.append((archdesc_id, o["parent_archival_object"]))
+
+                if not o["inherit_dates"]:
+                    start_date = end_date = date_expression = None
+
+                title = o["title"]
+                if not title:
+                    uri = o["uri"]
+                    filename = os.path.basename(uri) if uri is not None else "Untitled"
+                    title = parent_title or filename
+
+                digital_object_rows.append(
+                    (
+                        do_id,
+                        time_now,
+                        time_now,
+                        self.user,
+                        self.user,
+                        title,
+                        date_expression,
+                        start_date,
+                        end_date,
+                        int(o["restricted"]),
+                        o["xlink_actuate"],
+                        o["xlink_show"],
+                        o["identifier"],
+                        o["object_type"],
+                        archdesc_id,
+                        repo_id,
+                    )
+                )
+                file_version_rows.append(
+                    (
+                        file_version_id,
+                        time_now,
+                        time_now,
+                        self.user,
+                        self.user,
+                        o["uri"],
+                        o["use_statement"],
+                        o["xlink_actuate"],
+                        o["xlink_show"],
+                        do_id,
+                    )
+                )
 
-        seq_num = 0
-        sql = """INSERT INTO ArchDescriptionRepeatingData
-            (archDescriptionRepeatingDataId, descriminator, version, lastUpdated, created, lastUpdatedBy ,createdBy, repeatingDataType, title, sequenceNumber,
-            eadIngestProblem, digitalObjectId, noteContent, notesEtcTypeId, basic, multiPart, internalOnly)
-            VALUES (%s, 'note', 0, %s, %s, %s, %s, 'Note', '', %s, '', %s, %s, %s, '', '', '')"""
-        # existence and location of originals note
-        if location_of_originals is not None:
-            cursor.execute(
-                sql,
-                (
-                    new_desc_repeat_id,
-                    time_now,
-                    time_now,
-                    self.user,
-                    self.user,
-                    seq_num,
-                    do_id,
-                    location_of_originals,
-                    13,
-                ),
+                # Existence and location of originals, conditions governing
+                # access and conditions governing use notes.
+                seq_num = 0
+                for content, note_type in (
+                    (o["location_of_originals"], 13),
+                    (o["access_conditions"], 8),
+                    (o["use_conditions"], 9),
+                ):
+                    if content is None:
+                        continue
+                    note_rows.append(
+                        (
+                            new_desc_repeat_id,
+                            time_now,
+                            time_now,
+                            self.user,
+                            self.user,
+                            seq_num,
+                            do_id,
+                            content,
+                            note_type,
+                        )
+                    )
+                    new_desc_repeat_id += 1
+                    seq_num += 1
+
+                do_ids.append(do_id)
+                archdesc_id += 1
+                do_id += 1
+                file_version_id += 1
+
+            if resource_instances:
+                cursor.executemany(
+                    "INSERT INTO ArchDescriptionInstances (archDescriptionInstancesId, instanceDescriminator, instanceType, resourceId) VALUES (%s, 'digital', 'Digital object', %s)",
+                    resource_instances,
+                )
+            if component_instances:
+                cursor.executemany(
+                    "INSERT INTO ArchDescriptionInstances (archDescriptionInstancesId, instanceDescriminator, instanceType, resourceComponentId) VALUES (%s, 'digital', 'Digital object', %s)",
+                    component_instances,
+                )
+            cursor.executemany(
+                """INSERT INTO DigitalObjects
+               (`digitalObjectId`,`version`,`lastUpdated`,`created`,`lastUpdatedBy`,`createdBy`,`title`,
+                `dateExpression`,`dateBegin`,`dateEnd`,`languageCode`,`restrictionsApply`,
+                `eadDaoActuate`,`eadDaoShow`,`metsIdentifier`,`objectType`,`label`,
+                `objectOrder`,`archDescriptionInstancesId`,`repositoryId`)
+                VALUES (%s, 1, %s, %s, %s, %s, %s, %s, %s, %s, 'English', %s, %s, %s, %s, %s,' ',  0, %s, %s)""",
+                digital_object_rows,
             )
-            new_desc_repeat_id += 1
-            seq_num += 1
-
-        # conditions governing access note
-        if access_conditions is not None:
-            cursor.execute(
-                sql,
-                (
-                    new_desc_repeat_id,
-                    time_now,
-                    time_now,
-                    self.user,
-                    self.user,
-                    seq_num,
-                    do_id,
-                    access_conditions,
-                    8,
-                ),
+            cursor.executemany(
+                """INSERT INTO FileVersions (fileVersionId, version, lastUpdated, created, lastUpdatedBy, createdBy, uri, useStatement, sequenceNumber, eadDaoActuate,eadDaoShow, digitalObjectId)
+                VALUES (%s, 1, %s, %s, %s, %s, %s, %s, 0, %s, %s, %s)""",
+                file_version_rows,
             )
-            new_desc_repeat_id += 1
-            seq_num += 1
+            if note_rows:
+                cursor.executemany(
+                    """INSERT INTO ArchDescriptionRepeatingData
+                    (archDescriptionRepeatingDataId, descriminator, version, lastUpdated, created, lastUpdatedBy ,createdBy, repeatingDataType, title, sequenceNumber,
+                    eadIngestProblem, digitalObjectId, noteContent, notesEtcTypeId, basic, multiPart, internalOnly)
+                    VALUES (%s, 'note', 0, %s, %s, %s, %s, 'Note', '', %s, '', %s, %s, %s, '', '', '')""",
+                    note_rows,
+                )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
 
-        # conditions governing use note
-        if use_conditions is not None:
-            cursor.execute(
-                sql,
-                (
-                    new_desc_repeat_id,
-                    time_now,
-                    time_now,
-                    self.user,
-                    self.user,
-                    seq_num,
-                    do_id,
-                    use_conditions,
-                    9,
-                ),
-            )
+        return do_ids
+
+    def _reserve_ids(self, cursor, table, id_column):
+        """Return the next ID of ``table``, locking its last ID until the
+        transaction ends so that concurrent inserts wait for it to commit.
+        """
+        cursor.execute(f"SELECT MAX({id_column}) FROM {table} FOR UPDATE")
+        return (cursor.fetchone()[0] or 0) + 1
+
+    def _load_parents(self, cursor, parent_ids):
+        """Fetch the records digital objects are attached to.
+
+        :return: A dict of each ID, as a string, to whether it's a resource
+            and its title, begin and end dates and date expression. IDs of
+            both a resource and a component refer to the resource, as in
+            ``resource_type``.
+        """
+        parents = {}
+        remaining = list(dict.fromkeys(parent_ids))
+        for table, id_column, is_resource in (
+            ("Resources", "resourceId", True),
+            ("ResourcesComponents", "resourceComponentId", False),
+        ):
+            for start in range(0, len(remaining), IN_CLAUSE_SIZE):
+                ids = remaining[start : start + IN_CLAUSE_SIZE]
+                placeholders = ", ".join(["%s"] * len(ids))
+                cursor.execute(
+                    f"SELECT {id_column}, title, dateBegin, dateEnd, dateExpression FROM {table} WHERE {id_column} IN ({placeholders})",
+                    tuple(ids),
+                )
+                for row in cursor.fetchall():
+                    parents[str(row[0])] = (is_resource,) + tuple(row[1:])
+            remaining = [id for id in remaining if str(id) not in parents]
+            if not remaining:
+                break
+        self._remember_types(
+            {
+                key: ArchivistsToolkitClient.RESOURCE
+                if parent[0]
+                else ArchivistsToolkitClient.RESOURCE_COMPONENT
+                for key, parent in parents.items()
+            }
+        )
+        return parents
 
+    @operation
     def add_digital_object_component(
         self,
         parent_digital_object,
@@ -644,9 +1485,14 @@ class ArchivistsToolkitClient:
             "Archivist's Toolkit does not have digital object components"
         )
 
+    @operation
     def count_collections(self, search_pattern="", identifier=""):
-        return len(self.find_collection_ids(search_pattern, identifier))
+        where, params = self._collection_filter(search_pattern, identifier)
+        cursor = self._cursor()
+        cursor.execute(f"SELECT COUNT(*) FROM Resources{where}", params)
+        return cursor.fetchone()[0]
 
+    @operation
     def find_collections(self, search_pattern="", identifier="", page=1, page_size=30):
         return self.augment_resource_ids(
             self.find_collection_ids(
@@ -654,6 +1500,7 @@ class ArchivistsToolkitClient:
             )
         )
 
+    @operation
     def delete_record(self, record_id):
         raise NotImplementedError(
             "ArchivistsToolkitClient does not currently implement deleting records."
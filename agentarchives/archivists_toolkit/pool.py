@@ -0,0 +1,187 @@
+"""Bounded, thread-safe pool of database connections.
+
+A MySQLdb connection can't be used by two threads at once, and is dropped by
+the server after ``wait_timeout`` seconds of inactivity. ``ConnectionPool``
+hands each caller a connection of its own, opening at most ``max_size`` of
+them, and pings connections that sat idle for longer than ``check_after``
+seconds before handing them out again, replacing those that fail::
+
+    pool = ConnectionPool(lambda: MySQLdb.connect(**kwargs), max_size=4)
+    with pool.connection() as db:
+        cursor = db.cursor()
+        ...
+
+Each ``connection()`` block is a transaction: it is committed when the block
+exits normally and rolled back when it raises.
+"""
+
+import contextlib
+import logging
+import os
+import threading
+import time
+
+__all__ = ["ConnectionPool", "PoolTimeout"]
+
+LOGGER = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """No connection became available in time."""
+
+
+class ConnectionPool:
+    """Thread-safe pool of at most ``max_size`` connections opened by ``connect``.
+
+    :param connect: Function returning a new DB-API connection.
+    :param int max_size: Maximum number of connections open at once.
+    :param int check_after: Seconds a connection may sit idle before it is
+        pinged when checked out again.
+    :param float timeout: Default seconds to wait for a connection when all
+        of them are in use; None waits forever.
+    :param clock: Function returning the current time in seconds; defaults to
+        ``time.monotonic``.
+    """
+
+    def __init__(
+        self, connect, max_size=5, check_after=60, timeout=None, clock=time.monotonic
+    ):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.check_after = check_after
+        self.timeout = timeout
+        self._connect = connect
+        self._clock = clock
+        self._condition = threading.Condition()
+        # Idle connections and when they were last used, most recent last, so
+        # that the connections in use are kept warm and the others time out.
+        self._idle = []
+        self._size = 0
+        self._pid = os.getpid()
+        # Connections inherited from a parent process; see ``_check_pid``.
+        self._inherited = []
+
+    def _check_pid(self):
+        # A connection inherited across a fork shares its socket with the
+        # parent. It is kept referenced rather than closed, because closing it
+        # would send a quit message over the parent's connection.
+        if self._pid != os.getpid():
+            self._inherited.extend(connection for connection, _ in self._idle)
+            self._idle = []
+            self._size = 0
+            self._pid = os.getpid()
+
+    def acquire(self, timeout=None):
+        """Check out a connection, opening one if none is idle.
+
+        :param float timeout: Seconds to wait if all connections are in use;
+            defaults to the pool's ``timeout``.
+        :raises PoolTimeout: if no connection became available in time.
+        """
+        if timeout is None:
+            timeout = self.timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        connection = last_used = None
+        with self._condition:
+            self._check_pid()
+            while True:
+                if self._idle:
+                    connection, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise PoolTimeout(
+                        f"No connection available after {timeout}s; all "
+                        f"{self.max_size} are in use"
+                    )
+                self._condition.wait(remaining)
+
+        try:
+            if connection is None:
+                return self._connect()
+            if self._clock() - last_used > self.check_after:
+                try:
+                    connection.ping()
+                except Exception:
+                    LOGGER.info("Replacing pooled connection that failed its ping")
+                    self._close(connection)
+                    connection = None
+                    return self._connect()
+            return connection
+        except Exception:
+            self._discard(connection)
+            raise
+
+    def release(self, connection, discard=False):
+        """Return a connection to the pool, or close it if ``discard`` is true."""
+        if discard:
+            self._discard(connection)
+            return
+        with self._condition:
+            self._idle.append((connection, self._clock()))
+            self._condition.notify()
+
+    def _discard(self, connection):
+        if connection is not None:
+            self._close(connection)
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.close()
+        except Exception:
+            LOGGER.debug("Error closing pooled connection", exc_info=True)
+
+    @contextlib.contextmanager
+    def connection(self, timeout=None):
+        """Check out a connection for the duration of a transaction.
+
+        The transaction is committed when the block exits normally and rolled
+        back when it raises. Connections that fail to commit or roll back are
+        closed rather than returned to the pool.
+        """
+        connection = self.acquire(timeout)
+        try:
+            yield connection
+        except BaseException:
+            try:
+                connection.rollback()
+            except Exception:
+                LOGGER.debug("Error rolling back pooled connection", exc_info=True)
+                self.release(connection, discard=True)
+            else:
+                self.release(connection)
+            raise
+        try:
+            connection.commit()
+        except Exception:
+            self.release(connection, discard=True)
+            raise
+        self.release(connection)
+
+    def close(self):
+        """Close the idle connections; those in use are closed on release."""
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for connection, _ in idle:
+            self._close(connection)
+
+    @property
+    def size(self):
+        """Number of open connections, idle or in use."""
+        with self._condition:
+            return self._size
+
+    @property
+    def idle(self):
+        """Number of idle connections."""
+        with self._condition:
+            return len(self._idle)
@@ -1,16 +1,33 @@
 import json
 import logging
+import operator
+import os
 import re
 from urllib.parse import urljoin
 
-import requests
-
 from .. import DEFAULT_TIMEOUT
+from .._session import warm_up
+from ..instrumentation import Instrumented
+from ..instrumentation import operation
 
 __all__ = ["AtomError", "ConnectionError", "AuthenticationError", "AtomClient"]
 
 LOGGER = logging.getLogger(__name__)
 
+# Sort key of formatted records when sorting by title.
+by_title = operator.itemgetter("title")
+
+# Characters escaped by _escape_lucene_query, besides the "&&" and "||" operators.
+LUCENE_SPECIAL_CHARACTERS = "'\" +-!(){}[]^~?:\\/"
+LUCENE_ESCAPE_TABLE = str.maketrans({c: "\\" + c for c in LUCENE_SPECIAL_CHARACTERS})
+
+# Placeholders for the variable part of API paths in instrumented routes.
+ROUTE_TEMPLATES = (
+    (re.compile(r"^informationobjects/tree/[^/]+"), "informationobjects/tree/{slug}"),
+    (re.compile(r"^informationobjects/[^/]+"), "informationobjects/{slug}"),
+    (re.compile(r"^taxonomies/[^/]+"), "taxonomies/{id}"),
+)
+
 
 class AtomError(Exception):
     pass
@@ -31,7 +48,7 @@ class CommunicationError(AtomError):
         super().__init__(message)
 
 
-class AtomClient:
+class AtomClient(Instrumented):
     """
     Client to communicate with a remote AtoM installation using its backend API.
 
@@ -42,25 +59,82 @@ class AtomClient:
     This change is due to the fact that slugs are visible by users whereas IDs aren't.
     """
 
-    def __init__(self, url, key, timeout=DEFAULT_TIMEOUT):
+    def __init__(
+        self, url, key, timeout=DEFAULT_TIMEOUT, warm_connections=0, profile_dir=None
+    ):
+        """Create a new client.
+
+        ``warm_connections`` is passed to ``warm_up`` to open that many
+        connections up front.
+
+        ``profile_dir`` enables profiling of each operation, writing the
+        results to that directory; see ``agentarchives.profiling``.
+        """
         self.key = key
         self.base_url = urljoin(url, "api/")
         self.timeout = timeout
+        self._session = None
+        self._session_pid = None
+        self._init_instrumentation("atom", profile_dir)
+        if warm_connections:
+            self.warm_up(warm_connections)
+
+    def __getstate__(self):
+        """Pickle the client as its configuration; the session is rebuilt on use."""
+        state = self.__dict__.copy()
+        state["_session"] = None
+        state["_session_pid"] = None
+        return self._instrumentation_state(state)
+
+    @property
+    def session(self):
+        """The ``requests.Session`` that sends the API key on each request.
+
+        A new session is created whenever the client is used from a different
+        process than the one that created the current session, since pooled
+        connections can't be shared across a fork.
+        """
+        pid = os.getpid()
+        if self._session is None or self._session_pid != pid:
+            # requests is imported on first use to keep importing this package cheap.
+            import requests
 
-        # Create session that will send the access token on each request
-        self.session = requests.Session()
-        self.session.headers.update({"REST-API-Key": self.key})
+            self._session = requests.Session()
+            self._session.headers.update({"REST-API-Key": self.key})
+            self._session_pid = pid
+        return self._session
+
+    def warm_up(self, connections=4):
+        """
+        Open ``connections`` keep-alive connections to the server in parallel
+        and fetch the levels of description, so that a following burst of
+        concurrent requests doesn't wait on connection setup one at a time.
+        """
+        warm_up(
+            self.session,
+            self.base_url,
+            connections,
+            self.timeout,
+            prime=self.get_levels_of_description,
+        )
 
     def _request(self, method, url, params, expected_response, data=None):
         # AtoM's REST API won't parse JSON-encoded body data unless this header's set
         headers = {"Content-type": "application/json"} if data is not None else None
 
-        response = method(
-            url, params=params, data=data, headers=headers, timeout=self.timeout
+        response = self._send_request(
+            method,
+            url,
+            self._route(url),
+            params=params,
+            data=data,
+            headers=headers,
+            timeout=self.timeout,
         )
+        # Error responses are logged, with a bounded preview of the body, by
+        # self.request_log.
         if response.status_code != expected_response:
-            LOGGER.error("Response code: %s", response.status_code)
-            LOGGER.error("Response body: %s", response.text)
+            self.request_log.unexpected_status(method, url, response, expected_response)
             raise CommunicationError(response.status_code, response)
 
         if expected_response != 204:
@@ -76,18 +150,26 @@ class AtomClient:
 
         return response
 
+    def _route(self, url):
+        path = url[len(self.base_url) :] if url.startswith(self.base_url) else url
+        for pattern, template in ROUTE_TEMPLATES:
+            path, count = pattern.subn(template, path)
+            if count:
+                break
+        return "/" + path
+
     def _get(self, url, params=None, expected_response=200):
         if params is None:
             params = {}
         return self._request(
-            self.session.get, url, params=params, expected_response=expected_response
+            "get", url, params=params, expected_response=expected_response
         )
 
     def _put(self, url, params=None, data=None, expected_response=200):
         if params is None:
             params = {}
         return self._request(
-            self.session.put,
+            "put",
             url,
             params=params,
             data=data,
@@ -98,7 +180,7 @@ class AtomClient:
         if params is None:
             params = {}
         return self._request(
-            self.session.post,
+            "post",
             url,
             params=params,
             data=data,
@@ -109,7 +191,7 @@ class AtomClient:
         if params is None:
             params = {}
         return self._request(
-            self.session.delete, url, params=params, expected_response=expected_response
+            "delete", url, params=params, expected_response=expected_response
         )
 
     def _format_notes(self, record):
@@ -142,11 +224,7 @@ class AtomClient:
         return notes
 
     def _append_note_dict_to_list(self, note_list, note_type, note_content):
-        n = {}
-        n["type"] = note_type
-        n["content"] = note_content
-
-        note_list.append(n)
+        note_list.append({"type": note_type, "content": note_content})
 
     @staticmethod
     def _escape_lucene_query(query, field=None):
@@ -155,9 +233,10 @@ class AtomClient:
         Note that this omits * - this is intentionally permitted in user queries.
         The list of special characters is located at http://lucene.apache.org/core/4_0_0/queryparser/org/apache/lucene/queryparser/classic/package-summary.html#Escaping_Special_Characters
         """
-        replacement = r"\\\1"
-        return re.sub(r'([\'" +\-!\(\)\{\}\[\]^"~?:\\/]|&&|\|\|)', replacement, query)
+        query = query.translate(LUCENE_ESCAPE_TABLE)
+        return query.replace("&&", "\\&&").replace("||", "\\||")
 
+    @operation
     def get_record(self, record_id):
         record = self._get(
             urljoin(self.base_url, f"informationobjects/{record_id}")
@@ -179,6 +258,7 @@ class AtomClient:
                 date[date_mapping[date_field]] = date[date_field]
                 del date[date_field]
 
+    @operation
     def edit_record(self, new_record):
         """
         Update a record in AtoM using the provided new_record.
@@ -264,6 +344,7 @@ class AtomClient:
             data=json.dumps(record),
         )
 
+    @operation
     def get_levels_of_description(self):
         """
         Returns an array of all levels of description defined in this AtoM instance.
@@ -276,6 +357,7 @@ class AtomClient:
 
         return self.levels_of_description
 
+    @operation
     def collection_list(self, resource_id, resource_type="collection"):
         """
         Fetches a list of slug representing descriptions within the specified parent description.
@@ -304,6 +386,7 @@ class AtomClient:
         tree = response.json()
         return fetch_children(tree["children"])
 
+    @operation
     def get_resource_component_children(self, slug):
         """
         Given a resource component, fetches detailed metadata for it and all of its children.
@@ -317,57 +400,59 @@ class AtomClient:
     def _get_resources(
         self, resource_id, level=1, recurse_max_level=False, sort_by=None
     ):
-        def format_record(record, level):
-            descend = recurse_max_level != level
-            level += 1
-
-            full_record = self.get_record(record["slug"])
-            dates = self._fetch_dates_from_record(record)
-            date_expression = self._fetch_date_expression_from_record(record)
+        response = self._get(
+            urljoin(self.base_url, f"informationobjects/tree/{resource_id}")
+        )
+        tree = response.json()
+        return self._format_tree_record(tree, 1, recurse_max_level, sort_by)
 
-            result = {
-                "id": record["slug"],
-                "type": "resource",
-                "sortPosition": level,
-                "identifier": record["identifier"],
-                "title": record["title"],
-                "dates": dates,
-                "date_expression": date_expression,
-                "display_title": record["title"],
-                "levelOfDescription": record.get("level", ""),
-            }
+    def _format_tree_record(self, record, level, recurse_max_level, sort_by):
+        """Format a node of a description tree and its descendants; see
+        ``_get_resources``.
+        """
+        descend = recurse_max_level != level
+        level += 1
+
+        full_record = self.get_record(record["slug"])
+        dates = self._fetch_dates_from_record(record)
+        date_expression = self._fetch_date_expression_from_record(record)
+
+        result = {
+            "id": record["slug"],
+            "type": "resource",
+            "sortPosition": level,
+            "identifier": record["identifier"],
+            "title": record["title"],
+            "dates": dates,
+            "date_expression": date_expression,
+            "display_title": record["title"],
+            "levelOfDescription": record.get("level", ""),
+        }
 
-            if "notes" in record:
-                result["notes"] = record["notes"]
-
-            if "children" in record and descend:
-                result["children"] = [
-                    format_record(child, level) for child in record["children"]
-                ]
-                result["has_children"] = True
-                if sort_by is not None:
-                    kwargs = {"reverse": True} if sort_by == "desc" else {}
-                    result["children"] = sorted(
-                        result["children"], key=lambda c: c["title"], **kwargs
-                    )
-            elif "children" in record:
-                result["children"] = []
-                result["has_children"] = True
-            else:
-                result["children"] = False
-                result["has_children"] = False
+        if "notes" in record:
+            result["notes"] = record["notes"]
 
-            if "dates" in full_record:
-                result["date_expression"] = full_record["dates"][0]["expression"]
+        if "children" in record and descend:
+            result["children"] = [
+                self._format_tree_record(child, level, recurse_max_level, sort_by)
+                for child in record["children"]
+            ]
+            result["has_children"] = True
+            if sort_by is not None:
+                result["children"].sort(key=by_title, reverse=sort_by == "desc")
+        elif "children" in record:
+            result["children"] = []
+            result["has_children"] = True
+        else:
+            result["children"] = False
+            result["has_children"] = False
 
-            return result
+        if "dates" in full_record:
+            result["date_expression"] = full_record["dates"][0]["expression"]
 
-        response = self._get(
-            urljoin(self.base_url, f"informationobjects/tree/{resource_id}")
-        )
-        tree = response.json()
-        return format_record(tree, 1)
+        return result
 
+    @operation
     def get_resource_component_and_children(
         self,
         resource_id,
@@ -425,6 +510,7 @@ class AtomClient:
         else:
             return ""
 
+    @operation
     def find_resource_id_for_component(self, component_id):
         """
         Given the URL to a component, returns the parent resource's URL.
@@ -437,6 +523,7 @@ class AtomClient:
             "AtoM does not implement find_resource_id_for_component"
         )
 
+    @operation
     def find_parent_id_for_component(self, slug):
         """
         Given the slug of a description, returns the parent description's slug.
@@ -454,6 +541,7 @@ class AtomClient:
         else:
             return slug
 
+    @operation
     def find_collection_ids(self, search_pattern="", identifier="", fetched=0, page=1):
         """
         Fetches a list of resource URLs for every top-level description in the database.
@@ -522,10 +610,12 @@ class AtomClient:
 
         return self._get(urljoin(self.base_url, "informationobjects"), params=params)
 
+    @operation
     def count_collections(self, search_pattern="", identifier=""):
         response = self._collections_search_request(search_pattern, identifier, 1)
         return response.json()["total"]
 
+    @operation
     def find_collections(
         self,
         search_pattern="",
@@ -590,10 +680,12 @@ class AtomClient:
         hits = response.json()
         return [format_record(r) for r in hits["results"]]
 
+    @operation
     def find_by_id(self, object_type, field, value):
         """Find resource by a specific ID."""
         raise NotImplementedError("AtoM does not implement find_by_id")
 
+    @operation
     def augment_resource_ids(self, resource_ids):
         """
         Given a list of resource IDs, returns a list of dicts containing detailed information about the specified resources and their children.
@@ -615,6 +707,7 @@ class AtomClient:
 
         return resources_augmented
 
+    @operation
     def add_digital_object(
         self,
         information_object_slug,
@@ -686,6 +779,7 @@ class AtomClient:
 
         return new_object
 
+    @operation
     def add_digital_object_component(
         self,
         parent_digital_object,
@@ -698,6 +792,7 @@ class AtomClient:
             "add_digital_object_component not yet implemented in AtoM client"
         )
 
+    @operation
     def add_child(
         self,
         parent_slug=None,
@@ -757,6 +852,7 @@ class AtomClient:
             expected_response=201,
         ).json()["slug"]
 
+    @operation
     def delete_record(self, record_id):
         """
         Delete a record with record_id.
@@ -0,0 +1,287 @@
+"""Request instrumentation shared by the clients.
+
+Every request a client makes is reported as a ``RequestEvent`` to the
+client's observers. Each client always has a built-in ``StatsCollector``
+whose aggregated numbers are available through ``client.stats()``; further
+observers can be registered with ``client.add_observer``::
+
+    def log_slow(event):
+        if event.elapsed > 1:
+            print(event.method, event.route, event.elapsed)
+
+    client.add_observer(log_slow)
+
+Observers run synchronously in the thread that made the request, so they
+should be quick. An observer that raises is logged and otherwise ignored.
+"""
+
+import bisect
+import collections
+import contextlib
+import functools
+import logging
+import threading
+import time
+
+from . import tracing
+from .profiling import Profiler
+from .request_log import RequestLog
+
+__all__ = ["LATENCY_BUCKETS", "RequestEvent", "StatsCollector"]
+
+LOGGER = logging.getLogger(__name__)
+
+# Upper bounds, in seconds, of the latency histogram buckets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+RequestEvent = collections.namedtuple(
+    "RequestEvent",
+    [
+        # "archivesspace", "atom" or "archivists_toolkit".
+        "backend",
+        # HTTP method, or SQL statement type for Archivist's Toolkit.
+        "method",
+        # URL path with IDs and slugs replaced by placeholders, e.g.
+        # "/repositories/{id}/resources/{id}/tree", or the table name for
+        # Archivist's Toolkit.
+        "route",
+        # The full URL, or the SQL statement.
+        "url",
+        # HTTP status code; None if no response was received.
+        "status_code",
+        # Wall time in seconds.
+        "elapsed",
+        "bytes_sent",
+        "bytes_received",
+        # Retries performed by the transport before the final response.
+        "retries",
+        # The exception raised by the transport, if any.
+        "error",
+        # The ``requests.Response``, for HTTP requests that got one.
+        "response",
+    ],
+    defaults=[None],
+)
+
+
+class StatsCollector:
+    """Aggregates request events per method and route.
+
+    Thread-safe; a single collector can be shared between clients by
+    registering it as an observer of each.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def __getstate__(self):
+        with self._lock:
+            return {"_stats": self._stats}
+
+    def __setstate__(self, state):
+        self._lock = threading.Lock()
+        self._stats = state["_stats"]
+
+    def __call__(self, event):
+        key = (event.method, event.route)
+        bucket = bisect.bisect_left(LATENCY_BUCKETS, event.elapsed)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = {
+                    "backend": event.backend,
+                    "method": event.method,
+                    "route": event.route,
+                    "count": 0,
+                    "errors": 0,
+                    "retries": 0,
+                    "bytes_sent": 0,
+                    "bytes_received": 0,
+                    "latency_sum": 0.0,
+                    "latency_max": 0.0,
+                    # One count per LATENCY_BUCKETS entry, plus one for
+                    # requests slower than the largest bucket.
+                    "latency_buckets": [0] * (len(LATENCY_BUCKETS) + 1),
+                    "status_codes": {},
+                }
+            stats["count"] += 1
+            if event.error is not None:
+                stats["errors"] += 1
+            stats["retries"] += event.retries
+            stats["bytes_sent"] += event.bytes_sent
+            stats["bytes_received"] += event.bytes_received
+            stats["latency_sum"] += event.elapsed
+            stats["latency_max"] = max(stats["latency_max"], event.elapsed)
+            stats["latency_buckets"][bucket] += 1
+            if event.status_code is not None:
+                codes = stats["status_codes"]
+                codes[event.status_code] = codes.get(event.status_code, 0) + 1
+
+    def snapshot(self):
+        """Return a copy of the statistics collected so far.
+
+        The result is a dict keyed by ``"<method> <route>"`` strings. Each
+        value holds the request ``count``, ``errors``, ``retries``,
+        ``bytes_sent``, ``bytes_received``, ``latency_sum`` and
+        ``latency_max`` in seconds, ``latency_buckets`` with a count per
+        ``LATENCY_BUCKETS`` entry (plus one for slower requests), and
+        ``status_codes`` mapping each status code to its count.
+        """
+        with self._lock:
+            return {
+                f"{method} {route}": dict(
+                    stats,
+                    latency_buckets=list(stats["latency_buckets"]),
+                    status_codes=dict(stats["status_codes"]),
+                )
+                for (method, route), stats in self._stats.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+def operation(func):
+    """Decorate a public client method so each call is traced and profiled.
+
+    Each call opens a span named after the client class and method (see
+    ``agentarchives.tracing``), and runs under the client's ``profiler`` if
+    it has one. Recursive calls to the same method are folded into the
+    outermost span. The call runs in the client's ``_operation_scope()``.
+    """
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        with self._operation_scope():
+            profiler = self.profiler
+            if profiler is None and tracing.get_tracer() is None:
+                return func(self, *args, **kwargs)
+            name = f"{type(self).__name__}.{func.__name__}"
+            if profiler is not None:
+                return profiler.run(name, _call_in_span, name, func, self, args, kwargs)
+            return _call_in_span(name, func, self, args, kwargs)
+
+    return wrapper
+
+
+def _call_in_span(name, func, self, args, kwargs):
+    parent = tracing.current_span()
+    if parent is not None and parent.name == name:
+        return func(self, *args, **kwargs)
+    with tracing.span(name):
+        return func(self, *args, **kwargs)
+
+
+class Instrumented:
+    """Mixin giving a client its observers, built-in stats collector and
+    ``request_log`` (see ``agentarchives.request_log``).
+
+    Clients call ``_init_instrumentation`` from their constructor, and make
+    HTTP requests through ``_send_request`` (or call ``_notify`` themselves).
+    """
+
+    profiler = None
+
+    def _init_instrumentation(self, backend, profile_dir=None):
+        self._backend = backend
+        self.profiler = Profiler.from_environment(profile_dir)
+        self._stats = StatsCollector()
+        self.request_log = RequestLog()
+        self._observers = [self._stats, self.request_log]
+
+    def _instrumentation_state(self, state):
+        # Observers are often closures or bound to objects that can't be
+        # pickled, so a pickled client starts over with only its built-in
+        # observers.
+        state["_stats"] = StatsCollector()
+        state["_observers"] = [state["_stats"], state["request_log"]]
+        return state
+
+    def _operation_scope(self):
+        """Return a context manager wrapping each operation, including nested
+        ones; see ``operation``.
+        """
+        return contextlib.nullcontext()
+
+    def add_observer(self, observer):
+        """Call ``observer`` with a ``RequestEvent`` after every request."""
+        self._observers.append(observer)
+
+    def remove_observer(self, observer):
+        self._observers.remove(observer)
+
+    def stats(self):
+        """Return per-route request statistics; see ``StatsCollector.snapshot``."""
+        return self._stats.snapshot()
+
+    def reset_stats(self):
+        self._stats.reset()
+
+    def _send_request(self, method, url, route, data=None, **kwargs):
+        """Make a request with ``self.session`` and report it to the observers.
+
+        :param str method: Lowercase name of the HTTP method, e.g. "get".
+        :param str route: ``url``'s path with IDs replaced by placeholders.
+        """
+        http_method = method.upper()
+        attributes = {"http.method": http_method, "http.url": url}
+        with tracing.span(f"{http_method} {route}", attributes) as span:
+            response = error = None
+            start = time.perf_counter()
+            try:
+                response = getattr(self.session, method)(url, data=data, **kwargs)
+                if span is not None:
+                    span.set_attribute("http.status_code", response.status_code)
+                return response
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                self._notify(
+                    RequestEvent(
+                        backend=self._backend,
+                        method=http_method,
+                        route=route,
+                        url=url,
+                        status_code=getattr(response, "status_code", None),
+                        elapsed=time.perf_counter() - start,
+                        bytes_sent=body_size(data),
+                        bytes_received=response_size(response),
+                        retries=response_retries(response),
+                        error=error,
+                        response=response,
+                    )
+                )
+
+    def _notify(self, event):
+        for observer in self._observers:
+            try:
+                observer(event)
+            except Exception:
+                LOGGER.exception("Request observer %r failed", observer)
+
+
+def response_retries(response):
+    """Return how many times the transport retried before ``response``."""
+    retries = getattr(getattr(response, "raw", None), "retries", None)
+    history = getattr(retries, "history", None)
+    return len(history) if isinstance(history, tuple) else 0
+
+
+def response_size(response):
+    """Return the size in bytes of an already-read response body."""
+    content = getattr(response, "_content", None)
+    return len(content) if isinstance(content, bytes) else 0
+
+
+def body_size(data):
+    """Return the size in bytes of a request body."""
+    if data is None:
+        return 0
+    if isinstance(data, str):
+        return len(data.encode("utf-8"))
+    if isinstance(data, bytes):
+        return len(data)
+    return 0
@@ -0,0 +1,155 @@
+"""Opt-in profiling of public client operations.
+
+When profiling is enabled, each call to a public client operation such as
+``get_resource_component_and_children`` runs under ``cProfile`` and, unless
+turned off, ``tracemalloc``. The results are written to a directory as
+``<Client>.<operation>-<time>-<pid>-<id>.prof`` files, readable with
+``pstats`` or snakeviz, alongside ``.mem.txt`` files listing peak memory and
+the top allocation sites.
+
+Profiling is enabled for every client by setting ``AGENTARCHIVES_PROFILE_DIR``
+in the environment, or for one client by passing ``profile_dir`` to its
+constructor. ``AGENTARCHIVES_PROFILE_SAMPLE_RATE`` (default 1) profiles only
+that fraction of calls, and ``AGENTARCHIVES_PROFILE_MEMORY=0`` skips
+``tracemalloc``, which slows Python down considerably.
+
+Only the outermost operation is profiled when operations call each other.
+``tracemalloc`` is shared by the whole process, so the memory reports of
+operations profiled at the same time, e.g. from several threads, include
+each other's allocations. From Python 3.12, ``cProfile`` can only profile one
+operation at a time: operations that start while another is being profiled
+aren't profiled.
+"""
+
+import contextvars
+import cProfile
+import logging
+import os
+import random
+import threading
+import time
+import tracemalloc
+import uuid
+
+__all__ = ["Profiler"]
+
+LOGGER = logging.getLogger(__name__)
+
+# Number of allocation sites listed in the memory report.
+TOP_ALLOCATIONS = 25
+
+_active = contextvars.ContextVar("agentarchives_profiling", default=False)
+
+# Number of operations currently tracing memory, and whether tracemalloc was
+# started by them rather than already running.
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+_tracemalloc_started = False
+
+
+def _start_tracing():
+    global _tracemalloc_users, _tracemalloc_started
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0:
+            _tracemalloc_started = not tracemalloc.is_tracing()
+            if _tracemalloc_started:
+                tracemalloc.start()
+            else:
+                tracemalloc.reset_peak()
+        _tracemalloc_users += 1
+
+
+def _stop_tracing():
+    """Stop tracemalloc once no operation uses it, if operations started it."""
+    global _tracemalloc_users, _tracemalloc_started
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0 and _tracemalloc_started:
+            tracemalloc.stop()
+            _tracemalloc_started = False
+
+
+class Profiler:
+    """Profiles operations and writes one report per call to ``directory``.
+
+    :param str directory: Where to write reports; created if missing.
+    :param float sample_rate: Fraction of calls to profile.
+    :param bool memory: Whether to trace memory allocations.
+    """
+
+    def __init__(self, directory, sample_rate=1.0, memory=True):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.memory = memory
+
+    @classmethod
+    def from_environment(cls, directory=None):
+        """Return a profiler configured from the environment, or ``None``.
+
+        ``directory`` takes precedence over ``AGENTARCHIVES_PROFILE_DIR``.
+        """
+        directory = directory or os.environ.get("AGENTARCHIVES_PROFILE_DIR")
+        if not directory:
+            return None
+        return cls(
+            directory,
+            sample_rate=float(os.environ.get("AGENTARCHIVES_PROFILE_SAMPLE_RATE", 1)),
+            memory=os.environ.get("AGENTARCHIVES_PROFILE_MEMORY", "1") != "0",
+        )
+
+    def run(self, name, func, *args, **kwargs):
+        """Call ``func(*args, **kwargs)``, profiling it as operation ``name``."""
+        if _active.get() or (
+            self.sample_rate < 1 and random.random() >= self.sample_rate
+        ):
+            return func(*args, **kwargs)
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is active, e.g. in a concurrent thread.
+            LOGGER.debug("Not profiling %s: another profiler is active", name)
+            return func(*args, **kwargs)
+
+        if self.memory:
+            _start_tracing()
+
+        token = _active.set(True)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _active.reset(token)
+            profile.disable()
+            # A failure to report must not hide the operation's own result.
+            try:
+                snapshot = peak = None
+                if self.memory:
+                    try:
+                        peak = tracemalloc.get_traced_memory()[1]
+                        snapshot = tracemalloc.take_snapshot()
+                    finally:
+                        _stop_tracing()
+                self._write(name, profile, peak, snapshot)
+            except Exception:
+                LOGGER.exception("Unable to write profile for %s", name)
+
+    def _write(self, name, profile, peak, snapshot):
+        os.makedirs(self.directory, exist_ok=True)
+        stem = "{}-{}-{}-{}".format(
+            name,
+            time.strftime("%Y%m%dT%H%M%S"),
+            os.getpid(),
+            uuid.uuid4().hex[:8],
+        )
+        path = os.path.join(self.directory, stem)
+        profile.dump_stats(path + ".prof")
+        if snapshot is None:
+            return
+        snapshot = snapshot.filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)]
+        )
+        with open(path + ".mem.txt", "w", encoding="utf-8") as f:
+            f.write(f"Peak traced memory: {peak} bytes\n\n")
+            for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+                f.write(f"{stat}\n")
@@ -0,0 +1,163 @@
+"""Export client request statistics in the Prometheus text exposition format.
+
+Metrics are built from the statistics collected by each client (see
+``agentarchives.instrumentation``). They can be rendered to a string, written
+to a file for node_exporter's textfile collector, or served over HTTP::
+
+    from agentarchives import prometheus
+
+    prometheus.write_textfile("/var/lib/node_exporter/agentarchives.prom", client)
+    server = prometheus.start_http_server(9464, client)
+
+Every function accepts any number of clients or ``StatsCollector`` instances;
+statistics for the same backend, method and route are summed.
+"""
+
+import os
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+from .instrumentation import LATENCY_BUCKETS
+
+__all__ = ["render", "start_http_server", "write_textfile"]
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+COUNTERS = (
+    ("errors", "agentarchives_request_errors_total", "Requests that raised."),
+    ("retries", "agentarchives_request_retries_total", "Transport retries."),
+    ("bytes_sent", "agentarchives_request_bytes_sent_total", "Request body bytes."),
+    (
+        "bytes_received",
+        "agentarchives_request_bytes_received_total",
+        "Response body bytes.",
+    ),
+)
+
+
+def _snapshot(source):
+    if hasattr(source, "snapshot"):
+        return source.snapshot()
+    return source.stats()
+
+
+def _escape(value):
+    return str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _labels(**labels):
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+def _merge(sources):
+    merged = {}
+    for source in sources:
+        for stats in _snapshot(source).values():
+            key = (stats["backend"], stats["method"], stats["route"])
+            total = merged.get(key)
+            if total is None:
+                merged[key] = dict(
+                    stats,
+                    latency_buckets=list(stats["latency_buckets"]),
+                    status_codes=dict(stats["status_codes"]),
+                )
+                continue
+            for field in ("count", "errors", "retries", "bytes_sent", "bytes_received"):
+                total[field] += stats[field]
+            total["latency_sum"] += stats["latency_sum"]
+            for i, count in enumerate(stats["latency_buckets"]):
+                total["latency_buckets"][i] += count
+            for code, count in stats["status_codes"].items():
+                total["status_codes"][code] = total["status_codes"].get(code, 0) + count
+    return [merged[key] for key in sorted(merged)]
+
+
+def render(*sources):
+    """Return the statistics of ``sources`` as Prometheus exposition text."""
+    stats = _merge(sources)
+    lines = [
+        "# HELP agentarchives_requests_total Requests made, by response status.",
+        "# TYPE agentarchives_requests_total counter",
+    ]
+    for s in stats:
+        labels = _labels(backend=s["backend"], method=s["method"], route=s["route"])
+        # Requests without a status: SQL statements, or failed HTTP requests.
+        no_status = s["count"] - sum(s["status_codes"].values())
+        for code, count in sorted(s["status_codes"].items()):
+            lines.append(
+                f'agentarchives_requests_total{{{labels},status="{code}"}} {count}'
+            )
+        if no_status:
+            lines.append(
+                f'agentarchives_requests_total{{{labels},status=""}} {no_status}'
+            )
+
+    for field, name, help_text in COUNTERS:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for s in stats:
+            labels = _labels(backend=s["backend"], method=s["method"], route=s["route"])
+            lines.append(f"{name}{{{labels}}} {s[field]}")
+
+    name = "agentarchives_request_duration_seconds"
+    lines.append(f"# HELP {name} Request latency.")
+    lines.append(f"# TYPE {name} histogram")
+    for s in stats:
+        labels = _labels(backend=s["backend"], method=s["method"], route=s["route"])
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, s["latency_buckets"], strict=False):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {s["count"]}')
+        lines.append(f"{name}_sum{{{labels}}} {s['latency_sum']}")
+        lines.append(f"{name}_count{{{labels}}} {s['count']}")
+
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path, *sources):
+    """Write the statistics of ``sources`` to ``path``.
+
+    The file is replaced atomically so a scraper never reads a partial file.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".agentarchives-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(render(*sources))
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def start_http_server(port, *sources, addr="127.0.0.1"):
+    """Serve the statistics of ``sources`` over HTTP from a daemon thread.
+
+    Any path returns the metrics. Pass port 0 to pick a free port; the bound
+    port is then available as ``server.server_address[1]``. Call
+    ``server.shutdown()`` to stop serving.
+
+    :return: The running ``ThreadingHTTPServer``.
+    """
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = render(*sources).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((addr, port), MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
@@ -0,0 +1,213 @@
+"""Process-wide registry of reusable, logged-in clients.
+
+Constructing a client costs a login (ArchivesSpace) or a database connection
+(Archivist's Toolkit), plus TCP/TLS setup on the first request. Callers that
+create a client per task can use ``get_client`` instead to share one client per
+backend and set of constructor arguments, however they are passed::
+
+    from agentarchives import get_client
+
+    client = get_client("archivesspace", "http://localhost", "admin", "admin")
+
+Clients that sit unused for longer than ``max_idle`` seconds are dropped, and
+clients idle for longer than ``check_after`` seconds are health-checked before
+being handed out again; a client that fails its check is replaced.
+
+Shared clients are used from every thread that asks for them, so Archivist's
+Toolkit clients, which otherwise have a single connection, must be created
+with a ``pool_size``.
+"""
+
+import importlib
+import inspect
+import logging
+import threading
+import time
+from urllib.parse import urljoin
+
+__all__ = ["ClientRegistry", "get_client"]
+
+LOGGER = logging.getLogger(__name__)
+
+BACKENDS = {
+    "archivesspace": ("agentarchives.archivesspace", "ArchivesSpaceClient"),
+    "archivists_toolkit": (
+        "agentarchives.archivists_toolkit",
+        "ArchivistsToolkitClient",
+    ),
+    "atom": ("agentarchives.atom", "AtomClient"),
+}
+
+
+def _check_archivesspace(client):
+    # Requires a valid session, unlike the unauthenticated root endpoint.
+    client._get("/users/current-user")
+
+
+def _check_archivists_toolkit(client):
+    # A pooled client only has a connection during an operation.
+    with client._operation_scope():
+        client.db.ping()
+
+
+def _check_atom(client):
+    client._get(urljoin(client.base_url, "taxonomies/34"))
+
+
+HEALTH_CHECKS = {
+    "archivesspace": _check_archivesspace,
+    "archivists_toolkit": _check_archivists_toolkit,
+    "atom": _check_atom,
+}
+
+
+class _Entry:
+    __slots__ = ("client", "last_used")
+
+    def __init__(self, client, last_used):
+        self.client = client
+        self.last_used = last_used
+
+
+class _KeyLock:
+    # The lock under which a key's client is created or checked, and the
+    # number of threads holding or waiting for it, so that it can be dropped
+    # once unused.
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.users = 0
+
+
+class ClientRegistry:
+    """Thread-safe cache of clients keyed by backend and constructor arguments.
+
+    :param int max_idle: Seconds a client may go unused before it is dropped.
+    :param int check_after: Seconds a client may go unused before it is
+        health-checked when requested again.
+    :param clock: Function returning the current time in seconds; defaults to
+        ``time.monotonic``.
+    """
+
+    def __init__(self, max_idle=300, check_after=60, clock=time.monotonic):
+        self.max_idle = max_idle
+        self.check_after = check_after
+        self._clock = clock
+        # Guards _entries and _key_locks. Clients are created and checked
+        # under their key's lock instead, so that a slow backend doesn't hold
+        # up requests for the others.
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._key_locks = {}
+
+    @staticmethod
+    def _key(backend, arguments):
+        """The key of the client for ``backend`` with the bound constructor
+        ``arguments``, whether they were passed by position or keyword and
+        defaults included.
+        """
+        arguments.apply_defaults()
+        return (backend, tuple(arguments.arguments.items()))
+
+    def get(self, backend, *args, **kwargs):
+        """Return a client for ``backend``, creating it on first use.
+
+        ``args`` and ``kwargs`` are passed to the backend's client class; two
+        calls with the same arguments get the same client, even if one passes
+        them by keyword, or passes a default value, and the other doesn't.
+
+        :param str backend: One of "archivesspace", "archivists_toolkit" or
+            "atom".
+        :raises ValueError: for an unknown backend, or an Archivist's Toolkit
+            client without a ``pool_size``.
+        :raises TypeError: if the arguments don't match the client class.
+        """
+        try:
+            module_name, class_name = BACKENDS[backend]
+        except KeyError:
+            raise ValueError(
+                "backend must be one of: {}".format(", ".join(sorted(BACKENDS)))
+            )
+        client_class = getattr(importlib.import_module(module_name), class_name)
+        arguments = inspect.signature(client_class).bind(*args, **kwargs)
+        if (
+            backend == "archivists_toolkit"
+            and arguments.arguments.get("pool_size") is None
+        ):
+            raise ValueError(
+                "Shared Archivist's Toolkit clients need a pool_size, "
+                "as they are used from several threads"
+            )
+        key = self._key(backend, arguments)
+
+        with self._lock:
+            self._evict_idle(self._clock())
+            key_lock = self._key_locks.get(key)
+            if key_lock is None:
+                key_lock = self._key_locks[key] = _KeyLock()
+            key_lock.users += 1
+
+        try:
+            with key_lock.lock:
+                return self._get(key, backend, client_class, arguments)
+        finally:
+            with self._lock:
+                key_lock.users -= 1
+                if not key_lock.users and key not in self._entries:
+                    del self._key_locks[key]
+
+    def _get(self, key, backend, client_class, arguments):
+        with self._lock:
+            entry = self._entries.get(key)
+        now = self._clock()
+        if entry is not None and now - entry.last_used > self.check_after:
+            if not self._healthy(backend, entry.client):
+                with self._lock:
+                    self._entries.pop(key, None)
+                entry = None
+        if entry is None:
+            entry = _Entry(client_class(*arguments.args, **arguments.kwargs), now)
+        with self._lock:
+            entry.last_used = now
+            self._entries[key] = entry
+        return entry.client
+
+    def _healthy(self, backend, client):
+        try:
+            HEALTH_CHECKS[backend](client)
+        except Exception:
+            LOGGER.info("Discarding %s client that failed its health check", backend)
+            return False
+        return True
+
+    def _evict_idle(self, now):
+        for key, entry in list(self._entries.items()):
+            if now - entry.last_used > self.max_idle:
+                LOGGER.debug(
+                    "Evicting %s client idle since %s", key[0], entry.last_used
+                )
+                del self._entries[key]
+        for key, key_lock in list(self._key_locks.items()):
+            if key not in self._entries and not key_lock.users:
+                del self._key_locks[key]
+
+    def clear(self):
+        """Drop every cached client."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+_registry = ClientRegistry()
+
+
+def get_client(backend, *args, **kwargs):
+    """Return a shared client from the process-wide ``ClientRegistry``.
+
+    See ``ClientRegistry.get`` for the arguments.
+    """
+    return _registry.get(backend, *args, **kwargs)
@@ -0,0 +1,128 @@
+"""Logging of slow and failed requests.
+
+Every client has a ``RequestLog`` observer, available as
+``client.request_log``, which logs:
+
+* requests that failed at the transport level (connection errors, timeouts,
+  SQL errors) and responses with a 4xx or 5xx status, at ERROR level;
+* requests that took at least ``threshold`` seconds, at WARNING level.
+
+Clients also log, through ``unexpected_status``, responses with a status
+other than the one they expected that aren't errors, e.g. a 200 where a 201
+was expected.
+
+Response bodies, and URLs or SQL statements, are cut down to
+``preview_bytes`` so that an HTML error page or a long ``IN (...)`` list
+can't flood the logs, and are only decoded if the record is actually emitted.
+With ``sample_rate`` below 1, only that fraction of matching requests is
+logged. Settings can be changed on a live client::
+
+    client.request_log.threshold = 5
+    client.request_log.sample_rate = 0.1
+"""
+
+import logging
+import random
+
+__all__ = ["RequestLog"]
+
+LOGGER = logging.getLogger(__name__)
+
+
+class _Preview:
+    """Formats the start of a response body when first converted to a string."""
+
+    __slots__ = ("response", "limit")
+
+    def __init__(self, response, limit):
+        self.response = response
+        self.limit = limit
+
+    def __str__(self):
+        content = getattr(self.response, "content", None)
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        if not isinstance(content, bytes):
+            text = getattr(self.response, "text", None)
+            if not isinstance(text, str):
+                return "<no body>"
+            content = text.encode("utf-8")
+        preview = content[: self.limit].decode("utf-8", "replace")
+        if len(content) > self.limit:
+            preview += f"... [{len(content) - self.limit} more bytes]"
+        return preview
+
+
+def _truncate(text, limit):
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... [{len(text) - limit} more characters]"
+
+
+class RequestLog:
+    """Request observer that logs slow and failed requests.
+
+    :param float threshold: Seconds after which a request counts as slow;
+        ``None`` turns off slow-request logging.
+    :param int preview_bytes: Maximum number of response body bytes logged.
+    :param float sample_rate: Fraction of slow or failed requests to log.
+    :param logger: Logger to write to; defaults to this module's logger.
+    """
+
+    def __init__(self, threshold=1.0, preview_bytes=512, sample_rate=1.0, logger=None):
+        self.threshold = threshold
+        self.preview_bytes = preview_bytes
+        self.sample_rate = sample_rate
+        self.logger = logger or LOGGER
+
+    def _sampled(self):
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def __call__(self, event):
+        status = event.status_code
+        if event.error is not None or (status is not None and status >= 400):
+            if self.logger.isEnabledFor(logging.ERROR) and self._sampled():
+                if event.error is not None:
+                    self.logger.error(
+                        "%s %s failed after %.3fs: %r",
+                        event.method,
+                        _truncate(event.url, self.preview_bytes),
+                        event.elapsed,
+                        event.error,
+                    )
+                else:
+                    self.logger.error(
+                        "%s %s responded %s after %.3fs: %s",
+                        event.method,
+                        _truncate(event.url, self.preview_bytes),
+                        status,
+                        event.elapsed,
+                        _Preview(event.response, self.preview_bytes),
+                    )
+        elif self.threshold is not None and event.elapsed >= self.threshold:
+            if self.logger.isEnabledFor(logging.WARNING) and self._sampled():
+                self.logger.warning(
+                    "Slow request: %s %s took %.3fs (%s bytes received)",
+                    event.method,
+                    event.route,
+                    event.elapsed,
+                    event.bytes_received,
+                )
+
+    def unexpected_status(self, method, url, response, expected):
+        """Log a response whose status isn't the ``expected`` one.
+
+        Error statuses are already logged when the request is reported, so
+        only the others are logged here.
+        """
+        if response.status_code >= 400:
+            return
+        if self.logger.isEnabledFor(logging.ERROR) and self._sampled():
+            self.logger.error(
+                "%s %s responded %s, expected %s: %s",
+                method.upper(),
+                _truncate(url, self.preview_bytes),
+                response.status_code,
+                expected,
+                _Preview(response, self.preview_bytes),
+            )
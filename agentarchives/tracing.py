@@ -0,0 +1,194 @@
+"""Lightweight tracing of client operations.
+
+Public client operations such as ``get_resource_component_and_children`` or
+``add_digital_object`` open a span, and every HTTP request or SQL statement
+they make opens a child span. Tracing is off until a tracer is installed::
+
+    from agentarchives import tracing
+
+    tracer = tracing.RecordingTracer()
+    tracing.set_tracer(tracer)
+    client.add_digital_object("/repositories/2/archival_objects/1", "id")
+    print(tracer.format())
+
+which prints something like::
+
+    ArchivesSpaceClient.add_digital_object 182.4ms
+      GET /repositories/{id}/archival_objects/{id} 41.0ms
+      POST /repositories/{id}/digital_objects 87.9ms
+      POST /repositories/{id}/archival_objects/{id} 52.1ms
+
+``OpenTelemetryTracer`` sends the spans to OpenTelemetry instead; it requires
+the ``opentelemetry-api`` package. Any object with a ``start_span(name,
+attributes, parent)`` method returning a span with ``name``,
+``set_attribute(key, value)``, ``record_error(exc)`` and ``end()`` can be
+used as a tracer.
+"""
+
+import contextlib
+import contextvars
+import threading
+import time
+
+__all__ = [
+    "OpenTelemetryTracer",
+    "RecordingTracer",
+    "current_span",
+    "get_tracer",
+    "set_tracer",
+    "span",
+]
+
+_tracer = None
+_current_span = contextvars.ContextVar("agentarchives_span", default=None)
+
+
+def set_tracer(tracer):
+    """Install ``tracer`` for all clients; pass ``None`` to turn tracing off."""
+    global _tracer
+    _tracer = tracer
+
+
+def get_tracer():
+    return _tracer
+
+
+@contextlib.contextmanager
+def span(name, attributes=None):
+    """Open a span named ``name`` as a child of the current span.
+
+    Yields the span, or ``None`` when tracing is off.
+    """
+    tracer = _tracer
+    if tracer is None:
+        yield None
+        return
+    current = tracer.start_span(name, attributes or {}, _current_span.get())
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.record_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end()
+
+
+def current_span():
+    """Return the innermost open span, or ``None``."""
+    return _current_span.get()
+
+
+class RecordedSpan:
+    def __init__(self, tracer, name, attributes, parent):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = dict(attributes)
+        self.parent = parent
+        self.children = []
+        self.error = None
+        self.start = time.perf_counter()
+        self.end_time = None
+
+    @property
+    def duration(self):
+        """Duration in seconds, or ``None`` while the span is open."""
+        if self.end_time is None:
+            return None
+        return self.end_time - self.start
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def record_error(self, exc):
+        self.error = exc
+
+    def end(self):
+        self.end_time = time.perf_counter()
+        self.tracer._finish(self)
+
+
+class RecordingTracer:
+    """Keeps finished spans in memory; useful for tests and ad-hoc profiling.
+
+    ``roots`` holds the finished top-level spans, each with its ``children``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.roots = []
+
+    def start_span(self, name, attributes, parent):
+        return RecordedSpan(self, name, attributes, parent)
+
+    def _finish(self, span):
+        with self._lock:
+            if span.parent is None:
+                self.roots.append(span)
+            else:
+                span.parent.children.append(span)
+
+    def clear(self):
+        with self._lock:
+            self.roots = []
+
+    def format(self):
+        """Return the recorded span trees as indented text."""
+        lines = []
+
+        def add(span, depth):
+            line = "{}{} {:.1f}ms".format("  " * depth, span.name, span.duration * 1000)
+            if span.error is not None:
+                line += f" error={span.error!r}"
+            lines.append(line)
+            for child in span.children:
+                add(child, depth + 1)
+
+        for root in self.roots:
+            add(root, 0)
+        return "\n".join(lines)
+
+
+class _OpenTelemetrySpan:
+    def __init__(self, name, otel_span):
+        self.name = name
+        self.otel_span = otel_span
+
+    def set_attribute(self, key, value):
+        self.otel_span.set_attribute(key, value)
+
+    def record_error(self, exc):
+        from opentelemetry.trace import Status
+        from opentelemetry.trace import StatusCode
+
+        self.otel_span.record_exception(exc)
+        self.otel_span.set_status(Status(StatusCode.ERROR, str(exc)))
+
+    def end(self):
+        self.otel_span.end()
+
+
+class OpenTelemetryTracer:
+    """Forwards spans to an OpenTelemetry tracer.
+
+    :param tracer: An ``opentelemetry.trace.Tracer``; defaults to the tracer
+        named "agentarchives" from the global tracer provider.
+    """
+
+    def __init__(self, tracer=None):
+        from opentelemetry import trace
+
+        self._trace = trace
+        self._tracer = tracer or trace.get_tracer("agentarchives")
+
+    def start_span(self, name, attributes, parent):
+        if parent is not None:
+            context = self._trace.set_span_in_context(parent.otel_span)
+        else:
+            # Nest under whatever span the application has active.
+            context = None
+        return _OpenTelemetrySpan(
+            name,
+            self._tracer.start_span(name, context=context, attributes=attributes),
+        )
@@ -0,0 +1,245 @@
+"""In-process stand-in for the ArchivesSpace backend API.
+
+Only the endpoints used by ``ArchivesSpaceClient`` are implemented, returning
+records shaped like those of a real ArchivesSpace. The repository holds
+``resources`` resources, each the root of a synthetic tree of archival
+objects ``depth`` levels deep with ``breadth`` children per node.
+"""
+
+import json
+import threading
+
+from .fake_server import FakeServer
+
+REPOSITORY = "/repositories/2"
+LEVELS = ["series", "subseries", "file", "item"]
+
+
+def _dates(n):
+    return [
+        {
+            "jsonmodel_type": "date",
+            "date_type": "inclusive",
+            "label": "creation",
+            "begin": str(1900 + n % 100),
+            "end": str(1950 + n % 50),
+            "expression": f"circa {1900 + n % 100}",
+        }
+    ]
+
+
+def _notes(n):
+    return [
+        {
+            "jsonmodel_type": "note_multipart",
+            "type": "odd",
+            "publish": True,
+            "subnotes": [
+                {
+                    "jsonmodel_type": "note_text",
+                    "content": f"General note for record {n}. " * 4,
+                    "publish": True,
+                }
+            ],
+        },
+        {
+            "jsonmodel_type": "note_singlepart",
+            "type": "abstract",
+            "publish": True,
+            "content": [f"Abstract of record {n}."],
+        },
+    ]
+
+
+class FakeArchivesSpace(FakeServer):
+    ROUTES = (
+        ("POST", r"/users/([^/]+)/login", "login"),
+        ("POST", r"/logout", "logout"),
+        ("GET", r"/users/current-user", "current_user"),
+        ("GET", r"/config/enumerations/(\d+)", "enumeration"),
+        ("GET", r"/repositories/(\d+)/resources/(\d+)/tree", "tree"),
+        ("GET", r"/repositories/(\d+)/archival_objects/(\d+)/children", "children"),
+        ("GET", r"/repositories/(\d+)/search", "search"),
+        ("GET", r"/repositories/(\d+)/find_by_id/archival_objects", "find_by_id"),
+        ("POST", r"/repositories/(\d+)/digital_objects", "create_digital_object"),
+        ("POST", r"/repositories/(\d+)/archival_objects", "create_archival_object"),
+        (
+            "GET",
+            r"/repositories/(\d+)/(resources|archival_objects|digital_objects)/(\d+)",
+            "get_record",
+        ),
+        (
+            "POST",
+            r"/repositories/(\d+)/(resources|archival_objects|digital_objects)/(\d+)",
+            "update_record",
+        ),
+    )
+
+    def __init__(self, resources=1, depth=3, breadth=5, **kwargs):
+        super().__init__(**kwargs)
+        self.records = {}
+        self.children_of = {}
+        self._next_id = {"archival_objects": 1, "digital_objects": 1}
+        self._records_lock = threading.Lock()
+        for n in range(1, resources + 1):
+            uri = f"{REPOSITORY}/resources/{n}"
+            self.records[uri] = {
+                "jsonmodel_type": "resource",
+                "uri": uri,
+                "title": f"Resource {n}",
+                "display_string": f"Resource {n}",
+                "id_0": f"R{n}",
+                "level": "collection",
+                "language": "eng",
+                "dates": _dates(n),
+                "notes": _notes(n),
+                "repository": {"ref": REPOSITORY},
+                "subjects": [],
+                "linked_agents": [],
+                "instances": [],
+            }
+            self.children_of[uri] = []
+            self._add_children(uri, uri, 1, depth, breadth)
+
+    @property
+    def archival_object_count(self):
+        with self._records_lock:
+            return sum(1 for uri in self.records if "/archival_objects/" in uri)
+
+    def _new_archival_object(self, resource_uri, parent_uri, level, title=None):
+        n = self._next_id["archival_objects"]
+        self._next_id["archival_objects"] += 1
+        uri = f"{REPOSITORY}/archival_objects/{n}"
+        record = {
+            "jsonmodel_type": "archival_object",
+            "uri": uri,
+            "title": title or f"Component {n}",
+            "display_string": title or f"Component {n}",
+            "component_id": f"C{n}",
+            "ref_id": f"ref{n:08d}",
+            "level": level,
+            "dates": _dates(n),
+            "notes": _notes(n),
+            "resource": {"ref": resource_uri},
+            "repository": {"ref": REPOSITORY},
+            "subjects": [],
+            "linked_agents": [],
+            "instances": [],
+        }
+        if parent_uri != resource_uri:
+            record["parent"] = {"ref": parent_uri}
+        self.records[uri] = record
+        self.children_of[uri] = []
+        self.children_of[parent_uri].append(uri)
+        return uri
+
+    def _add_children(self, resource_uri, parent_uri, level, depth, breadth):
+        if level > depth:
+            return
+        for _ in range(breadth):
+            uri = self._new_archival_object(
+                resource_uri, parent_uri, LEVELS[min(level, len(LEVELS)) - 1]
+            )
+            self._add_children(resource_uri, uri, level + 1, depth, breadth)
+
+    def _tree_node(self, uri):
+        record = self.records[uri]
+        children = [self._tree_node(child) for child in self.children_of[uri]]
+        return {
+            "record_uri": uri,
+            "title": record["title"],
+            "level": record["level"],
+            "jsonmodel_type": "resource_tree",
+            "has_children": bool(children),
+            "children": children,
+        }
+
+    # Route handlers
+
+    def login(self, request, user):
+        return 200, {"session": f"session-{user}"}
+
+    def logout(self, request):
+        return 200, {"status": "session_logged_out"}
+
+    def current_user(self, request):
+        return 200, {"username": "admin"}
+
+    def enumeration(self, request, enum_id):
+        return 200, {"values": ["collection", "series", "subseries", "file", "item"]}
+
+    def tree(self, request, repo, resource_id):
+        uri = f"{REPOSITORY}/resources/{resource_id}"
+        if uri not in self.records:
+            return 404, {"error": "Resource not found"}
+        with self._records_lock:
+            return 200, self._tree_node(uri)
+
+    def children(self, request, repo, object_id):
+        uri = f"{REPOSITORY}/archival_objects/{object_id}"
+        with self._records_lock:
+            return 200, [self.records[child] for child in self.children_of[uri]]
+
+    def search(self, request, repo):
+        page = int(request.params.get("page", ["1"])[0])
+        page_size = int(request.params.get("page_size", ["10"])[0])
+        resources = [
+            r for r in self.records.values() if r.get("jsonmodel_type") == "resource"
+        ]
+        start = (page - 1) * page_size
+        results = [
+            {"uri": r["uri"], "title": r["title"], "json": json.dumps(r)}
+            for r in resources[start : start + page_size]
+        ]
+        return 200, {
+            "first_page": 1,
+            "last_page": max(1, -(-len(resources) // page_size)),
+            "this_page": page,
+            "offset_first": start + 1,
+            "offset_last": start + len(results),
+            "total_hits": len(resources),
+            "results": results,
+        }
+
+    def find_by_id(self, request, repo):
+        values = set(request.params.get("ref_id[]", [])) | set(
+            request.params.get("component_id[]", [])
+        )
+        with self._records_lock:
+            hits = [
+                {"ref": uri, "_resolved": record}
+                for uri, record in self.records.items()
+                if record.get("ref_id") in values
+                or record.get("component_id") in values
+            ]
+        return 200, {"archival_objects": hits}
+
+    def create_digital_object(self, request, repo):
+        with self._records_lock:
+            n = self._next_id["digital_objects"]
+            self._next_id["digital_objects"] += 1
+            uri = f"{REPOSITORY}/digital_objects/{n}"
+            self.records[uri] = dict(request.body, uri=uri)
+        return 200, {"status": "Created", "uri": uri}
+
+    def create_archival_object(self, request, repo):
+        body = request.body
+        resource_uri = body["resource"]["ref"]
+        parent_uri = body.get("parent", {}).get("ref", resource_uri)
+        with self._records_lock:
+            uri = self._new_archival_object(
+                resource_uri, parent_uri, body.get("level"), body.get("title")
+            )
+        return 200, {"status": "Created", "uri": uri}
+
+    def get_record(self, request, repo, record_type, record_id):
+        record = self.records.get(f"{REPOSITORY}/{record_type}/{record_id}")
+        if record is None:
+            return 404, {"error": "Record not found"}
+        return 200, record
+
+    def update_record(self, request, repo, record_type, record_id):
+        uri = f"{REPOSITORY}/{record_type}/{record_id}"
+        with self._records_lock:
+            self.records[uri] = request.body
+        return 200, {"status": "Updated", "uri": uri}
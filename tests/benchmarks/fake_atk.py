@@ -0,0 +1,466 @@
+"""Disposable Archivist's Toolkit databases for the benchmarks.
+
+``SyntheticATK`` creates the subset of the ATK schema used by
+``ArchivistsToolkitClient`` and fills it with ``resources`` resources, each
+the root of a tree of components ``depth`` levels deep with ``breadth``
+children per component.
+
+By default the database is a temporary SQLite file, accessed through
+``SQLiteConnection``, a small MySQLdb-compatible wrapper that translates
+``%s`` placeholders and provides ``FIND_IN_SET``. Setting
+``AGENTARCHIVES_BENCHMARK_MYSQL`` to ``user:password@host`` uses a throwaway
+database on that MySQL or MariaDB server instead; it is dropped afterwards.
+"""
+
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import time
+import uuid
+
+MYSQL = os.environ.get("AGENTARCHIVES_BENCHMARK_MYSQL")
+
+LEVELS = ["series", "subseries", "file", "item"]
+
+SCHEMA = [
+    """CREATE TABLE Repositories (
+        repositoryId INTEGER PRIMARY KEY,
+        repositoryName VARCHAR(255)
+    )""",
+    """CREATE TABLE Resources (
+        resourceId INTEGER PRIMARY KEY,
+        repositoryId INTEGER,
+        title VARCHAR(255),
+        dateExpression VARCHAR(255),
+        dateBegin INTEGER,
+        dateEnd INTEGER,
+        resourceIdentifier1 VARCHAR(255),
+        resourceLevel VARCHAR(255)
+    )""",
+    """CREATE TABLE ResourcesComponents (
+        resourceComponentId INTEGER PRIMARY KEY,
+        resourceId INTEGER,
+        parentResourceComponentId INTEGER,
+        sequenceNumber INTEGER,
+        title VARCHAR(255),
+        dateExpression VARCHAR(255),
+        dateBegin INTEGER,
+        dateEnd INTEGER,
+        persistentID VARCHAR(255),
+        resourceLevel VARCHAR(255)
+    )""",
+    "CREATE INDEX ResourcesComponentsResource ON ResourcesComponents (resourceId)",
+    "CREATE INDEX ResourcesComponentsParent ON ResourcesComponents (parentResourceComponentId)",
+    """CREATE TABLE ArchDescriptionInstances (
+        archDescriptionInstancesId INTEGER PRIMARY KEY,
+        instanceDescriminator VARCHAR(255),
+        instanceType VARCHAR(255),
+        resourceId INTEGER,
+        resourceComponentId INTEGER
+    )""",
+    """CREATE TABLE DigitalObjects (
+        digitalObjectId INTEGER PRIMARY KEY AUTO_INCREMENT,
+        version INTEGER,
+        lastUpdated DATETIME,
+        created DATETIME,
+        lastUpdatedBy VARCHAR(255),
+        createdBy VARCHAR(255),
+        title TEXT,
+        dateExpression VARCHAR(255),
+        dateBegin INTEGER,
+        dateEnd INTEGER,
+        languageCode VARCHAR(255),
+        restrictionsApply INTEGER,
+        eadDaoActuate VARCHAR(255),
+        eadDaoShow VARCHAR(255),
+        metsIdentifier VARCHAR(255),
+        objectType VARCHAR(255),
+        label VARCHAR(255),
+        objectOrder INTEGER,
+        archDescriptionInstancesId INTEGER,
+        repositoryId INTEGER
+    )""",
+    """CREATE TABLE FileVersions (
+        fileVersionId INTEGER PRIMARY KEY,
+        version INTEGER,
+        lastUpdated DATETIME,
+        created DATETIME,
+        lastUpdatedBy VARCHAR(255),
+        createdBy VARCHAR(255),
+        uri TEXT,
+        useStatement VARCHAR(255),
+        sequenceNumber INTEGER,
+        eadDaoActuate VARCHAR(255),
+        eadDaoShow VARCHAR(255),
+        digitalObjectId INTEGER
+    )""",
+    """CREATE TABLE NotesEtcTypes (
+        notesEtcTypeId INTEGER PRIMARY KEY,
+        notesEtcName VARCHAR(255),
+        notesEtcLabel VARCHAR(255)
+    )""",
+    """CREATE TABLE ArchDescriptionRepeatingData (
+        archDescriptionRepeatingDataId INTEGER PRIMARY KEY,
+        descriminator VARCHAR(255),
+        version INTEGER,
+        lastUpdated DATETIME,
+        created DATETIME,
+        lastUpdatedBy VARCHAR(255),
+        createdBy VARCHAR(255),
+        repeatingDataType VARCHAR(255),
+        title VARCHAR(255),
+        sequenceNumber INTEGER,
+        eadIngestProblem TEXT,
+        resourceId INTEGER,
+        resourceComponentId INTEGER,
+        digitalObjectId INTEGER,
+        noteContent TEXT,
+        notesEtcTypeId INTEGER,
+        basic VARCHAR(255),
+        multiPart VARCHAR(255),
+        internalOnly VARCHAR(255)
+    )""",
+]
+
+NOTE_TYPES = [
+    (1, "General note", "odd"),
+    (2, "Scope and content", "scopecontent"),
+    (8, "Conditions governing access", "accessrestrict"),
+    (9, "Conditions governing use", "userestrict"),
+    (13, "Existence and location of originals", "originalsloc"),
+]
+
+
+def _find_in_set(value, values):
+    try:
+        return values.split(",").index(value) + 1
+    except (AttributeError, ValueError):
+        return 0
+
+
+class SQLiteCursor:
+    """MySQLdb-style buffered cursor over a SQLite cursor."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._cursor = connection._connection.cursor()
+        self._rows = []
+        self._position = 0
+        self.rowcount = -1
+
+    @staticmethod
+    def _translate(query, args):
+        if args is not None and not isinstance(args, (tuple, list, dict)):
+            args = (args,)
+        # SQLite locks the whole database for writes, so needs no row locks.
+        query = re.sub(r"\s+FOR UPDATE\b", "", query)
+        return re.sub(r"%s", "?", query), args if args is not None else ()
+
+    def _wait(self):
+        if self.connection.latency:
+            time.sleep(self.connection.latency)
+
+    def execute(self, query, args=None):
+        self._wait()
+        query, args = self._translate(query, args)
+        self._cursor.execute(query, args)
+        self._rows = self._cursor.fetchall()
+        self._position = 0
+        self.rowcount = (
+            len(self._rows) if self._cursor.description else self._cursor.rowcount
+        )
+        return self.rowcount
+
+    def executemany(self, query, args):
+        self._wait()
+        query, _ = self._translate(query, None)
+        self._cursor.executemany(query, args)
+        self._rows = []
+        self._position = 0
+        self.rowcount = self._cursor.rowcount
+        return self.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def fetchone(self):
+        if self._position >= len(self._rows):
+            return None
+        row = self._rows[self._position]
+        self._position += 1
+        return row
+
+    def fetchmany(self, size=1):
+        rows = self._rows[self._position : self._position + size]
+        self._position += len(rows)
+        return tuple(rows)
+
+    def fetchall(self):
+        rows = self._rows[self._position :]
+        self._position = len(self._rows)
+        return tuple(rows)
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteStreamingCursor(SQLiteCursor):
+    """MySQLdb ``SSCursor``-style cursor, fetching rows as they're read."""
+
+    def execute(self, query, args=None):
+        self._wait()
+        query, args = self._translate(query, args)
+        self._cursor.execute(query, args)
+        self.rowcount = -1 if self._cursor.description else self._cursor.rowcount
+        return self.rowcount
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=1):
+        return tuple(self._cursor.fetchmany(size))
+
+    def fetchall(self):
+        return tuple(self._cursor.fetchall())
+
+
+class SQLiteConnection:
+    """MySQLdb-style connection to a SQLite database.
+
+    Each statement sleeps for ``latency`` seconds first, to simulate a
+    database server on another host.
+    """
+
+    # Reported as the server version; SQLite has the features of MySQL 8
+    # the client checks for. Set to e.g. "5.7.44" to test fallbacks.
+    server_info = "8.0.0-SQLite"
+
+    def __init__(self, path, latency=0.0):
+        self._connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._connection.create_function(
+            "FIND_IN_SET", 2, _find_in_set, deterministic=True
+        )
+        self.latency = latency
+
+    def get_server_info(self):
+        return self.server_info
+
+    def cursor(self, cursorclass=None):
+        return (cursorclass or SQLiteCursor)(self)
+
+    def ping(self, reconnect=False):
+        self._connection.execute("SELECT 1")
+
+    def begin(self):
+        self._connection.execute("BEGIN")
+
+    def commit(self):
+        if self._connection.in_transaction:
+            self._connection.commit()
+
+    def rollback(self):
+        if self._connection.in_transaction:
+            self._connection.rollback()
+
+    def close(self):
+        self._connection.close()
+
+
+class SyntheticATK:
+    """A disposable, populated ATK database.
+
+    Use ``connect()`` to open connections to it and ``close()`` (or a
+    ``with`` block) to delete it.
+    """
+
+    def __init__(self, resources=1, depth=3, breadth=5, latency=0.0):
+        self.latency = latency
+        self.resource_ids = []
+        self.components = {}
+        self._tmpdir = None
+        self._mysql = None
+        if MYSQL:
+            self._create_mysql()
+        else:
+            self._tmpdir = tempfile.mkdtemp(prefix="agentarchives-atk-")
+            self.path = os.path.join(self._tmpdir, "atk.sqlite3")
+        connection = self.connect()
+        try:
+            cursor = connection.cursor()
+            if not MYSQL:
+                connection.begin()
+            for statement in SCHEMA:
+                if not MYSQL:
+                    statement = statement.replace("AUTO_INCREMENT", "")
+                cursor.execute(statement)
+            self._populate(cursor, resources, depth, breadth)
+            connection.commit()
+        finally:
+            connection.close()
+
+    def _create_mysql(self):
+        import MySQLdb
+
+        credentials, host = MYSQL.rsplit("@", 1)
+        user, _, passwd = credentials.partition(":")
+        name = "agentarchives_benchmark_" + uuid.uuid4().hex[:8]
+        connection = MySQLdb.connect(host=host, user=user, passwd=passwd)
+        try:
+            connection.cursor().execute(f"CREATE DATABASE {name}")
+        finally:
+            connection.close()
+        self._mysql = {"host": host, "user": user, "passwd": passwd, "db": name}
+
+    @property
+    def connect_kwargs(self):
+        """Arguments for ``ArchivistsToolkitClient``, when using MySQL."""
+        return self._mysql
+
+    def connect(self):
+        if self._mysql:
+            import MySQLdb
+
+            return MySQLdb.connect(**self._mysql)
+        return SQLiteConnection(self.path, latency=self.latency)
+
+    def close(self):
+        if self._mysql:
+            import MySQLdb
+
+            kwargs = dict(self._mysql)
+            name = kwargs.pop("db")
+            connection = MySQLdb.connect(**kwargs)
+            try:
+                connection.cursor().execute(f"DROP DATABASE {name}")
+            finally:
+                connection.close()
+        if self._tmpdir:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def component_count(self):
+        return len(self.components)
+
+    def descendants(self, resource_id):
+        """IDs of all components of a resource, in depth-first order."""
+        return [
+            component_id
+            for component_id, info in self.components.items()
+            if info["resource"] == resource_id
+        ]
+
+    def _populate(self, cursor, resources, depth, breadth):
+        cursor.execute(
+            "INSERT INTO Repositories (repositoryId, repositoryName) VALUES (1, 'Repository')"
+        )
+        cursor.executemany(
+            "INSERT INTO NotesEtcTypes (notesEtcTypeId, notesEtcName, notesEtcLabel) VALUES (%s, %s, %s)",
+            NOTE_TYPES,
+        )
+        # ATK hands out IDs from MAX() + 1; start from existing rows like a
+        # database in use would.
+        cursor.execute(
+            "INSERT INTO ArchDescriptionInstances (archDescriptionInstancesId) VALUES (1)"
+        )
+        cursor.execute("INSERT INTO FileVersions (fileVersionId) VALUES (1)")
+
+        resource_rows = []
+        component_rows = []
+        note_rows = []
+
+        def add_children(resource_id, parent_id, level):
+            if level > depth:
+                return
+            for _ in range(breadth):
+                n = len(component_rows) + 1
+                # Mix levels among siblings, as they affect the order of
+                # children in exports.
+                level_name = LEVELS[(level + n) % len(LEVELS)]
+                component_rows.append(
+                    (
+                        n,
+                        # Like ATK, only top-level components refer to their
+                        # resource.
+                        resource_id if parent_id is None else None,
+                        parent_id,
+                        n,
+                        f"Component {n}",
+                        f"circa {1900 + n % 100}",
+                        1900 + n % 100,
+                        1950 + n % 50,
+                        f"C{n}",
+                        level_name,
+                    )
+                )
+                note_rows.append((None, n, f"Note for component {n}.", 1))
+                self.components[n] = {
+                    "resource": resource_id,
+                    "parent": parent_id,
+                    "level": level,
+                }
+                add_children(resource_id, n, level + 1)
+
+        for resource_id in range(1, resources + 1):
+            resource_rows.append(
+                (
+                    resource_id,
+                    1,
+                    f"Resource {resource_id}",
+                    f"circa {1900 + resource_id % 100}",
+                    1900 + resource_id % 100,
+                    1950 + resource_id % 50,
+                    f"R{resource_id}",
+                    "collection",
+                )
+            )
+            note_rows.append((resource_id, None, f"Abstract of {resource_id}.", 2))
+            self.resource_ids.append(resource_id)
+            add_children(resource_id, None, 1)
+
+        cursor.executemany(
+            "INSERT INTO Resources (resourceId, repositoryId, title, dateExpression, dateBegin, dateEnd, resourceIdentifier1, resourceLevel) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+            resource_rows,
+        )
+        cursor.executemany(
+            "INSERT INTO ResourcesComponents (resourceComponentId, resourceId, parentResourceComponentId, sequenceNumber, title, dateExpression, dateBegin, dateEnd, persistentID, resourceLevel) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+            component_rows,
+        )
+        cursor.executemany(
+            "INSERT INTO ArchDescriptionRepeatingData (archDescriptionRepeatingDataId, descriminator, repeatingDataType, sequenceNumber, resourceId, resourceComponentId, noteContent, notesEtcTypeId) VALUES (%s, 'note', 'Note', 0, %s, %s, %s, %s)",
+            [(n,) + row for n, row in enumerate(note_rows, 1)],
+        )
+
+
+def atk_client(database, **kwargs):
+    """Return an ``ArchivistsToolkitClient`` connected to ``database``.
+
+    ``kwargs`` are passed to the client, e.g. ``pool_size``.
+    """
+    from agentarchives.archivists_toolkit.client import ArchivistsToolkitClient
+
+    if database.connect_kwargs:
+        return ArchivistsToolkitClient(**database.connect_kwargs, **kwargs)
+    client = ArchivistsToolkitClient(
+        "localhost", "atk", "atk", "atk", lazy=True, **kwargs
+    )
+    client._open_connection = database.connect
+    client._streaming_cursorclass = lambda: SQLiteStreamingCursor
+    return client
@@ -0,0 +1,138 @@
+"""In-process stand-in for the AtoM REST API.
+
+Only the endpoints used by ``AtomClient`` are implemented, returning
+descriptions shaped like those of a real AtoM. The instance holds
+``resources`` top-level descriptions (fonds), each the root of a synthetic
+hierarchy ``depth`` levels deep with ``breadth`` children per description.
+"""
+
+import threading
+
+from .fake_server import FakeServer
+
+LEVELS = ["Fonds", "Series", "Subseries", "File", "Item"]
+
+
+class FakeAtom(FakeServer):
+    ROUTES = (
+        ("GET", r"/api/informationobjects", "search"),
+        ("POST", r"/api/informationobjects", "create_information_object"),
+        ("GET", r"/api/informationobjects/tree/([^/]+)", "tree"),
+        ("GET", r"/api/informationobjects/([^/]+)", "get_information_object"),
+        ("PUT", r"/api/informationobjects/([^/]+)", "update_information_object"),
+        ("GET", r"/api/taxonomies/(\d+)", "taxonomy"),
+        ("POST", r"/api/digitalobjects", "create_digital_object"),
+    )
+
+    def __init__(self, resources=1, depth=3, breadth=5, **kwargs):
+        super().__init__(**kwargs)
+        self.records = {}
+        self.children_of = {}
+        self.top_level = []
+        self._next_id = 1
+        self._records_lock = threading.Lock()
+        for _ in range(resources):
+            slug = self._new_information_object(None, 0)
+            self.top_level.append(slug)
+            self._add_children(slug, 1, depth, breadth)
+
+    @property
+    def description_count(self):
+        return len(self.records) - len(self.top_level)
+
+    def _new_information_object(self, parent_slug, level, title=None):
+        n = self._next_id
+        self._next_id += 1
+        slug = f"description-{n}"
+        record = {
+            "reference_code": f"F{n}",
+            "title": title or f"Description {n}",
+            "level_of_description": LEVELS[min(level, len(LEVELS) - 1)],
+            "dates": [
+                {
+                    "date": f"circa {1900 + n % 100}",
+                    "start_date": f"{1900 + n % 100}-01-01",
+                    "end_date": f"{1950 + n % 50}-12-31",
+                    "type": "Creation",
+                }
+            ],
+            "notes": [f"General note for description {n}. " * 4],
+            "publication_notes": [f"Published as part of volume {n}."],
+        }
+        if parent_slug is not None:
+            record["parent"] = parent_slug
+            self.children_of[parent_slug].append(slug)
+        self.records[slug] = record
+        self.children_of[slug] = []
+        return slug
+
+    def _add_children(self, parent_slug, level, depth, breadth):
+        if level > depth:
+            return
+        for _ in range(breadth):
+            slug = self._new_information_object(parent_slug, level)
+            self._add_children(slug, level + 1, depth, breadth)
+
+    def _tree_node(self, slug):
+        record = self.records[slug]
+        node = {
+            "id": int(slug.rsplit("-", 1)[1]),
+            "slug": slug,
+            "title": record["title"],
+            "identifier": record["reference_code"],
+            "level": record["level_of_description"],
+        }
+        # Like AtoM, leave out "children" for descriptions without any.
+        if self.children_of[slug]:
+            node["children"] = [
+                self._tree_node(child) for child in self.children_of[slug]
+            ]
+        return node
+
+    # Route handlers
+
+    def search(self, request):
+        skip = int(request.params.get("skip", ["0"])[0])
+        limit = int(request.params.get("limit", ["10"])[0])
+        results = [
+            {
+                "slug": slug,
+                "reference_code": self.records[slug]["reference_code"],
+                "title": self.records[slug]["title"],
+                "level_of_description": self.records[slug]["level_of_description"],
+            }
+            for slug in self.top_level[skip : skip + limit]
+        ]
+        return 200, {"total": len(self.top_level), "results": results}
+
+    def tree(self, request, slug):
+        if slug not in self.records:
+            return 404, {"message": "Not found"}
+        with self._records_lock:
+            return 200, self._tree_node(slug)
+
+    def get_information_object(self, request, slug):
+        record = self.records.get(slug)
+        if record is None:
+            return 404, {"message": "Not found"}
+        return 200, record
+
+    def update_information_object(self, request, slug):
+        with self._records_lock:
+            self.records[slug].update(request.body)
+        return 200, {"id": int(slug.rsplit("-", 1)[1]), "slug": slug}
+
+    def create_information_object(self, request):
+        body = request.body
+        with self._records_lock:
+            slug = self._new_information_object(
+                body.get("parent_slug"), 1, body.get("title")
+            )
+        return 201, {"id": int(slug.rsplit("-", 1)[1]), "slug": slug}
+
+    def taxonomy(self, request, taxonomy_id):
+        return 200, [{"name": level} for level in LEVELS]
+
+    def create_digital_object(self, request):
+        slug = "digital-object-{}".format(request.body["information_object_slug"])
+        return 201, {"id": 1, "slug": slug}
@@ -0,0 +1,153 @@
+"""Base class for the in-process stand-ins of the archival systems' APIs."""
+
+import collections
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from urllib.parse import parse_qs
+from urllib.parse import urlsplit
+
+
+class FakeServer:
+    """Serves JSON routes from a background thread.
+
+    Subclasses list their routes in ``ROUTES`` as ``(method, regex, handler
+    name)`` tuples. Handlers are called with the regex groups and a
+    ``request`` carrying ``params`` (the parsed query string) and ``body``
+    (the decoded JSON or form body), and return ``(status, payload)``.
+
+    Every request sleeps for ``latency`` seconds before being answered and
+    is counted in ``requests`` by route regex. At most ``max_concurrency``
+    requests are handled at once, if set; others wait their turn, like on a
+    server with a fixed number of workers. A fraction ``error_rate`` of
+    requests fail with a 500 response.
+    """
+
+    ROUTES = ()
+
+    def __init__(self, latency=0.0, max_concurrency=None, error_rate=0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = collections.Counter()
+        self._lock = threading.Lock()
+        self._workers = (
+            threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        )
+        self._random = random.Random(0)
+        self._routes = [
+            (method, re.compile(pattern + "$"), getattr(self, handler))
+            for method, pattern, handler in self.ROUTES
+        ]
+        self._server = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def request_count(self):
+        with self._lock:
+            return sum(self.requests.values())
+
+    def reset_counts(self):
+        with self._lock:
+            self.requests.clear()
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately; without this, delayed
+            # ACKs add ~40ms to every request.
+            disable_nagle_algorithm = True
+
+            def _handle(self):
+                server._dispatch(self)
+
+            do_GET = do_POST = do_PUT = do_DELETE = do_HEAD = _handle
+
+            def log_message(self, format, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            # The default listen backlog of 5 drops connections under load,
+            # which clients only retry after a second.
+            request_queue_size = 128
+
+        self._server = Server(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _dispatch(self, handler):
+        split = urlsplit(handler.path)
+        length = int(handler.headers.get("Content-Length") or 0)
+        raw_body = handler.rfile.read(length) if length else b""
+        request = Request(
+            params=parse_qs(split.query),
+            body=self._decode_body(raw_body, handler.headers.get("Content-Type")),
+        )
+
+        for method, pattern, route_handler in self._routes:
+            match = pattern.match(split.path)
+            if match and method == handler.command:
+                with self._lock:
+                    self.requests[pattern.pattern] += 1
+                    fail = self.error_rate and self._random.random() < self.error_rate
+                if self._workers:
+                    self._workers.acquire()
+                try:
+                    if self.latency:
+                        time.sleep(self.latency)
+                    if fail:
+                        status, payload = 500, {"error": "Injected failure"}
+                    else:
+                        status, payload = route_handler(request, *match.groups())
+                except Exception as e:
+                    status, payload = 500, {"error": repr(e)}
+                finally:
+                    if self._workers:
+                        self._workers.release()
+                break
+        else:
+            status, payload = 404, {"error": f"No route for {split.path}"}
+
+        body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        if handler.command != "HEAD":
+            handler.wfile.write(body)
+
+    @staticmethod
+    def _decode_body(raw_body, content_type):
+        if not raw_body:
+            return None
+        if content_type and content_type.startswith(
+            "application/x-www-form-urlencoded"
+        ):
+            return {k: v[0] for k, v in parse_qs(raw_body.decode("utf-8")).items()}
+        try:
+            return json.loads(raw_body)
+        except ValueError:
+            return raw_body.decode("utf-8")
+
+
+Request = collections.namedtuple("Request", ["params", "body"])
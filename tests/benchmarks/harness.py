@@ -0,0 +1,181 @@
+"""Measurement and result storage shared by the benchmarks.
+
+Benchmarks run as part of the normal test suite at a small scale, so they
+also check that the measured operations keep working. Environment variables
+turn them into actual measurements:
+
+``AGENTARCHIVES_BENCHMARK_SCALE``
+    Multiplies the size of the synthetic data sets (default 1).
+``AGENTARCHIVES_BENCHMARK_LATENCY``
+    Seconds the stand-in servers wait before answering each request
+    (default 0).
+``AGENTARCHIVES_BENCHMARK_RESULTS``
+    Path of a JSON file in which to store the results, keyed by benchmark
+    name. Existing entries for other benchmarks are kept.
+``AGENTARCHIVES_BENCHMARK_BASELINE``
+    Path of a results file from an earlier run. A benchmark fails if it now
+    makes more requests or queries than in the baseline, or if its wall
+    time exceeds the baseline's by more than
+    ``AGENTARCHIVES_BENCHMARK_TOLERANCE`` (default 1.5, i.e. 50% slower).
+``AGENTARCHIVES_BENCHMARK_MYSQL``
+    ``user:password@host`` of a MySQL or MariaDB server on which to create
+    the Archivist's Toolkit databases, instead of SQLite; see ``fake_atk``.
+
+For example::
+
+    AGENTARCHIVES_BENCHMARK_SCALE=10 AGENTARCHIVES_BENCHMARK_RESULTS=baseline.json \\
+        pytest -m benchmark
+"""
+
+import contextlib
+import json
+import os
+import platform
+import threading
+import time
+import tracemalloc
+
+SCALE = int(os.environ.get("AGENTARCHIVES_BENCHMARK_SCALE", 1))
+LATENCY = float(os.environ.get("AGENTARCHIVES_BENCHMARK_LATENCY", 0))
+RESULTS_PATH = os.environ.get("AGENTARCHIVES_BENCHMARK_RESULTS")
+BASELINE_PATH = os.environ.get("AGENTARCHIVES_BENCHMARK_BASELINE")
+TOLERANCE = float(os.environ.get("AGENTARCHIVES_BENCHMARK_TOLERANCE", 1.5))
+
+# (depth, breadth) of the synthetic trees of the HTTP stand-in servers.
+SHAPES = {
+    "wide": (1, 40 * SCALE),
+    "deep": (6 + SCALE, 2),
+    "balanced": (3, 4 * SCALE),
+}
+RESOURCES = 10 * SCALE
+
+_results_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def serve(server_class, backend, shape):
+    """Start a stand-in ``server_class`` with ``RESOURCES`` trees of ``shape``.
+
+    The server is set up as a target for ``run``, with its ``backend``,
+    ``shape`` and ``params``.
+    """
+    depth, breadth = SHAPES[shape]
+    with server_class(
+        resources=RESOURCES, depth=depth, breadth=breadth, latency=LATENCY
+    ) as server:
+        server.backend = backend
+        server.shape = shape
+        server.params = {
+            "shape": shape,
+            "depth": depth,
+            "breadth": breadth,
+            "latency": LATENCY,
+        }
+        yield server
+
+
+def run(target, operation, func, count_requests=None, params=None, memory=True):
+    """``measure`` ``func`` as ``operation`` of ``target``, then ``record`` it.
+
+    ``target`` is what is being measured, with a ``backend``, a ``shape``
+    (None if there's only one) and ``params``, e.g. a server from ``serve``.
+    The measurement is named ``<backend>.<operation>[<shape>]``.
+
+    :param count_requests: Function returning the number of requests made so
+        far; defaults to the target's ``request_count``.
+    :param dict params: Parameters to record instead of the target's.
+    :return: The measurement.
+    """
+    name = f"{target.backend}.{operation}"
+    if target.shape is not None:
+        name += f"[{target.shape}]"
+    if count_requests is None:
+
+        def count_requests():
+            return target.request_count
+
+    measurement = measure(
+        name,
+        func,
+        count_requests,
+        params=target.params if params is None else params,
+        memory=memory,
+    )
+    record(measurement)
+    return measurement
+
+
+def measure(name, func, count_requests, params=None, memory=True):
+    """Run ``func`` and return its measurements.
+
+    ``func`` is run once for wall time and the number of requests, as
+    reported by ``count_requests()`` before and after the run. It is then
+    run a second time under ``tracemalloc`` for peak memory, unless
+    ``memory`` is false, as tracing slows it down too much to time both at
+    once.
+
+    :return: A dict with ``name``, ``params``, ``wall_time`` (seconds),
+        ``requests``, ``peak_memory`` (bytes, or None) and ``result``, the
+        value returned by the first run.
+    """
+    before = count_requests()
+    start = time.perf_counter()
+    result = func()
+    wall_time = time.perf_counter() - start
+    requests = count_requests() - before
+
+    peak_memory = None
+    if memory:
+        tracemalloc.start()
+        try:
+            func()
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "name": name,
+        "params": params or {},
+        "wall_time": wall_time,
+        "requests": requests,
+        "peak_memory": peak_memory,
+        "result": result,
+    }
+
+
+def record(measurement):
+    """Store ``measurement`` and compare it with the baseline, if configured.
+
+    :raises AssertionError: if the measurement regressed from the baseline.
+    """
+    stored = {k: v for k, v in measurement.items() if k != "result"}
+    stored["python"] = platform.python_version()
+    name = measurement["name"]
+
+    if RESULTS_PATH:
+        with _results_lock:
+            results = _load(RESULTS_PATH)
+            results[name] = stored
+            with open(RESULTS_PATH, "w") as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+
+    if BASELINE_PATH:
+        baseline = _load(BASELINE_PATH).get(name)
+        if baseline is not None and baseline["params"] == stored["params"]:
+            assert stored["requests"] <= baseline["requests"], (
+                f"{name} made {stored['requests']} requests, "
+                f"{baseline['requests']} in the baseline"
+            )
+            limit = baseline["wall_time"] * TOLERANCE
+            assert stored["wall_time"] <= limit, (
+                f"{name} took {stored['wall_time']:.3f}s, "
+                f"baseline {baseline['wall_time']:.3f}s"
+            )
+
+
+def _load(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
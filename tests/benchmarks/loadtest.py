@@ -0,0 +1,297 @@
+"""Load test simulating several pipelines sharing one ArchivesSpace.
+
+Each simulated pipeline has its own ``ArchivesSpaceClient``, like a separate
+Archivematica pipeline, and runs a random mix of operations from one or more
+threads against a local ``FakeArchivesSpace``. The report gives throughput,
+latency percentiles per operation and error rates, to help size connection
+pools and concurrency limits. For example::
+
+    python -m tests.benchmarks.loadtest --pipelines 12 --duration 30 \\
+        --latency 0.02 --max-concurrency 8
+
+Run with ``--help`` for all options.
+"""
+
+import argparse
+import collections
+import json
+import logging
+import random
+import sys
+import threading
+import time
+
+from agentarchives.archivesspace.client import ArchivesSpaceClient
+
+from .fake_archivesspace import REPOSITORY
+from .fake_archivesspace import FakeArchivesSpace
+
+# Relative weight of each operation in a pipeline's workload.
+DEFAULT_MIX = {
+    "find_collections": 3,
+    "get_resource_component_and_children": 3,
+    "add_child": 2,
+    "add_digital_object": 2,
+}
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def _find_collections(client, rng, targets):
+    return client.find_collections(page_size=10)
+
+
+def _get_resource_component_and_children(client, rng, targets):
+    return client.get_resource_component_and_children(
+        rng.choice(targets["resources"]), recurse_max_level=2
+    )
+
+
+def _add_child(client, rng, targets):
+    return client.add_child(
+        rng.choice(targets["archival_objects"]), title="Load test", level="file"
+    )
+
+
+def _add_digital_object(client, rng, targets):
+    return client.add_digital_object(
+        rng.choice(targets["archival_objects"]),
+        identifier="load-test",
+        uri="http://example.com/load-test.tiff",
+    )
+
+
+OPERATIONS = {
+    "find_collections": _find_collections,
+    "get_resource_component_and_children": _get_resource_component_and_children,
+    "add_child": _add_child,
+    "add_digital_object": _add_digital_object,
+}
+
+
+def percentile(values, p):
+    """Return the ``p``-th percentile of sorted ``values``, by nearest rank."""
+    if not values:
+        return None
+    rank = max(1, -(-len(values) * p // 100))
+    return values[int(rank) - 1]
+
+
+def pipeline_clients(url, pipelines, connections=0):
+    """Return one logged-in client per simulated pipeline.
+
+    :param int connections: Connections to warm up, and pool size, per client.
+    """
+    clients = []
+    for _ in range(pipelines):
+        client = ArchivesSpaceClient(
+            url, "admin", "admin", warm_connections=connections
+        )
+        client.reset_stats()
+        clients.append(client)
+    return clients
+
+
+def run_load_test(
+    clients, targets, threads=1, operations=None, duration=None, mix=None, seed=0
+):
+    """Run simulated pipelines and return the results.
+
+    :param list clients: One client per simulated pipeline; see
+        ``pipeline_clients``.
+    :param dict targets: Lists of ``resources`` and ``archival_objects`` URIs
+        operations may pick from; see ``targets``.
+    :param int threads: Threads per pipeline sharing its client.
+    :param int operations: Operations per thread; used if ``duration`` isn't.
+    :param float duration: Seconds to keep each thread busy.
+    :param dict mix: Operation name to relative weight; see ``DEFAULT_MIX``.
+    :param int seed: Seed of the random operation choices.
+    :return: A dict as described in ``summarise``.
+    """
+    if operations is None and duration is None:
+        operations = 10
+    mix = mix or DEFAULT_MIX
+    names = list(mix)
+    weights = [mix[name] for name in names]
+
+    samples = collections.defaultdict(list)
+    errors = collections.defaultdict(collections.Counter)
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(len(clients) * threads)
+
+    def worker(client, rng):
+        start_barrier.wait()
+        deadline = time.monotonic() + duration if duration else None
+        done = 0
+        while (done < operations) if deadline is None else time.monotonic() < deadline:
+            name = rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            error = None
+            try:
+                OPERATIONS[name](client, rng, targets)
+            except Exception as e:
+                error = type(e).__name__
+            elapsed = time.perf_counter() - started
+            with lock:
+                samples[name].append(elapsed)
+                if error:
+                    errors[name][error] += 1
+            done += 1
+
+    workers = [
+        threading.Thread(
+            target=worker,
+            args=(client, random.Random(f"{seed}-{p}-{t}")),
+            name=f"pipeline-{p}-{t}",
+        )
+        for p, client in enumerate(clients)
+        for t in range(threads)
+    ]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    wall_time = time.perf_counter() - started
+
+    requests = sum(
+        stats["count"] for client in clients for stats in client.stats().values()
+    )
+    return summarise(samples, errors, wall_time, requests)
+
+
+def summarise(samples, errors, wall_time, requests):
+    """Aggregate per-operation latency samples and error counts.
+
+    :return: A dict with the ``wall_time``, the total ``operations``,
+        ``requests`` and ``errors``, ``throughput`` in operations per second,
+        the ``error_rate``, and per-operation ``count``, ``errors`` (by
+        exception type), ``error_rate`` and latency ``p50``, ``p90``,
+        ``p95``, ``p99`` and ``max`` in seconds under ``per_operation``.
+    """
+    per_operation = {}
+    for name, values in sorted(samples.items()):
+        values = sorted(values)
+        error_count = sum(errors[name].values())
+        stats = {
+            "count": len(values),
+            "errors": dict(errors[name]),
+            "error_rate": error_count / len(values),
+            "max": values[-1],
+        }
+        for p in PERCENTILES:
+            stats[f"p{p}"] = percentile(values, p)
+        per_operation[name] = stats
+
+    total = sum(stats["count"] for stats in per_operation.values())
+    total_errors = sum(sum(errors[name].values()) for name in per_operation)
+    return {
+        "wall_time": wall_time,
+        "operations": total,
+        "requests": requests,
+        "errors": total_errors,
+        "throughput": total / wall_time if wall_time else 0.0,
+        "error_rate": total_errors / total if total else 0.0,
+        "per_operation": per_operation,
+    }
+
+
+def format_report(result):
+    """Render the result of ``run_load_test`` as a table."""
+    lines = [
+        "{operations} operations ({requests} requests) in {wall_time:.2f}s: "
+        "{throughput:.1f} ops/s, {error_rate:.1%} errors".format(**result),
+        "",
+        "{:<40} {:>7} {:>7} {:>9} {:>9} {:>9} {:>9} {:>9}".format(
+            "operation",
+            "count",
+            "errors",
+            "p50 ms",
+            "p90 ms",
+            "p95 ms",
+            "p99 ms",
+            "max ms",
+        ),
+    ]
+    for name, stats in result["per_operation"].items():
+        lines.append(
+            "{:<40} {:>7} {:>7} {:>9.1f} {:>9.1f} {:>9.1f} {:>9.1f} {:>9.1f}".format(
+                name,
+                stats["count"],
+                sum(stats["errors"].values()),
+                *(stats[key] * 1000 for key in ("p50", "p90", "p95", "p99", "max")),
+            )
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--pipelines", type=int, default=12)
+    parser.add_argument("--threads", type=int, default=1, help="threads per pipeline")
+    parser.add_argument("--operations", type=int, default=20, help="per thread")
+    parser.add_argument(
+        "--duration", type=float, help="seconds to run, instead of --operations"
+    )
+    parser.add_argument(
+        "--connections", type=int, default=0, help="connection pool size per client"
+    )
+    parser.add_argument("--latency", type=float, default=0.01, help="server latency")
+    parser.add_argument(
+        "--max-concurrency", type=int, help="requests the server handles at once"
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--resources", type=int, default=50)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--breadth", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print JSON")
+    parser.add_argument(
+        "--verbose", action="store_true", help="log each failed or slow request"
+    )
+    args = parser.parse_args(argv)
+
+    if not args.verbose:
+        logging.getLogger("agentarchives").setLevel(logging.CRITICAL)
+
+    with FakeArchivesSpace(
+        resources=args.resources,
+        depth=args.depth,
+        breadth=args.breadth,
+        latency=args.latency,
+        max_concurrency=args.max_concurrency,
+    ) as server:
+        clients = pipeline_clients(server.url, args.pipelines, args.connections)
+        # Only inject errors once the pipelines have logged in.
+        server.error_rate = args.error_rate
+        result = run_load_test(
+            clients,
+            targets(server),
+            threads=args.threads,
+            operations=args.operations,
+            duration=args.duration,
+            seed=args.seed,
+        )
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(format_report(result))
+
+
+def targets(server):
+    """Return the records of ``server`` operations may target."""
+    return {
+        "resources": [
+            uri for uri in server.records if uri.startswith(f"{REPOSITORY}/resources/")
+        ],
+        "archival_objects": [
+            uri
+            for uri in server.records
+            if uri.startswith(f"{REPOSITORY}/archival_objects/")
+        ],
+    }
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,335 @@
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from agentarchives.archivists_toolkit.client import IN_CLAUSE_SIZE
+
+from .fake_atk import SyntheticATK
+from .fake_atk import atk_client
+from .harness import LATENCY
+from .harness import SCALE
+from .harness import run
+
+pytestmark = pytest.mark.benchmark
+
+# (depth, breadth) of the synthetic trees, from small to large.
+SIZES = {
+    "small": (2, 3),
+    "medium": (3, 5),
+    "large": (4, 4 + SCALE),
+}
+RESOURCES = 10 * SCALE
+RESOURCE = 1
+
+
+@pytest.fixture(scope="module", params=list(SIZES))
+def database(request):
+    depth, breadth = SIZES[request.param]
+    with SyntheticATK(
+        resources=RESOURCES, depth=depth, breadth=breadth, latency=LATENCY
+    ) as database:
+        database.backend = "archivists_toolkit"
+        database.shape = request.param
+        database.params = {
+            "size": request.param,
+            "depth": depth,
+            "breadth": breadth,
+            "latency": LATENCY,
+        }
+        yield database
+
+
+@pytest.fixture
+def client(database):
+    return atk_client(database)
+
+
+def queries(client):
+    """Return a function counting the statements ``client`` has run."""
+    return lambda: sum(stats["count"] for stats in client.stats().values())
+
+
+@pytest.fixture
+def legacy_client(database):
+    """A client for a server without recursive queries, e.g. MySQL 5.7."""
+    client = atk_client(database)
+    client._recursive_queries = False
+    return client
+
+
+def levels(database, resource_id):
+    """Number of components at each depth below a resource."""
+    counts = collections.Counter(
+        database.components[c]["level"] for c in database.descendants(resource_id)
+    )
+    return [counts[level] for level in sorted(counts)]
+
+
+def test_collection_list(database, client):
+    components = database.descendants(RESOURCE)
+    m = run(
+        database,
+        "collection_list",
+        lambda: client.collection_list(RESOURCE),
+        queries(client),
+    )
+    assert m["result"] == components
+    # One recursive query for the whole tree.
+    assert m["requests"] == 1
+
+
+def test_collection_list_without_recursive_queries(database, legacy_client):
+    components = database.descendants(RESOURCE)
+    m = run(
+        database,
+        "collection_list_without_recursive_queries",
+        lambda: legacy_client.collection_list(RESOURCE),
+        queries(legacy_client),
+    )
+    assert m["result"] == components
+    # The top-level components, then one query per level of at most
+    # IN_CLAUSE_SIZE parents.
+    assert m["requests"] == 1 + sum(
+        -(-count // IN_CLAUSE_SIZE) for count in levels(database, RESOURCE)
+    )
+
+
+def test_get_resource_component_and_children(database, client):
+    components = database.descendants(RESOURCE)
+    m = run(
+        database,
+        "get_resource_component_and_children",
+        lambda: client.get_resource_component_and_children(RESOURCE),
+        queries(client),
+    )
+    assert m["result"]["id"] == RESOURCE
+    assert m["result"]["title"] == f"Resource {RESOURCE}"
+    assert len(components) > 0
+    assert m["result"]["notes"] == [
+        {"type": "scopecontent", "content": f"Abstract of {RESOURCE}."}
+    ]
+    first = m["result"]["children"][0]
+    assert first["notes"] == [
+        {"type": "odd", "content": f"Note for component {first['id']}."}
+    ]
+    # The record, all components below it, then all of their notes at once.
+    assert m["requests"] == 3
+
+
+def test_find_resource_id_for_component(database, client):
+    leaf = database.descendants(RESOURCE)[-1]
+    depth = database.components[leaf]["level"]
+    m = run(
+        database,
+        "find_resource_id_for_component",
+        lambda: client.find_resource_id_for_component(leaf),
+        queries(client),
+    )
+    assert depth > 1
+    assert m["result"] == RESOURCE
+    # The ancestors at once.
+    assert m["requests"] == 1
+
+
+def test_find_resource_id_for_components(database, client):
+    resources = database.resource_ids[:3]
+    components = [c for r in resources for c in database.descendants(r)]
+    m = run(
+        database,
+        "find_resource_id_for_components",
+        lambda: [client.find_resource_id_for_component(c) for c in components],
+        queries(client),
+    )
+    assert m["result"] == [database.components[c]["resource"] for c in components]
+    # Only the lookups of components not cached as the ancestor of an
+    # earlier one query the database.
+    cached = set()
+    misses = 0
+    for component in components:
+        if component not in cached:
+            misses += 1
+            while component is not None:
+                cached.add(component)
+                component = database.components[component]["parent"]
+    assert m["requests"] == misses
+
+
+def test_find_resource_id_for_components_without_recursive_queries(
+    database, legacy_client
+):
+    resources = database.resource_ids[:3]
+    components = [c for r in resources for c in database.descendants(r)]
+    m = run(
+        database,
+        "find_resource_id_for_components_without_recursive_queries",
+        lambda: [legacy_client.find_resource_id_for_component(c) for c in components],
+        queries(legacy_client),
+    )
+    assert m["result"] == [database.components[c]["resource"] for c in components]
+    # One query per ancestor of the first component of each resource, then
+    # the resource's components level by level.
+    assert m["requests"] == sum(
+        database.components[database.descendants(r)[0]]["level"]
+        + 1
+        + sum(-(-count // IN_CLAUSE_SIZE) for count in levels(database, r))
+        for r in resources
+    )
+
+
+def test_find_collections(database, client):
+    m = run(
+        database,
+        "find_collections",
+        lambda: client.find_collections(page_size=10),
+        queries(client),
+    )
+    assert len(m["result"]) == 10
+    # The search, the resources, all of their components at once, then the
+    # notes of at most IN_CLAUSE_SIZE records per query. recurse_max_level
+    # only applies to a record's own children, so whole trees are loaded.
+    records = 10 + sum(
+        sum(levels(database, resource["id"])) for resource in m["result"]
+    )
+    assert m["requests"] == 3 + -(-records // IN_CLAUSE_SIZE)
+
+
+def test_find_collections_without_recursive_queries(database, legacy_client):
+    m = run(
+        database,
+        "find_collections_without_recursive_queries",
+        lambda: legacy_client.find_collections(page_size=10),
+        queries(legacy_client),
+    )
+    assert len(m["result"]) == 10
+    # The search, the resources and their top-level components, then one
+    # query per level of at most IN_CLAUSE_SIZE parents, for all the
+    # resources together.
+    counts = collections.Counter()
+    for resource in m["result"]:
+        for level, count in enumerate(levels(database, resource["id"])):
+            counts[level] += count
+    notes = -(-(10 + sum(counts.values())) // IN_CLAUSE_SIZE)
+    assert m["requests"] == 3 + notes + sum(
+        -(-count // IN_CLAUSE_SIZE) for count in counts.values()
+    )
+
+
+def test_count_collections(database, client):
+    m = run(database, "count_collections", client.count_collections, queries(client))
+    assert m["result"] == RESOURCES
+    assert m["requests"] == 1
+
+
+def test_iter_collection_ids(database, client):
+    m = run(
+        database,
+        "iter_collection_ids",
+        lambda: list(client.iter_collection_ids()),
+        queries(client),
+    )
+    assert m["result"] == client.find_collection_ids()
+    assert m["requests"] == 1
+
+
+def test_iter_components(database, client):
+    m = run(
+        database,
+        "iter_components",
+        lambda: sum(1 for _ in client.iter_components()),
+        queries(client),
+    )
+    assert m["result"] == database.component_count
+    assert m["requests"] == 1
+
+
+def test_resource_types(database, client):
+    ids = list(database.components) + [10**9]
+    m = run(
+        database, "resource_types", lambda: client.resource_types(ids), queries(client)
+    )
+    for record_id in ids:
+        if record_id in database.resource_ids:
+            expected = client.RESOURCE
+        elif record_id in database.components:
+            expected = client.RESOURCE_COMPONENT
+        else:
+            expected = None
+        assert m["result"][record_id] == expected
+    # One query per IN_CLAUSE_SIZE IDs.
+    assert m["requests"] == -(-len(ids) // IN_CLAUSE_SIZE)
+
+    # Then only the IDs of resources aren't looked up again.
+    others = [i for i in ids if m["result"][i] != client.RESOURCE]
+    client.reset_stats()
+    assert client.resource_types(ids) == m["result"]
+    assert sum(stats["count"] for stats in client.stats().values()) == -(
+        -len(others) // IN_CLAUSE_SIZE
+    )
+
+
+@pytest.fixture
+def pooled_client(database):
+    client = atk_client(database, pool_size=4)
+    yield client
+    client._pool.close()
+
+
+def test_pooled_client_from_threads(database, client, pooled_client):
+    expected = [
+        client.get_resource_component_and_children(r) for r in database.resource_ids
+    ]
+
+    def trees():
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            return list(
+                executor.map(
+                    pooled_client.get_resource_component_and_children,
+                    database.resource_ids,
+                )
+            )
+
+    m = run(
+        database,
+        "pooled_get_resource_component_and_children",
+        trees,
+        queries(pooled_client),
+    )
+    assert m["result"] == expected
+    assert m["requests"] == 3 * RESOURCES
+    assert pooled_client._pool.size <= 4
+
+
+@pytest.fixture
+def scratch_database():
+    """A small database of its own, for tests that write to it."""
+    with SyntheticATK(resources=2, depth=2, breadth=2, latency=LATENCY) as database:
+        database.backend = "archivists_toolkit"
+        database.shape = "scratch"
+        database.params = {"latency": LATENCY}
+        yield database
+
+
+def test_add_digital_objects(scratch_database):
+    client = atk_client(scratch_database)
+    parents = [RESOURCE] + scratch_database.descendants(RESOURCE)
+    count = 100 * SCALE
+    digital_objects = [
+        {
+            "parent_archival_object": parents[n % len(parents)],
+            "identifier": f"do-{n}",
+            "uri": f"http://example.com/{n}.tiff",
+            "access_conditions": "Open",
+        }
+        for n in range(count)
+    ]
+    m = run(
+        scratch_database,
+        "add_digital_objects",
+        lambda: client.add_digital_objects(digital_objects),
+        queries(client),
+    )
+    assert len(m["result"]) == len(set(m["result"])) == count
+    # Parents, repository, the four reserved IDs, then one insert per table
+    # and kind of instance, whatever the number of digital objects.
+    assert m["requests"] == 2 + 1 + 4 + 5
@@ -0,0 +1,168 @@
+"""Micro-benchmarks of the per-record formatting done by the clients.
+
+These run without a server: tree walks get their records from memory, so
+only the client's own CPU time is measured.
+"""
+
+import types
+
+import pytest
+
+from agentarchives.archivesspace.client import ArchivesSpaceClient
+from agentarchives.atom.client import AtomClient
+
+from .fake_archivesspace import FakeArchivesSpace
+from .fake_atom import FakeAtom
+from .harness import SCALE
+from .harness import run
+
+pytestmark = pytest.mark.benchmark
+
+ITERATIONS = 20 * SCALE
+# The target of these benchmarks, for ``run``.
+FORMATTING = types.SimpleNamespace(backend="formatting", shape=None, params={})
+QUERIES = [
+    "Smith family papers",
+    'Letters: "draft" (1900-1950) [box 2] && more',
+    "F1*",
+    "a/b\\c?d~e^f!g{h}",
+]
+
+
+class StaticResponse:
+    def __init__(self, payload):
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+
+def run_repeatedly(name, func, iterations=ITERATIONS, **params):
+    """``run`` ``func`` ``iterations`` times in a row, to time it reliably."""
+
+    def repeat():
+        for _ in range(iterations):
+            result = func()
+        return result
+
+    return run(
+        FORMATTING,
+        name,
+        repeat,
+        lambda: 0,
+        params=dict(params, iterations=iterations),
+        memory=False,
+    )
+
+
+@pytest.fixture(scope="module")
+def archivesspace():
+    return FakeArchivesSpace(resources=1, depth=3, breadth=10)
+
+
+@pytest.fixture
+def as_client(archivesspace):
+    client = ArchivesSpaceClient("http://localhost", "admin", "admin", lazy=True)
+
+    def get(url, params=None, expected_response=200):
+        if url.endswith("/tree"):
+            return StaticResponse(archivesspace._tree_node(url[: -len("/tree")]))
+        return StaticResponse(archivesspace.records[url])
+
+    client._get = get
+    return client
+
+
+@pytest.fixture(scope="module")
+def atom():
+    return FakeAtom(resources=1, depth=3, breadth=10)
+
+
+@pytest.fixture
+def atom_client(atom):
+    client = AtomClient("http://localhost", "key")
+
+    def get(url, params=None, expected_response=200):
+        slug = url.rsplit("/", 1)[1]
+        if "/tree/" in url:
+            return StaticResponse(atom._tree_node(slug))
+        return StaticResponse(dict(atom.records[slug]))
+
+    client._get = get
+    return client
+
+
+def test_archivesspace_format_notes(as_client, archivesspace):
+    records = list(archivesspace.records.values())
+    m = run_repeatedly(
+        "archivesspace._format_notes",
+        lambda: [as_client._format_notes(r) for r in records],
+        records=len(records),
+    )
+    assert m["result"][0] == [
+        {"type": "odd", "content": records[0]["notes"][0]["subnotes"][0]["content"]},
+        {"type": "abstract", "content": "Abstract of record 1."},
+    ]
+
+
+def test_archivesspace_fetch_dates(as_client, archivesspace):
+    records = list(archivesspace.records.values())
+    m = run_repeatedly(
+        "archivesspace._fetch_dates_from_record",
+        lambda: [as_client._fetch_dates_from_record(r) for r in records],
+        records=len(records),
+    )
+    assert m["result"][0] == "circa 1901"
+
+
+def test_archivesspace_fetch_date_expression(as_client, archivesspace):
+    records = list(archivesspace.records.values())
+    m = run_repeatedly(
+        "archivesspace._fetch_date_expression_from_record",
+        lambda: [as_client._fetch_date_expression_from_record(r) for r in records],
+        records=len(records),
+    )
+    assert m["result"][0] == "circa 1901"
+
+
+def test_archivesspace_escape_solr_query():
+    m = run_repeatedly(
+        "archivesspace._escape_solr_query",
+        lambda: [
+            ArchivesSpaceClient._escape_solr_query(query, field)
+            for query in QUERIES * 250
+            for field in ("title", "identifier")
+        ],
+        queries=len(QUERIES) * 250,
+    )
+    assert m["result"][:2] == ["Smith\\\\ family\\\\ papers", "Smith\\ family\\ papers"]
+
+
+def test_archivesspace_format_tree(as_client, archivesspace):
+    uri = "/repositories/2/resources/1"
+    m = run_repeatedly(
+        "archivesspace._get_resources",
+        lambda: as_client._get_resources(uri, sort_by="asc"),
+        iterations=max(1, ITERATIONS // 10),
+        records=len(archivesspace.records),
+    )
+    assert len(m["result"]["children"]) == 10
+
+
+def test_atom_format_tree(atom_client, atom):
+    m = run_repeatedly(
+        "atom._get_resources",
+        lambda: atom_client._get_resources("description-1", sort_by="asc"),
+        iterations=max(1, ITERATIONS // 10),
+        records=len(atom.records),
+    )
+    assert len(m["result"]["children"]) == 10
+
+
+def test_atom_escape_lucene_query():
+    m = run_repeatedly(
+        "atom._escape_lucene_query",
+        lambda: [AtomClient._escape_lucene_query(query) for query in QUERIES * 500],
+        queries=len(QUERIES) * 500,
+    )
+    assert m["result"][0] == "Smith\\ family\\ papers"
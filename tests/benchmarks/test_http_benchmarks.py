@@ -0,0 +1,137 @@
+"""Benchmarks of the ArchivesSpace and AtoM clients against stand-in servers."""
+
+import pytest
+
+from agentarchives.archivesspace.client import ArchivesSpaceClient
+from agentarchives.atom.client import AtomClient
+
+from .fake_archivesspace import FakeArchivesSpace
+from .fake_atom import FakeAtom
+from .harness import RESOURCES
+from .harness import SHAPES
+from .harness import run
+from .harness import serve
+
+pytestmark = pytest.mark.benchmark
+
+
+class ArchivesSpace:
+    server_class = FakeArchivesSpace
+    resource = "/repositories/2/resources/1"
+    # find_collections fetches each hit's tree to find whether it has children.
+    requests_per_collection = 1
+    # GET the parent, POST the object, POST the parent's new instance.
+    add_digital_object_requests = 3
+
+    @staticmethod
+    def client(server):
+        return ArchivesSpaceClient(server.url, "admin", "admin")
+
+    @staticmethod
+    def record_count(server):
+        return server.archival_object_count
+
+    @staticmethod
+    def add_digital_object(client):
+        return client.add_digital_object(
+            "/repositories/2/archival_objects/1",
+            identifier="do",
+            uri="http://example.com/do.tiff",
+        )
+
+    @staticmethod
+    def check_digital_object(result):
+        assert result["id"].startswith("/repositories/2/digital_objects/")
+
+
+class Atom:
+    server_class = FakeAtom
+    resource = "description-1"
+    # find_collections fetches each hit's record, and its tree twice.
+    requests_per_collection = 3
+    add_digital_object_requests = 1
+
+    @staticmethod
+    def client(server):
+        return AtomClient(server.url, "key")
+
+    @staticmethod
+    def record_count(server):
+        return server.description_count
+
+    @staticmethod
+    def add_digital_object(client):
+        return client.add_digital_object(
+            Atom.resource, title="do", uri="http://example.com/do.tiff"
+        )
+
+    @staticmethod
+    def check_digital_object(result):
+        assert result["slug"] == f"digital-object-{Atom.resource}"
+
+
+BACKENDS = {"archivesspace": ArchivesSpace, "atom": Atom}
+
+
+@pytest.fixture(
+    scope="module",
+    params=[(backend, shape) for backend in BACKENDS for shape in sorted(SHAPES)],
+    ids="{0[0]}-{0[1]}".format,
+)
+def server(request):
+    backend, shape = request.param
+    with serve(BACKENDS[backend].server_class, backend, shape) as server:
+        server.api = BACKENDS[backend]
+        yield server
+
+
+@pytest.fixture
+def client(server):
+    return server.api.client(server)
+
+
+def test_collection_list(server, client):
+    records_per_resource = server.api.record_count(server) // RESOURCES
+    m = run(
+        server, "collection_list", lambda: client.collection_list(server.api.resource)
+    )
+    assert len(m["result"]) == records_per_resource
+    assert m["requests"] == 1
+
+
+def test_get_resource_component_and_children(server, client):
+    records_per_resource = server.api.record_count(server) // RESOURCES
+    m = run(
+        server,
+        "get_resource_component_and_children",
+        lambda: client.get_resource_component_and_children(server.api.resource),
+    )
+    assert m["result"]["id"] == server.api.resource
+    assert m["result"]["has_children"]
+    # The tree, then one GET per record.
+    assert m["requests"] == 1 + 1 + records_per_resource
+
+
+def test_get_resource_component_and_children_two_levels(server, client):
+    m = run(
+        server,
+        "get_resource_component_and_children_two_levels",
+        lambda: client.get_resource_component_and_children(
+            server.api.resource, recurse_max_level=2
+        ),
+    )
+    assert m["result"]["has_children"]
+
+
+def test_find_collections(server, client):
+    m = run(server, "find_collections", lambda: client.find_collections(page_size=10))
+    assert len(m["result"]) == 10
+    assert all(collection["has_children"] for collection in m["result"])
+    # The search, then the requests for each hit.
+    assert m["requests"] == 1 + server.api.requests_per_collection * 10
+
+
+def test_add_digital_object(server, client):
+    m = run(server, "add_digital_object", lambda: server.api.add_digital_object(client))
+    server.api.check_digital_object(m["result"])
+    assert m["requests"] == server.api.add_digital_object_requests
@@ -0,0 +1,39 @@
+import pytest
+
+from ..test_imports import import_times
+from .harness import record
+
+pytestmark = pytest.mark.benchmark
+
+# Import times vary from run to run, so the fastest of a few is recorded.
+RUNS = 3
+
+
+@pytest.mark.parametrize(
+    "module",
+    [
+        "agentarchives",
+        "agentarchives.archivesspace",
+        "agentarchives.archivists_toolkit",
+        "agentarchives.atom",
+    ],
+)
+def test_import_time(module):
+    # Importing a subpackage first imports its parents, each reported with
+    # its own cumulative time.
+    parts = module.split(".")
+    packages = [".".join(parts[: i + 1]) for i in range(len(parts))]
+    microseconds = min(
+        sum(times[package] for package in packages)
+        for times in (import_times(module) for _ in range(RUNS))
+    )
+    record(
+        {
+            "name": f"import.{module}",
+            "params": {"runs": RUNS},
+            # The time spent importing, without the interpreter's startup.
+            "wall_time": microseconds / 1e6,
+            "requests": 0,
+            "peak_memory": None,
+        }
+    )
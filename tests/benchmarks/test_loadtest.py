@@ -0,0 +1,62 @@
+import pytest
+
+from .fake_archivesspace import FakeArchivesSpace
+from .harness import LATENCY
+from .loadtest import DEFAULT_MIX
+from .loadtest import format_report
+from .loadtest import main
+from .loadtest import percentile
+from .loadtest import pipeline_clients
+from .loadtest import run_load_test
+from .loadtest import targets
+
+pytestmark = pytest.mark.benchmark
+
+
+@pytest.fixture
+def server():
+    with FakeArchivesSpace(
+        resources=10, depth=2, breadth=3, latency=LATENCY, max_concurrency=4
+    ) as server:
+        yield server
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([7], 90) == 7
+    assert percentile([], 50) is None
+
+
+def test_load_test(server):
+    clients = pipeline_clients(server.url, 4)
+    server.reset_counts()
+    result = run_load_test(clients, targets(server), threads=2, operations=5)
+
+    assert result["operations"] == 4 * 2 * 5
+    assert result["errors"] == 0
+    assert result["requests"] == server.request_count
+    assert set(result["per_operation"]) <= set(DEFAULT_MIX)
+    for stats in result["per_operation"].values():
+        assert stats["p50"] <= stats["p90"] <= stats["p99"] <= stats["max"]
+    assert "ops/s" in format_report(result)
+
+
+def test_load_test_counts_errors(server):
+    clients = pipeline_clients(server.url, 2)
+    server.error_rate = 0.5
+    result = run_load_test(
+        clients, targets(server), operations=10, mix={"find_collections": 1}
+    )
+
+    stats = result["per_operation"]["find_collections"]
+    assert stats["count"] == 20
+    assert result["errors"] == sum(stats["errors"].values()) > 0
+    assert result["error_rate"] == stats["error_rate"] == result["errors"] / 20
+
+
+def test_main(capsys):
+    # --verbose leaves the package's logging configuration alone.
+    main(["--pipelines", "2", "--operations", "2", "--resources", "5", "--verbose"])
+    assert "4 operations" in capsys.readouterr().out
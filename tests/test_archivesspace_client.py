@@ -1,6 +1,9 @@
 import collections
 import json
 import os
+import pickle
+import random
+import re
 from unittest import mock
 
 import pytest
@@ -77,6 +80,118 @@ def test_logout(session_post, post):
     assert client.session is None
 
 
+@mock.patch("requests.post", side_effect=[SESSION_MOCK])
+def test_pickled_client_reuses_session_token(post):
+    client = ArchivesSpaceClient(**AUTH)
+    session = client.session
+    restored = pickle.loads(pickle.dumps(client))
+    assert restored.base_url == client.base_url
+    assert restored.session is not session
+    assert restored.session.headers["X-ArchivesSpace-Session"] == "1"
+    assert post.call_count == 1
+
+
+@mock.patch("requests.post", side_effect=[SESSION_MOCK])
+def test_session_is_recreated_after_fork(post):
+    client = ArchivesSpaceClient(**AUTH)
+    parent_session = client.session
+    assert client.session is parent_session
+    with mock.patch("os.getpid", return_value=-1):
+        child_session = client.session
+    assert child_session is not parent_session
+    assert child_session.headers["X-ArchivesSpace-Session"] == "1"
+    assert post.call_count == 1
+
+
+@mock.patch("requests.post", side_effect=[SESSION_MOCK])
+@mock.patch(
+    "requests.Session.get",
+    side_effect=[
+        mock.Mock(status_code=200, **{"json.return_value": {"values": ["fonds"]}}),
+    ],
+)
+def test_lazy_login(get, post):
+    client = ArchivesSpaceClient(lazy=True, **AUTH)
+    assert client.resource_type("/repositories/2/resources/1") == "resource"
+    assert post.call_count == 0
+    assert client.get_levels_of_description() == ["fonds"]
+    assert post.call_count == 1
+    assert client.session.headers["X-ArchivesSpace-Session"] == "1"
+
+
+@mock.patch("requests.post", side_effect=[SESSION_MOCK])
+@mock.patch("requests.Session.head")
+@mock.patch(
+    "requests.Session.get",
+    side_effect=[
+        mock.Mock(status_code=200, **{"json.return_value": {"values": ["fonds"]}}),
+    ],
+)
+def test_warm_up(get, head, post):
+    client = ArchivesSpaceClient(warm_connections=3, **AUTH)
+    assert head.call_count == 3
+    head.assert_called_with("http://localhost:8089/", timeout=client.timeout)
+    assert client.levels_of_description == ["fonds"]
+
+
+@mock.patch("requests.post", side_effect=[SESSION_MOCK])
+@mock.patch("requests.Session.head", side_effect=requests.ConnectionError)
+@mock.patch("requests.Session.get", side_effect=requests.ConnectionError)
+def test_warm_up_failures_are_ignored(get, head, post):
+    client = ArchivesSpaceClient(**AUTH)
+    client.warm_up(2)
+    assert head.call_count == 2
+    assert not hasattr(client, "levels_of_description")
+
+
+@mock.patch("requests.post", side_effect=[SESSION_MOCK])
+@mock.patch(
+    "requests.Session.get",
+    side_effect=[
+        mock.Mock(status_code=200, _content=b"{}", **{"json.return_value": {}}),
+        mock.Mock(status_code=200, _content=b"{}", **{"json.return_value": {}}),
+        mock.Mock(status_code=404, text="Not found"),
+        requests.ConnectionError,
+    ],
+)
+def test_request_stats(get, post):
+    client = ArchivesSpaceClient(**AUTH)
+    events = []
+    client.add_observer(events.append)
+    client.get_record("/repositories/2/resources/1")
+    client.get_record("/repositories/2/archival_objects/5")
+    with pytest.raises(CommunicationError):
+        client.get_record("/repositories/2/resources/2")
+    with pytest.raises(requests.ConnectionError):
+        client.get_record("/repositories/2/resources/3")
+
+    assert [e.route for e in events] == [
+        "/repositories/{id}/resources/{id}",
+        "/repositories/{id}/archival_objects/{id}",
+        "/repositories/{id}/resources/{id}",
+        "/repositories/{id}/resources/{id}",
+    ]
+    assert events[0].method == "GET"
+    assert events[0].url == "http://localhost:8089/repositories/2/resources/1"
+    assert events[3].status_code is None
+    assert isinstance(events[3].error, requests.ConnectionError)
+
+    stats = client.stats()
+    assert set(stats) == {
+        "GET /repositories/{id}/resources/{id}",
+        "GET /repositories/{id}/archival_objects/{id}",
+    }
+    resources = stats["GET /repositories/{id}/resources/{id}"]
+    assert resources["count"] == 3
+    assert resources["errors"] == 1
+    assert resources["bytes_received"] == 2
+    assert resources["status_codes"] == {200: 1, 404: 1}
+    assert sum(resources["latency_buckets"]) == 3
+
+    client.reset_stats()
+    assert client.stats() == {}
+
+
 @mock.patch("requests.post", side_effect=[SESSION_MOCK])
 @mock.patch(
     "requests.Session.get",
@@ -1984,6 +2099,22 @@ def test_escaping_solr_queries():
     assert escape("test") == "test"
 
 
+def test_escaping_solr_queries_matches_regex():
+    # The regular expression the escaping used to be done with.
+    def regex_escape(query, field):
+        replacement = r"\\\\\1" if field == "title" else r"\\\1"
+        return re.sub(r'([\'" +\-!\(\)\{\}\[\]^"~?:\\/]|&&|\|\|)', replacement, query)
+
+    rng = random.Random(0)
+    alphabet = "ab &|'\" +-!(){}[]^~?:\\/*"
+    for _ in range(2000):
+        query = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 20)))
+        for field in ("title", "identifier"):
+            assert ArchivesSpaceClient._escape_solr_query(query, field) == regex_escape(
+                query, field
+            )
+
+
 def test_process_notes(monkeypatch):
     empty_note = {"type": "odd"}
     TestCase = collections.namedtuple("TestCase", "new_record ret notes")
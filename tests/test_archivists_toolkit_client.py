@@ -0,0 +1,591 @@
+import json
+import pickle
+import threading
+from unittest import mock
+
+import pytest
+
+from agentarchives.archivists_toolkit.client import ArchivistsToolkitClient
+from agentarchives.archivists_toolkit.client import ArchivistsToolkitError
+from agentarchives.archivists_toolkit.client import InstrumentedCursor
+from agentarchives.archivists_toolkit.client import supports_recursive_queries
+
+from .benchmarks.fake_atk import SyntheticATK
+from .benchmarks.fake_atk import atk_client
+
+AUTH = {"host": "localhost", "user": "atk", "passwd": "atk", "db": "atk"}
+
+
+@pytest.fixture
+def cursor():
+    return mock.Mock(
+        **{"fetchone.return_value": (1,), "fetchall.return_value": [(5, "resource")]}
+    )
+
+
+@pytest.fixture
+def client(cursor):
+    client = ArchivistsToolkitClient(lazy=True, **AUTH)
+    connection = mock.Mock(**{"cursor.return_value": cursor})
+    with mock.patch.object(
+        ArchivistsToolkitClient,
+        "db",
+        new_callable=mock.PropertyMock,
+        return_value=connection,
+    ):
+        yield client
+
+
+def test_statements_are_instrumented(client, cursor):
+    events = []
+    client.add_observer(events.append)
+    assert client.resource_type(5) == ArchivistsToolkitClient.RESOURCE
+    assert len(events) == 1
+    assert events[0].backend == "archivists_toolkit"
+    assert events[0].method == "SELECT"
+    assert events[0].route == "Resources"
+    assert client.stats()["SELECT Resources"]["count"] == 1
+
+
+def test_resource_types(client, cursor):
+    cursor.fetchall.return_value = [
+        (5, "resource"),
+        (5, "resource_component"),
+        (6, "resource_component"),
+    ]
+    assert client.resource_types([5, "6", 7]) == {
+        5: ArchivistsToolkitClient.RESOURCE,
+        "6": ArchivistsToolkitClient.RESOURCE_COMPONENT,
+        7: None,
+    }
+    assert cursor.execute.call_count == 1
+    # Resources are remembered; other IDs are looked up again.
+    assert client.resource_type("5") == ArchivistsToolkitClient.RESOURCE
+    assert cursor.execute.call_count == 1
+    cursor.fetchall.return_value = [(6, "resource_component")]
+    assert client.resource_type(6) == ArchivistsToolkitClient.RESOURCE_COMPONENT
+    assert cursor.execute.call_count == 2
+    cursor.fetchall.return_value = []
+    assert client.resource_type(7) is None
+    assert cursor.execute.call_count == 3
+
+
+def test_component_type_is_not_remembered(client, cursor):
+    cursor.fetchall.return_value = [(6, "resource_component")]
+    assert client.resource_type(6) == ArchivistsToolkitClient.RESOURCE_COMPONENT
+    # A resource since created with the same ID takes precedence.
+    cursor.fetchall.return_value = [(6, "resource"), (6, "resource_component")]
+    assert client.resource_type(6) == ArchivistsToolkitClient.RESOURCE
+    assert cursor.execute.call_count == 2
+
+
+def test_resource_type_memo_is_bounded(client, cursor, monkeypatch):
+    monkeypatch.setattr(
+        "agentarchives.archivists_toolkit.client.RESOURCE_TYPE_CACHE_SIZE", 2
+    )
+    for resource_id in (1, 2, 1, 3):
+        cursor.fetchall.return_value = [(resource_id, "resource")]
+        client.resource_type(resource_id)
+    # 2 was the least recently used.
+    assert list(client._resource_types) == ["1", "3"]
+
+
+def test_failed_statements_are_instrumented(client, cursor):
+    cursor.execute.side_effect = RuntimeError("gone away")
+    with pytest.raises(RuntimeError):
+        client.resource_type(5)
+    assert client.stats()["SELECT Resources"]["errors"] == 1
+
+
+@pytest.fixture
+def connect():
+    with mock.patch.object(
+        ArchivistsToolkitClient,
+        "_open_connection",
+        side_effect=lambda: mock.Mock(),
+    ) as connect:
+        yield connect
+
+
+def test_connection_is_reopened_after_fork(connect):
+    client = ArchivistsToolkitClient(**AUTH)
+    parent_db = client.db
+    assert client.db is parent_db
+    assert connect.call_count == 1
+    with mock.patch("os.getpid", return_value=-1):
+        child_db = client.db
+        assert client.db is child_db
+    assert child_db is not parent_db
+    assert connect.call_count == 2
+    # Closing it would close the parent's connection.
+    parent_db.close.assert_not_called()
+
+
+def test_pickled_client_reconnects_on_use(connect):
+    client = ArchivistsToolkitClient(**AUTH)
+    parent_db = client.db
+    restored = pickle.loads(pickle.dumps(client))
+    assert restored._connect_kwargs == AUTH
+    assert restored._db is None
+    assert connect.call_count == 1
+    assert restored.db is not parent_db
+    assert connect.call_count == 2
+
+
+@pytest.mark.parametrize(
+    "server_info,expected",
+    [
+        ("8.0.33", True),
+        ("5.7.44-log", False),
+        ("10.6.12-MariaDB", True),
+        ("5.5.5-10.2.2-MariaDB-1:10.2.2+maria~bionic", True),
+        ("10.1.48-MariaDB", False),
+        ("", False),
+    ],
+)
+def test_supports_recursive_queries(server_info, expected):
+    assert supports_recursive_queries(server_info) is expected
+
+
+@pytest.fixture
+def pooled_client():
+    client = ArchivistsToolkitClient(lazy=True, pool_size=2, **AUTH)
+    client._open_connection = mock.Mock(
+        side_effect=lambda: mock.Mock(
+            **{"cursor.return_value.fetchall.return_value": [(5, "resource")]}
+        )
+    )
+    return client
+
+
+def test_pooled_client_checks_out_a_connection_per_operation(pooled_client):
+    assert pooled_client.resource_type(5) == ArchivistsToolkitClient.RESOURCE
+    assert pooled_client.resource_type(5) == ArchivistsToolkitClient.RESOURCE
+    # Both operations used the same connection, committed after each.
+    assert pooled_client._open_connection.call_count == 1
+    db = pooled_client._pool.acquire()
+    assert db.commit.call_count == 2
+
+    # Outside an operation, no connection is checked out.
+    with pytest.raises(ArchivistsToolkitError):
+        pooled_client._cursor()
+
+
+def test_pooled_client_is_thread_safe(pooled_client):
+    barrier = threading.Barrier(2)
+    connections = []
+
+    def worker():
+        with pooled_client._operation_scope():
+            db = pooled_client.db
+            barrier.wait(timeout=5)
+            # Nested operations share the thread's connection.
+            with pooled_client._operation_scope():
+                assert pooled_client.db is db
+            connections.append(db)
+
+    threads = [threading.Thread(target=worker) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(connections) == 2
+    assert connections[0] is not connections[1]
+    assert pooled_client._pool.idle == 2
+
+
+def test_pooled_client_can_be_pickled():
+    client = ArchivistsToolkitClient(lazy=True, pool_size=3, **AUTH)
+    client = pickle.loads(pickle.dumps(client))
+    assert client._pool.max_size == 3
+    assert client._pool.size == 0
+
+
+@pytest.fixture(scope="module")
+def database():
+    """A small Archivist's Toolkit database; see ``benchmarks.fake_atk``."""
+    with SyntheticATK(resources=3, depth=3, breadth=3) as database:
+        yield database
+
+
+@pytest.fixture(params=[True, False], ids=["recursive", "per-level"])
+def atk(database, request):
+    """A client of ``database``, with and without recursive queries."""
+    client = atk_client(database)
+    client._recursive_queries = request.param
+    return client
+
+
+def test_find_parent_id_for_component(database, atk):
+    resource_id = database.resource_ids[1]
+    for component_id in database.descendants(resource_id):
+        parent_id = database.components[component_id]["parent"]
+        if parent_id is None:
+            expected = (atk.RESOURCE, resource_id)
+        else:
+            expected = (atk.RESOURCE_COMPONENT, parent_id)
+        assert atk.find_parent_id_for_component(component_id) == expected
+        assert atk.find_resource_id_for_component(component_id) == resource_id
+
+
+def test_find_component_by_string_id(database, atk):
+    resource_id = database.resource_ids[1]
+    component_id = database.descendants(resource_id)[-1]
+    parent_id = database.components[component_id]["parent"]
+    assert atk.find_resource_id_for_component(str(component_id)) == resource_id
+    assert atk.find_parent_id_for_component(str(component_id)) == (
+        atk.RESOURCE_COMPONENT,
+        parent_id,
+    )
+    # Cached under the same key either way.
+    atk.reset_stats()
+    assert atk.find_resource_id_for_component(component_id) == resource_id
+    assert atk.stats() == {}
+
+
+def test_find_missing_component(atk):
+    with pytest.raises(ArchivistsToolkitError):
+        atk.find_resource_id_for_component(12345678)
+
+
+def test_component_cache_is_bounded(database, atk, monkeypatch):
+    monkeypatch.setattr(
+        "agentarchives.archivists_toolkit.client.COMPONENT_CACHE_SIZE", 5
+    )
+    for resource_id in database.resource_ids:
+        component_id = database.descendants(resource_id)[-1]
+        assert atk.find_resource_id_for_component(component_id) == resource_id
+        assert len(atk._components) <= 5
+
+
+def test_resource_larger_than_component_cache(database, atk, monkeypatch):
+    monkeypatch.setattr(
+        "agentarchives.archivists_toolkit.client.COMPONENT_CACHE_SIZE", 5
+    )
+    resource_id = database.resource_ids[0]
+    components = database.descendants(resource_id)
+    assert len(components) > 5
+    for component_id in components:
+        assert atk.find_resource_id_for_component(component_id) == resource_id
+    statements = sum(stats["count"] for stats in atk.stats().values())
+    if atk._recursive_queries:
+        # At most one query per component, for its ancestors only.
+        assert statements <= len(components)
+    else:
+        # At most one query per ancestor of each component, after one
+        # attempt at loading the whole resource, given up past 5 components.
+        depth = max(database.components[c]["level"] for c in components)
+        walk = sum(database.components[c]["level"] for c in components)
+        assert statements <= walk + depth
+    assert len(atk._components) <= 5
+
+
+def test_component_cache_expires(database, atk, monkeypatch):
+    resource_id = database.resource_ids[0]
+    component_id = database.descendants(resource_id)[-1]
+    atk.find_resource_id_for_component(component_id)
+    atk.reset_stats()
+    atk.find_resource_id_for_component(component_id)
+    assert atk.stats() == {}
+
+    monkeypatch.setattr(
+        "agentarchives.archivists_toolkit.client.COMPONENT_CACHE_TTL", -1
+    )
+    atk.find_resource_id_for_component(component_id)
+    assert atk.stats() != {}
+
+
+def test_collection_list_of_component(database, atk):
+    resource_id = database.resource_ids[0]
+    component = database.descendants(resource_id)[0]
+    assert atk.collection_list(component, "description") == [component] + [
+        c
+        for c in database.descendants(resource_id)
+        if _is_below(database, c, component)
+    ]
+
+
+def _is_below(database, component_id, ancestor_id):
+    parent = database.components[component_id]["parent"]
+    while parent is not None:
+        if parent == ancestor_id:
+            return True
+        parent = database.components[parent]["parent"]
+    return False
+
+
+def test_augment_resource_ids_matches_trees(database, atk):
+    resource_ids = database.resource_ids[:2] + [str(database.resource_ids[2]), 12345]
+    assert atk.augment_resource_ids(resource_ids) == [
+        atk.get_resource_component_and_children(resource_id, recurse_max_level=2)
+        for resource_id in resource_ids
+    ]
+
+
+@pytest.mark.parametrize(
+    "search_pattern,identifier",
+    [("", ""), ("Resource 1", ""), ("", "R2"), ("Resource 3", "R1"), ("nothing", "")],
+)
+def test_count_collections_matches_find_collection_ids(atk, search_pattern, identifier):
+    ids = atk.find_collection_ids(search_pattern, identifier)
+    assert atk.count_collections(search_pattern, identifier) == len(ids)
+
+
+def test_iter_components(database, atk):
+    components = list(atk.iter_components())
+    assert [c["id"] for c in components] == sorted(database.components)
+    for component in components:
+        info = database.components[component["id"]]
+        assert component["parent_id"] == info["parent"]
+        if info["parent"] is None:
+            assert component["resource_id"] == info["resource"]
+        else:
+            assert component["resource_id"] is None
+
+
+def test_iter_components_closed_early(database, atk):
+    components = atk.iter_components()
+    assert next(components)["id"] == min(database.components)
+    components.close()
+    # The connection is free for other queries again.
+    assert atk.count_collections() == len(database.resource_ids)
+
+
+def test_pooled_client_streams_over_its_own_connection(database):
+    client = atk_client(database, pool_size=2)
+    try:
+        components = client.iter_components()
+        first = next(components)
+        assert (
+            client.find_resource_id_for_component(first["id"])
+            == database.components[first["id"]]["resource"]
+        )
+        assert 1 + sum(1 for _ in components) == database.component_count
+    finally:
+        client._pool.close()
+
+
+def test_streaming_needs_two_pooled_connections(database):
+    client = atk_client(database, pool_size=1)
+    try:
+        with pytest.raises(ArchivistsToolkitError):
+            next(client.iter_components())
+        # The connection wasn't kept from other operations.
+        assert client.count_collections() == len(database.resource_ids)
+    finally:
+        client._pool.close()
+
+
+@pytest.fixture
+def scratch_database():
+    """A small database of its own, for tests that write to it."""
+    with SyntheticATK(resources=2, depth=2, breadth=2) as database:
+        yield database
+
+
+def table_count(client, table):
+    cursor = client._cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM {table}")
+    return cursor.fetchone()[0]
+
+
+def test_add_digital_object(scratch_database):
+    client = atk_client(scratch_database)
+    resource_id = scratch_database.resource_ids[0]
+    # Resource and component IDs overlap; IDs of both refer to the resource.
+    component = next(
+        c
+        for c in scratch_database.descendants(resource_id)
+        if c not in scratch_database.resource_ids
+    )
+    client.add_digital_object(
+        component,
+        "do-1",
+        uri="http://example.com/image.tiff",
+        inherit_dates=True,
+        location_of_originals="Vault",
+        use_conditions="None",
+    )
+
+    cursor = client._cursor()
+    cursor.execute(
+        "SELECT d.title, d.metsIdentifier, d.dateExpression, i.resourceComponentId, f.uri FROM DigitalObjects d JOIN ArchDescriptionInstances i ON i.archDescriptionInstancesId = d.archDescriptionInstancesId JOIN FileVersions f ON f.digitalObjectId = d.digitalObjectId"
+    )
+    title, identifier, dates, parent, uri = cursor.fetchone()
+    assert (title, identifier, parent, uri) == (
+        f"Component {component}",
+        "do-1",
+        component,
+        "http://example.com/image.tiff",
+    )
+    assert dates is not None
+    cursor.execute(
+        "SELECT noteContent, notesEtcTypeId, sequenceNumber FROM ArchDescriptionRepeatingData WHERE digitalObjectId IS NOT NULL ORDER BY sequenceNumber"
+    )
+    assert cursor.fetchall() == (("Vault", 13, 0), ("None", 9, 1))
+
+
+def test_add_digital_objects(scratch_database):
+    client = atk_client(scratch_database)
+    resource_id = scratch_database.resource_ids[0]
+    parents = [resource_id] + scratch_database.descendants(resource_id)
+    file_versions = table_count(client, "FileVersions")
+    ids = client.add_digital_objects(
+        [
+            {
+                "parent_archival_object": parents[n % len(parents)],
+                "identifier": f"do-{n}",
+                "uri": f"http://example.com/{n}.tiff",
+            }
+            for n in range(10)
+        ]
+    )
+    assert len(ids) == len(set(ids)) == 10
+    assert table_count(client, "DigitalObjects") == 10
+    assert table_count(client, "FileVersions") == file_versions + 10
+
+
+def test_add_digital_objects_to_missing_parent(scratch_database):
+    client = atk_client(scratch_database)
+    instances = table_count(client, "ArchDescriptionInstances")
+    with pytest.raises(ArchivistsToolkitError):
+        client.add_digital_objects(
+            [
+                {
+                    "parent_archival_object": scratch_database.resource_ids[0],
+                    "identifier": "a",
+                },
+                {"parent_archival_object": 999999, "identifier": "b"},
+            ]
+        )
+    assert table_count(client, "DigitalObjects") == 0
+    assert table_count(client, "ArchDescriptionInstances") == instances
+
+
+def test_add_digital_objects_is_atomic(scratch_database, monkeypatch):
+    client = atk_client(scratch_database)
+    resource_id = scratch_database.resource_ids[0]
+    executemany = InstrumentedCursor.executemany
+
+    def fail_on_notes(self, query, args):
+        if "ArchDescriptionRepeatingData" in query:
+            raise RuntimeError("disk full")
+        return executemany(self, query, args)
+
+    monkeypatch.setattr(InstrumentedCursor, "executemany", fail_on_notes)
+    with pytest.raises(RuntimeError):
+        client.add_digital_objects(
+            [
+                {"parent_archival_object": resource_id, "identifier": "a"},
+                {
+                    "parent_archival_object": resource_id,
+                    "identifier": "b",
+                    "use_conditions": "x",
+                },
+            ]
+        )
+    assert table_count(client, "DigitalObjects") == 0
+    assert table_count(client, "ArchDescriptionInstances") == 1
+
+    with pytest.raises(TypeError):
+        client.add_digital_objects([{"identifier": "no parent"}])
+
+
+def legacy_tree(client, resource_id, resource_type="collection", level=1, **kwargs):
+    """get_resource_component_and_children as it was, one query per node, with
+    the notes its callers then fetched for each node.
+    """
+    sort_data = kwargs.pop("sort_data", {})
+    recurse_max_level = kwargs.get("recurse_max_level", False)
+    query = kwargs.get("search_pattern", "")
+    if level == 1:
+        sort_data["position"] = 0
+    sort_data["position"] += 1
+    data = {}
+    cursor = client._cursor()
+    if resource_type == "collection":
+        cursor.execute(
+            "SELECT title, dateExpression, resourceIdentifier1, resourceLevel FROM Resources WHERE resourceid=%s",
+            (resource_id),
+        )
+        type_ = "resource"
+    else:
+        cursor.execute(
+            "SELECT title, dateExpression, persistentID, resourceLevel FROM ResourcesComponents WHERE resourceComponentId=%s",
+            (resource_id),
+        )
+        type_ = "resource_component"
+    for row in cursor.fetchall():
+        data.update(
+            id=resource_id,
+            type=type_,
+            sortPosition=sort_data["position"],
+            title=row[0],
+            dates=row[1],
+            date_expression=row[1],
+            identifier=row[2],
+            levelOfDescription=row[3],
+        )
+    if resource_type == "collection":
+        sql = "SELECT resourceComponentId FROM ResourcesComponents WHERE parentResourceComponentId IS NULL AND resourceId=%s"
+    else:
+        sql = "SELECT resourceComponentId FROM ResourcesComponents WHERE parentResourceComponentId=%s"
+    params = (resource_id,)
+    if query:
+        sql += " AND (title LIKE %s OR persistentID LIKE %s)"
+        params += ("%" + query + "%",) * 2
+    cursor.execute(
+        sql + " ORDER BY FIND_IN_SET(resourceLevel, 'subseries,file'), title ASC",
+        params,
+    )
+    rows = cursor.fetchall()
+    if (not recurse_max_level) or level < recurse_max_level:
+        if rows:
+            data["children"] = [
+                legacy_tree(
+                    client, row[0], "description", level + 1, sort_data=sort_data
+                )
+                for row in rows
+            ]
+            data["has_children"] = True
+    else:
+        data["children"] = [] if rows else False
+        data["has_children"] = bool(rows)
+    data["notes"] = legacy_notes(cursor, resource_id, resource_type == "collection")
+    return data
+
+
+def legacy_notes(cursor, record_id, is_resource):
+    if is_resource:
+        where = "r.resourceId=%s AND r.resourceComponentId IS NULL"
+    else:
+        where = "r.resourceComponentId=%s"
+    cursor.execute(
+        "SELECT t.notesEtcLabel, r.noteContent FROM ArchDescriptionRepeatingData r "
+        "LEFT JOIN NotesEtcTypes t ON t.notesEtcTypeId = r.notesEtcTypeId "
+        f"WHERE r.descriminator = 'note' AND {where} "
+        "ORDER BY r.sequenceNumber, r.archDescriptionRepeatingDataId",
+        (record_id,),
+    )
+    return [{"type": row[0], "content": row[1]} for row in cursor.fetchall()]
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {},
+        {"recurse_max_level": 1},
+        {"recurse_max_level": 2},
+        {"search_pattern": "Component 1"},
+        {"search_pattern": "C2", "recurse_max_level": 1},
+        {"search_pattern": "no such title"},
+    ],
+)
+def test_tree_matches_legacy_implementation(database, atk, kwargs):
+    resource_id = database.resource_ids[0]
+    component = database.descendants(resource_id)[0]
+    for args in [(resource_id,), (component, "description"), (12345,)]:
+        expected = legacy_tree(atk, *args, **kwargs)
+        actual = atk.get_resource_component_and_children(*args, **kwargs)
+        assert actual == expected
+        assert json.dumps(actual) == json.dumps(expected)
@@ -0,0 +1,138 @@
+import threading
+from unittest import mock
+
+import pytest
+
+from agentarchives.archivists_toolkit.pool import ConnectionPool
+from agentarchives.archivists_toolkit.pool import PoolTimeout
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def connect():
+    return mock.Mock(side_effect=lambda: mock.Mock())
+
+
+@pytest.fixture
+def pool(connect, clock):
+    return ConnectionPool(connect, max_size=2, check_after=60, clock=clock)
+
+
+def test_connections_are_reused(pool, connect):
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+    assert second is first
+    assert connect.call_count == 1
+    assert pool.size == pool.idle == 1
+
+
+def test_pool_is_bounded(pool, connect):
+    first = pool.acquire()
+    second = pool.acquire()
+    assert first is not second
+    with pytest.raises(PoolTimeout):
+        pool.acquire(timeout=0.01)
+    assert connect.call_count == 2
+
+
+def test_waiters_get_released_connections(pool):
+    first = pool.acquire()
+    pool.acquire()
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(pool.acquire(timeout=5)))
+    waiter.start()
+    pool.release(first)
+    waiter.join()
+    assert acquired == [first]
+
+
+def test_transactions(pool):
+    with pool.connection() as db:
+        pass
+    db.commit.assert_called_once_with()
+    db.rollback.assert_not_called()
+
+    with pytest.raises(RuntimeError):
+        with pool.connection() as db:
+            raise RuntimeError("query failed")
+    db.rollback.assert_called_once_with()
+    # The connection is still usable.
+    assert pool.idle == 1
+
+
+def test_broken_connections_are_discarded(pool, connect):
+    with pytest.raises(RuntimeError):
+        with pool.connection() as db:
+            db.rollback.side_effect = RuntimeError("gone away")
+            raise RuntimeError("query failed")
+    db.close.assert_called_once_with()
+    assert pool.size == pool.idle == 0
+    with pool.connection() as other:
+        assert other is not db
+
+
+def test_idle_connections_are_checked(pool, connect, clock):
+    with pool.connection() as db:
+        pass
+    clock.now = 30
+    with pool.connection():
+        pass
+    db.ping.assert_not_called()
+
+    clock.now = 100
+    with pool.connection() as again:
+        pass
+    assert again is db
+    db.ping.assert_called_once_with()
+
+
+def test_dropped_connections_are_replaced(pool, connect, clock):
+    with pool.connection() as db:
+        pass
+    db.ping.side_effect = RuntimeError("MySQL server has gone away")
+    clock.now = 100
+    with pool.connection() as replacement:
+        pass
+    assert replacement is not db
+    db.close.assert_called_once_with()
+    assert pool.size == 1
+
+
+def test_failed_connect_frees_its_slot(pool, connect):
+    connect.side_effect = RuntimeError("refused")
+    with pytest.raises(RuntimeError):
+        pool.acquire()
+    assert pool.size == 0
+
+
+def test_close(pool):
+    with pool.connection() as db:
+        pass
+    pool.close()
+    db.close.assert_called_once_with()
+    assert pool.size == pool.idle == 0
+
+
+def test_connections_from_parent_process_are_not_reused(pool, connect):
+    with pool.connection() as db:
+        pass
+    with mock.patch("os.getpid", return_value=-1):
+        with pool.connection() as child_db:
+            pass
+    assert child_db is not db
+    # Closing it would close the parent's connection.
+    db.close.assert_not_called()
@@ -1,4 +1,7 @@
 import os
+import pickle
+import random
+import re
 from unittest import mock
 
 import pytest
@@ -980,3 +983,67 @@ def test_escaping_lucene_queries():
     # And double characters, which require only one set of escape tokens
     assert escape("&&test", field="identifier") == r"\&&test"
     assert escape("test") == "test"
+
+
+def test_escaping_lucene_queries_matches_regex():
+    # The regular expression the escaping used to be done with.
+    def regex_escape(query):
+        return re.sub(r'([\'" +\-!\(\)\{\}\[\]^"~?:\\/]|&&|\|\|)', r"\\\1", query)
+
+    rng = random.Random(0)
+    alphabet = "ab &|'\" +-!(){}[]^~?:\\/*"
+    for _ in range(2000):
+        query = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 20)))
+        assert AtomClient._escape_lucene_query(query) == regex_escape(query)
+
+
+def test_pickled_client_rebuilds_session():
+    client = AtomClient(**AUTH)
+    session = client.session
+    restored = pickle.loads(pickle.dumps(client))
+    assert restored.base_url == client.base_url
+    assert restored.session is not session
+    assert restored.session.headers["REST-API-Key"] == AUTH["key"]
+
+
+def test_session_is_recreated_after_fork():
+    client = AtomClient(**AUTH)
+    parent_session = client.session
+    with mock.patch("os.getpid", return_value=-1):
+        assert client.session is not parent_session
+
+
+@mock.patch("requests.Session.head")
+@mock.patch(
+    "requests.Session.get",
+    side_effect=[
+        mock.Mock(status_code=200, **{"json.return_value": [{"name": "Fonds"}]}),
+    ],
+)
+def test_warm_up(get, head):
+    client = AtomClient(warm_connections=12, **AUTH)
+    assert head.call_count == 12
+    head.assert_called_with("http://127.0.0.1/api/", timeout=client.timeout)
+    assert client.levels_of_description == ["Fonds"]
+    # The default pool only keeps 10 connections per host.
+    assert client.session.get_adapter("http://127.0.0.1/api/")._pool_maxsize == 12
+
+
+@mock.patch(
+    "requests.Session.get",
+    side_effect=[
+        mock.Mock(status_code=200, **{"json.return_value": {"title": "A"}}),
+        mock.Mock(status_code=200, **{"json.return_value": {"children": []}}),
+        mock.Mock(status_code=200, **{"json.return_value": [{"name": "Fonds"}]}),
+    ],
+)
+def test_request_stats(get):
+    client = AtomClient(**AUTH)
+    client.get_record("test-fonds")
+    client.collection_list("test-fonds")
+    client.get_levels_of_description()
+    assert set(client.stats()) == {
+        "GET /informationobjects/tree/{slug}",
+        "GET /informationobjects/{slug}",
+        "GET /taxonomies/{id}",
+    }
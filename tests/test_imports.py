@@ -0,0 +1,54 @@
+import subprocess
+import sys
+
+import pytest
+
+HEAVY_MODULES = ("requests", "urllib3", "MySQLdb")
+
+
+def import_times(module):
+    """Return the modules imported by ``module`` with their cumulative time.
+
+    Uses ``python -X importtime`` in a fresh interpreter, which reports the
+    self and cumulative import time in microseconds for every module loaded.
+    """
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    times = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        try:
+            times[name.strip()] = int(cumulative)
+        except ValueError:  # The column header line.
+            continue
+    return times
+
+
+@pytest.mark.parametrize(
+    "module",
+    [
+        "agentarchives",
+        "agentarchives.archivesspace",
+        "agentarchives.archivists_toolkit",
+        "agentarchives.atom",
+    ],
+)
+def test_import_does_not_load_backends(module):
+    times = import_times(module)
+    assert module in times
+    loaded = {name.split(".")[0] for name in times}
+    assert loaded.isdisjoint(HEAVY_MODULES)
+
+
+def test_import_does_not_configure_logging():
+    code = (
+        "import logging, agentarchives.archivists_toolkit;"
+        "assert not logging.getLogger().handlers"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
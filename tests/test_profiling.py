@@ -0,0 +1,128 @@
+import pstats
+import sys
+import threading
+import tracemalloc
+from unittest import mock
+
+from agentarchives import profiling
+from agentarchives.atom.client import AtomClient
+from agentarchives.profiling import Profiler
+
+AUTH = {"url": "http://127.0.0.1/index.php", "key": "68405800c6612599"}
+LEVELS_MOCK = mock.Mock(status_code=200, **{"json.return_value": [{"name": "Fonds"}]})
+
+
+@mock.patch("requests.Session.get", side_effect=[LEVELS_MOCK])
+def test_operations_are_profiled(get, tmp_path):
+    client = AtomClient(profile_dir=str(tmp_path), **AUTH)
+    client.get_levels_of_description()
+
+    prof = list(tmp_path.glob("AtomClient.get_levels_of_description-*.prof"))
+    mem = list(tmp_path.glob("AtomClient.get_levels_of_description-*.mem.txt"))
+    assert len(prof) == 1 and len(mem) == 1
+    stats = pstats.Stats(str(prof[0]))
+    assert any(func[2] == "get_levels_of_description" for func in stats.stats)
+    assert mem[0].read_text().startswith("Peak traced memory: ")
+
+
+@mock.patch(
+    "requests.Session.get",
+    side_effect=[
+        mock.Mock(status_code=200, **{"json.return_value": {"title": "Fonds"}}),
+    ],
+)
+def test_only_outermost_operation_is_profiled(get, tmp_path):
+    client = AtomClient(**AUTH)
+    client.profiler = Profiler(str(tmp_path), memory=False)
+    # find_parent_id_for_component calls get_record, itself an operation.
+    client.find_parent_id_for_component("fonds")
+    assert [p.name.split("-")[0] for p in tmp_path.iterdir()] == [
+        "AtomClient.find_parent_id_for_component"
+    ]
+
+
+@mock.patch("requests.Session.get", side_effect=[LEVELS_MOCK])
+def test_profiling_from_environment(get, tmp_path, monkeypatch):
+    monkeypatch.setenv("AGENTARCHIVES_PROFILE_DIR", str(tmp_path))
+    monkeypatch.setenv("AGENTARCHIVES_PROFILE_MEMORY", "0")
+    client = AtomClient(**AUTH)
+    assert client.profiler.memory is False
+    client.get_levels_of_description()
+    assert len(list(tmp_path.glob("*.prof"))) == 1
+    assert list(tmp_path.glob("*.mem.txt")) == []
+
+
+def test_profiling_is_off_by_default(monkeypatch):
+    monkeypatch.delenv("AGENTARCHIVES_PROFILE_DIR", raising=False)
+    assert AtomClient(**AUTH).profiler is None
+
+
+def test_sampling(tmp_path):
+    profiler = Profiler(str(tmp_path), sample_rate=0.5, memory=False)
+    with mock.patch("random.random", side_effect=[0.7, 0.2]):
+        assert profiler.run("skipped", sum, [1, 2]) == 3
+        assert profiler.run("sampled", sum, [1, 2]) == 3
+    assert [p.name.split("-")[0] for p in tmp_path.iterdir()] == ["sampled"]
+
+
+def test_tracemalloc_is_stopped_by_the_last_operation():
+    profiling._start_tracing()
+    profiling._start_tracing()
+    profiling._stop_tracing()
+    # The other operation is still tracing.
+    assert tracemalloc.is_tracing()
+    profiling._stop_tracing()
+    assert not tracemalloc.is_tracing()
+
+
+def test_tracemalloc_started_elsewhere_is_left_running():
+    tracemalloc.start()
+    try:
+        profiling._start_tracing()
+        profiling._stop_tracing()
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+
+def test_concurrent_operations(tmp_path):
+    profiler = Profiler(str(tmp_path))
+    second_started = threading.Event()
+    first_done = threading.Event()
+    results = {}
+
+    def first():
+        second_started.wait(5)
+        return "first"
+
+    def second():
+        second_started.set()
+        # The first operation ends while this one is still tracing memory.
+        first_done.wait(5)
+        return "second"
+
+    def run_first():
+        results["first"] = profiler.run("first", first)
+        first_done.set()
+
+    def run_second():
+        results["second"] = profiler.run("second", second)
+
+    threads = [threading.Thread(target=run_first), threading.Thread(target=run_second)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == {"first": "first", "second": "second"}
+    # From Python 3.12, cProfile can't profile two threads at once.
+    reports = 2 if sys.version_info < (3, 12) else 1
+    assert len(list(tmp_path.glob("*.mem.txt"))) == reports
+    assert not tracemalloc.is_tracing()
+
+
+def test_report_failures_are_logged(tmp_path, caplog):
+    profiler = Profiler(str(tmp_path))
+    with mock.patch.object(Profiler, "_write", side_effect=RuntimeError("full")):
+        assert profiler.run("failing", sum, [1, 2]) == 3
+    assert "Unable to write profile for failing" in caplog.text
+    assert not tracemalloc.is_tracing()
@@ -0,0 +1,89 @@
+import urllib.request
+
+import pytest
+
+from agentarchives import prometheus
+from agentarchives.instrumentation import RequestEvent
+from agentarchives.instrumentation import StatsCollector
+
+
+def event(route, elapsed, status_code=200, method="GET", backend="archivesspace"):
+    return RequestEvent(
+        backend=backend,
+        method=method,
+        route=route,
+        url="http://localhost" + route,
+        status_code=status_code,
+        elapsed=elapsed,
+        bytes_sent=0,
+        bytes_received=10,
+        retries=0,
+        error=None,
+    )
+
+
+@pytest.fixture
+def collector():
+    collector = StatsCollector()
+    collector(event("/repositories/{id}/resources/{id}/tree", 0.003))
+    collector(event("/repositories/{id}/resources/{id}/tree", 0.2))
+    collector(event("/repositories/{id}/resources/{id}/tree", 30, status_code=500))
+    collector(
+        event(
+            "Resources",
+            0.001,
+            status_code=None,
+            method="SELECT",
+            backend="archivists_toolkit",
+        )
+    )
+    return collector
+
+
+def test_render(collector):
+    lines = prometheus.render(collector).splitlines()
+    labels = 'backend="archivesspace",method="GET",route="/repositories/{id}/resources/{id}/tree"'
+    sql_labels = 'backend="archivists_toolkit",method="SELECT",route="Resources"'
+    assert f'agentarchives_requests_total{{{labels},status="200"}} 2' in lines
+    assert f'agentarchives_requests_total{{{labels},status="500"}} 1' in lines
+    assert f'agentarchives_requests_total{{{sql_labels},status=""}} 1' in lines
+    assert f"agentarchives_request_bytes_received_total{{{labels}}} 30" in lines
+    assert "# TYPE agentarchives_request_duration_seconds histogram" in lines
+    histogram = "agentarchives_request_duration_seconds"
+    assert f'{histogram}_bucket{{{labels},le="0.005"}} 1' in lines
+    assert f'{histogram}_bucket{{{labels},le="0.25"}} 2' in lines
+    assert f'{histogram}_bucket{{{labels},le="10"}} 2' in lines
+    assert f'{histogram}_bucket{{{labels},le="+Inf"}} 3' in lines
+    assert f"{histogram}_count{{{labels}}} 3" in lines
+
+
+def test_render_merges_sources(collector):
+    other = StatsCollector()
+    other(event("/repositories/{id}/resources/{id}/tree", 0.003))
+    text = prometheus.render(collector, other)
+    assert 'route="/repositories/{id}/resources/{id}/tree",status="200"} 3' in text
+
+
+def test_label_escaping():
+    collector = StatsCollector()
+    collector(event('/a"b\\c', 0.1))
+    assert r'route="/a\"b\\c"' in prometheus.render(collector)
+
+
+def test_write_textfile(collector, tmp_path):
+    path = tmp_path / "agentarchives.prom"
+    prometheus.write_textfile(str(path), collector)
+    assert path.read_text() == prometheus.render(collector)
+    assert [p.name for p in tmp_path.iterdir()] == ["agentarchives.prom"]
+
+
+def test_http_server(collector):
+    server = prometheus.start_http_server(0, collector)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url) as response:
+            assert response.headers["Content-Type"] == prometheus.CONTENT_TYPE
+            assert response.read().decode() == prometheus.render(collector)
+    finally:
+        server.shutdown()
+        server.server_close()
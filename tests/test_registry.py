@@ -0,0 +1,143 @@
+import threading
+from unittest import mock
+
+import pytest
+
+from agentarchives import ClientRegistry
+from agentarchives.archivesspace.client import ArchivesSpaceClient
+from agentarchives.archivists_toolkit.client import ArchivistsToolkitClient
+from agentarchives.atom.client import AtomClient
+
+AS_AUTH = ("http://localhost:8089", "admin", "admin")
+SESSION_MOCK = mock.Mock(status_code=200, **{"json.return_value": {"session": "1"}})
+HEALTHY_MOCK = mock.Mock(status_code=200, **{"json.return_value": {"username": "a"}})
+EXPIRED_MOCK = mock.Mock(status_code=412, **{"json.return_value": {"error": "x"}})
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def registry(clock):
+    return ClientRegistry(max_idle=300, check_after=60, clock=clock)
+
+
+@mock.patch("requests.post", side_effect=[SESSION_MOCK, SESSION_MOCK])
+def test_same_arguments_share_a_client(post, registry):
+    client = registry.get("archivesspace", *AS_AUTH)
+    assert isinstance(client, ArchivesSpaceClient)
+    assert registry.get("archivesspace", *AS_AUTH) is client
+    assert post.call_count == 1
+
+    other = registry.get("archivesspace", "http://localhost:8089", "other", "admin")
+    assert other is not client
+    assert post.call_count == 2
+    assert len(registry) == 2
+
+
+def test_clients_are_keyed_by_backend(registry):
+    client = registry.get("atom", "http://127.0.0.1/", "key")
+    assert isinstance(client, AtomClient)
+    # However the arguments are passed.
+    assert registry.get("atom", url="http://127.0.0.1/", key="key") is client
+    assert len(registry) == 1
+
+
+@mock.patch("requests.post", side_effect=[SESSION_MOCK])
+def test_default_arguments_share_a_client(post, registry):
+    client = registry.get("archivesspace", *AS_AUTH)
+    assert registry.get("archivesspace", *AS_AUTH, port=8089) is client
+    assert registry.get("archivesspace", *AS_AUTH[:2], passwd="admin") is client
+    assert post.call_count == 1
+
+
+def test_unknown_backend(registry):
+    with pytest.raises(ValueError):
+        registry.get("dspace", "http://localhost")
+
+
+@mock.patch("requests.post", side_effect=[SESSION_MOCK, SESSION_MOCK])
+def test_idle_clients_are_evicted(post, registry, clock):
+    client = registry.get("archivesspace", *AS_AUTH)
+    clock.now = 301
+    assert registry.get("archivesspace", *AS_AUTH) is not client
+    assert post.call_count == 2
+
+
+@mock.patch("requests.post", side_effect=[SESSION_MOCK])
+@mock.patch("requests.Session.get", side_effect=[HEALTHY_MOCK])
+def test_healthy_client_is_reused_after_check(get, post, registry, clock):
+    client = registry.get("archivesspace", *AS_AUTH)
+    clock.now = 30
+    assert registry.get("archivesspace", *AS_AUTH) is client
+    assert get.call_count == 0
+    clock.now = 100
+    assert registry.get("archivesspace", *AS_AUTH) is client
+    assert get.call_args[0][0].endswith("/users/current-user")
+
+
+@mock.patch("requests.post", side_effect=[SESSION_MOCK, SESSION_MOCK])
+@mock.patch("requests.Session.get", side_effect=[EXPIRED_MOCK])
+def test_unhealthy_client_is_replaced(get, post, registry, clock):
+    client = registry.get("archivesspace", *AS_AUTH)
+    clock.now = 100
+    assert registry.get("archivesspace", *AS_AUTH) is not client
+    assert post.call_count == 2
+
+
+def test_clear(registry):
+    registry.get("atom", "http://127.0.0.1/", "key")
+    registry.clear()
+    assert len(registry) == 0
+
+
+def test_archivists_toolkit_clients_need_a_pool(registry):
+    auth = ("localhost", "atk", "atk", "atk")
+    with pytest.raises(ValueError):
+        registry.get("archivists_toolkit", *auth, lazy=True)
+    client = registry.get("archivists_toolkit", *auth, lazy=True, pool_size=4)
+    assert isinstance(client, ArchivistsToolkitClient)
+    assert len(registry) == 1
+
+
+def test_slow_clients_do_not_block_others(registry):
+    started = threading.Event()
+    release = threading.Event()
+    created = []
+
+    def create(url, key):
+        created.append(url)
+        if url == "http://slow/":
+            started.set()
+            release.wait(5)
+        return mock.Mock()
+
+    with mock.patch("agentarchives.atom.AtomClient", create):
+        slow = [
+            threading.Thread(target=registry.get, args=("atom", "http://slow/", "k"))
+            for _ in range(2)
+        ]
+        for thread in slow:
+            thread.start()
+        assert started.wait(5)
+        registry.get("atom", "http://fast/", "k")
+        # The other backend's client was created while the slow one was.
+        assert not release.is_set()
+        assert all(thread.is_alive() for thread in slow)
+        release.set()
+        for thread in slow:
+            thread.join()
+    # The slow client was created once, for both threads.
+    assert sorted(created) == ["http://fast/", "http://slow/"]
+    assert len(registry) == 2
+    assert registry._key_locks.keys() == registry._entries.keys()
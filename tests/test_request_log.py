@@ -0,0 +1,118 @@
+import logging
+from unittest import mock
+
+import pytest
+
+from agentarchives.atom.client import AtomClient
+from agentarchives.atom.client import CommunicationError
+from agentarchives.instrumentation import RequestEvent
+from agentarchives.request_log import RequestLog
+
+AUTH = {"url": "http://127.0.0.1/index.php", "key": "68405800c6612599"}
+
+
+def event(elapsed=0.1, status_code=200, error=None, content=b""):
+    return RequestEvent(
+        backend="atom",
+        method="GET",
+        route="/informationobjects/{slug}",
+        url="http://127.0.0.1/api/informationobjects/fonds",
+        status_code=status_code,
+        elapsed=elapsed,
+        bytes_sent=0,
+        bytes_received=len(content),
+        retries=0,
+        error=error,
+        response=mock.Mock(content=content),
+    )
+
+
+@pytest.fixture
+def log(caplog):
+    caplog.set_level(logging.INFO, logger="agentarchives.request_log")
+    return caplog
+
+
+def test_fast_requests_are_not_logged(log):
+    RequestLog(threshold=1)(event())
+    assert log.records == []
+
+
+def test_slow_requests_are_logged(log):
+    RequestLog(threshold=1)(event(elapsed=2.5))
+    assert log.records[0].levelname == "WARNING"
+    assert "GET /informationobjects/{slug} took 2.500s" in log.text
+
+
+def test_failed_response_body_is_truncated(log):
+    RequestLog(preview_bytes=10)(event(status_code=500, content=b"<html>" * 1000))
+    assert log.records[0].levelname == "ERROR"
+    assert "responded 500" in log.text
+    assert "<html><htm... [5990 more bytes]" in log.text
+
+
+def test_transport_errors_are_logged(log):
+    RequestLog()(event(status_code=None, error=ConnectionError("refused")))
+    assert "failed after 0.100s: ConnectionError('refused')" in log.text
+
+
+def test_sampling(log):
+    request_log = RequestLog(threshold=1, sample_rate=0.5)
+    with mock.patch("random.random", side_effect=[0.9, 0.1]):
+        request_log(event(elapsed=2))
+        request_log(event(elapsed=2))
+    assert len(log.records) == 1
+
+
+def test_body_is_not_formatted_when_logging_is_disabled(caplog):
+    caplog.set_level(logging.CRITICAL, logger="agentarchives.request_log")
+    content = mock.PropertyMock(return_value=b"body")
+    response = mock.Mock()
+    type(response).content = content
+    RequestLog()(event(status_code=500)._replace(response=response))
+    content.assert_not_called()
+
+
+@mock.patch(
+    "requests.Session.get",
+    side_effect=[mock.Mock(status_code=404, content=b"Not found" * 100)],
+)
+def test_client_logs_error_responses(get, log):
+    client = AtomClient(**AUTH)
+    client.request_log.preview_bytes = 9
+    with pytest.raises(CommunicationError):
+        client.get_record("missing")
+    assert "responded 404" in log.text
+    assert "Not found... [891 more bytes]" in log.text
+
+
+def test_long_statements_are_truncated(log):
+    statement = "SELECT title FROM Resources WHERE resourceId IN (" + "%s, " * 999
+    RequestLog(preview_bytes=20)(
+        event(status_code=None, error=RuntimeError("gone away"))._replace(url=statement)
+    )
+    assert f"GET SELECT title FROM Re... [{len(statement) - 20} more" in log.text
+
+
+@mock.patch(
+    "requests.Session.post",
+    side_effect=[mock.Mock(status_code=200, content=b"{}" * 1000)],
+)
+def test_client_logs_unexpected_success_responses(post, log):
+    client = AtomClient(**AUTH)
+    client.request_log.preview_bytes = 4
+    with pytest.raises(CommunicationError):
+        client._post(AUTH["url"], expected_response=201)
+    assert log.records[0].levelname == "ERROR"
+    assert "responded 200, expected 201: {}{}... [1996 more bytes]" in log.text
+
+
+@mock.patch(
+    "requests.Session.get",
+    side_effect=[mock.Mock(status_code=404, content=b"Not found")],
+)
+def test_client_error_responses_are_logged_once(get, log):
+    client = AtomClient(**AUTH)
+    with pytest.raises(CommunicationError):
+        client.get_record("missing")
+    assert len(log.records) == 1
@@ -0,0 +1,83 @@
+from unittest import mock
+
+import pytest
+
+from agentarchives import tracing
+from agentarchives.archivesspace.client import ArchivesSpaceClient
+from agentarchives.archivesspace.client import CommunicationError
+
+AUTH = {"host": "http://localhost:8089", "user": "admin", "passwd": "admin"}
+SESSION_MOCK = mock.Mock(status_code=200, **{"json.return_value": {"session": "1"}})
+
+
+@pytest.fixture
+def tracer():
+    tracer = tracing.RecordingTracer()
+    tracing.set_tracer(tracer)
+    yield tracer
+    tracing.set_tracer(None)
+
+
+@mock.patch("requests.post", side_effect=[SESSION_MOCK])
+@mock.patch(
+    "requests.Session.post",
+    side_effect=[
+        mock.Mock(
+            status_code=200,
+            **{"json.return_value": {"uri": "/repositories/2/digital_objects/8"}},
+        ),
+        mock.Mock(
+            status_code=200,
+            **{"json.return_value": {"uri": "/repositories/2/archival_objects/3"}},
+        ),
+    ],
+)
+@mock.patch(
+    "requests.Session.get",
+    side_effect=[
+        mock.Mock(
+            status_code=200,
+            **{
+                "json.return_value": {
+                    "instances": [],
+                    "linked_agents": [],
+                    "notes": [],
+                    "repository": {"ref": "/repositories/2"},
+                    "subjects": [],
+                    "uri": "/repositories/2/archival_objects/3",
+                }
+            },
+        )
+    ],
+)
+def test_operation_span_has_request_children(get, session_post, post, tracer):
+    client = ArchivesSpaceClient(**AUTH)
+    client.add_digital_object("/repositories/2/archival_objects/3", identifier="x")
+
+    assert len(tracer.roots) == 1
+    root = tracer.roots[0]
+    assert root.name == "ArchivesSpaceClient.add_digital_object"
+    # get_record is a traced operation of its own, with the GET nested in it.
+    assert [child.name for child in root.children] == [
+        "ArchivesSpaceClient.get_record",
+        "POST /repositories/{id}/digital_objects",
+        "POST /repositories/{id}/archival_objects/{id}",
+    ]
+    request = root.children[0].children[0]
+    assert request.name == "GET /repositories/{id}/archival_objects/{id}"
+    assert request.attributes["http.status_code"] == 200
+    assert "ArchivesSpaceClient.add_digital_object" in tracer.format()
+
+
+@mock.patch("requests.post", side_effect=[SESSION_MOCK])
+@mock.patch("requests.Session.get", side_effect=[mock.Mock(status_code=500)])
+def test_errors_are_recorded(get, post, tracer):
+    client = ArchivesSpaceClient(**AUTH)
+    with pytest.raises(CommunicationError):
+        client.get_record("/repositories/2/resources/1")
+    assert tracer.roots[0].error is not None
+
+
+def test_span_is_a_no_op_without_tracer():
+    with tracing.span("noop") as span:
+        assert span is None